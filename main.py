@@ -6,6 +6,8 @@ import asyncio
 from src.utils.logger_manager import app_logger
 from src.app.auto_attendance import run_attendance_automation
 from src.app.auto_quiz import run_quiz_automation
+from src.app.campaign import load_campaign_file, run_campaign
+from src.utils.circuit_breaker import CircuitOpenError
 
 def get_mandatory_input(prompt_message: str) -> str:
     """
@@ -50,8 +52,21 @@ async def main():
         choices=['attend', 'quiz', 'all'],
         help="指定要執行的任務：'attend' (僅簽到), 'quiz' (僅測驗), 'all' (兩者皆執行)。"
     )
+    # 多網址活動模式：一次處理多組 (url, type)
+    parser.add_argument(
+        '--campaign',
+        type=str,
+        help="活動檔案路徑 (JSON 或含 url,type 欄位的 CSV)，指定後將忽略其他 URL 參數，\n"
+             "所有網址共用同一個瀏覽器池、快取與使用者名單。"
+    )
     args = parser.parse_args()
 
+    if args.campaign:
+        app_logger.info("\n" + "="*20 + " 🚀 開始執行多網址活動 " + "="*20)
+        await run_campaign(load_campaign_file(args.campaign))
+        app_logger.info("🎉 所有指定任務已完成！")
+        return
+
     # 從參數或互動式輸入獲取 URL
     attend_url = args.attend_url
     quiz_url = args.quiz_url
@@ -77,16 +92,22 @@ async def main():
     # --- 根據提供的 URL 執行對應的任務 ---
     if run_attend and attend_url:
         app_logger.info("\n" + "="*20 + " 🚀 開始執行簽到流程 " + "="*20)
-        await run_attendance_automation(attend_url)
-        app_logger.info("="*20 + " ✅ 簽到流程執行完畢 " + "="*20 + "\n")
+        try:
+            await run_attendance_automation(attend_url)
+            app_logger.info("="*20 + " ✅ 簽到流程執行完畢 " + "="*20 + "\n")
+        except CircuitOpenError as e:
+            app_logger.error(f"⛔ 簽到流程已中止：{e}\n")
     elif run_attend and not attend_url:
         app_logger.warning("\n⏩ 未提供簽到 URL，已跳過簽到流程。\n")
 
 
     if run_quiz and quiz_url:
         app_logger.info("\n" + "="*20 + " 🚀 開始執行測驗流程 " + "="*20)
-        await run_quiz_automation(quiz_url)
-        app_logger.info("="*20 + " ✅ 測驗流程執行完畢 " + "="*20 + "\n")
+        try:
+            await run_quiz_automation(quiz_url)
+            app_logger.info("="*20 + " ✅ 測驗流程執行完畢 " + "="*20 + "\n")
+        except CircuitOpenError as e:
+            app_logger.error(f"⛔ 測驗流程已中止：{e}\n")
     elif run_quiz and not quiz_url:
         app_logger.warning("\n⏩ 未提供測驗 URL，已跳過測驗流程。\n")
         
@@ -5,7 +5,13 @@ import json
 import argparse
 
 # 導入核心邏輯
+from src.utils.circuit_breaker import CircuitOpenError
+from src.utils.job_log import job_logging, new_job_id
+from src.utils.log_pipeline import configure_logging
 from src.utils.logger_manager import app_logger
+from src.utils.metrics import start_snapshot_writer
+from src.utils.profiling import PROFILERS, profile_job
+from src.utils.tracing import KIND_SERVER, configure_tracing, resume_from_env, span
 from src.utils.survey_utils import CacheManager, fill_form_with_cache_check
 
 async def run_personal_quiz_task(url, name, email, company_name):
@@ -62,12 +68,35 @@ async def run_personal_attendance_task(url, name, email, company_name):
 async def main():
     parser = argparse.ArgumentParser(description="Playwright Task Runner")
     parser.add_argument("task_type", type=str, 
-                       help="任務類型: 'batch_attendance', 'batch_quiz', 'personal_attendance', 'personal_quiz'")
+                       help="任務類型: 'batch_attendance', 'batch_quiz', 'personal_attendance', 'personal_quiz', 'campaign'")
     parser.add_argument("--url", type=str, help="表單 URL")
     parser.add_argument("--personal_info", type=str, help="JSON 格式的個人資訊字符串")
+    parser.add_argument("--campaign", type=str, help="JSON 格式的活動項目列表 [{\"url\": ..., \"type\": \"attend|quiz\"}]")
+    parser.add_argument("--job_id", type=str, help="任務 ID（日誌關聯用，未提供時自動產生）")
+    parser.add_argument("--log_options", type=str,
+                       help="JSON 格式的步驟日誌設定 {\"mode\": \"sync|async\", \"step_level\": ..., \"sample_rate\": ..., \"rate_limit\": ...}")
+    parser.add_argument("--profile", nargs="?", const="auto", choices=PROFILERS,
+                       help="對本任務進行效能分析（未指定分析器時優先使用 yappi），結果存放在任務目錄")
 
     args = parser.parse_args()
 
+    # 本任務的步驟日誌設定（未指定的項目使用設定檔）
+    configure_logging(**json.loads(args.log_options or "{}"))
+
+    # 定期將本進程的指標寫成快照，供伺服器的 /metrics 合併
+    start_snapshot_writer()
+    configure_tracing("auto_survey.worker")
+
+    # 本次任務的所有日誌都帶有任務 ID，並另外寫入 logs/jobs/<id>/job.jsonl；
+    # 追蹤接續主進程經由 TRACEPARENT 環境變數傳入的 span
+    job_id = args.job_id or new_job_id()
+    with job_logging(job_id), resume_from_env():
+        with span(f"worker {args.task_type}", KIND_SERVER, **{"worker.task_type": args.task_type}):
+            with profile_job(job_id, args.task_type, args.profile):
+                await run_task(args)
+
+
+async def run_task(args):
     app_logger.info(f"子進程已啟動，執行任務：{args.task_type}")
     app_logger.info(f"目標 URL: {args.url}")
 
@@ -84,6 +113,14 @@ async def main():
             from src.app.auto_quiz import run_quiz_automation
             await run_quiz_automation(args.url)
             
+        elif args.task_type == "campaign":
+            if not args.campaign:
+                raise ValueError("活動任務需要提供 --campaign 參數")
+            
+            app_logger.info("開始執行多網址活動任務...")
+            from src.app.campaign import run_campaign
+            await run_campaign(json.loads(args.campaign))
+            
         elif args.task_type == "personal_attendance":
             if not args.personal_info:
                 raise ValueError("個人簽到任務需要提供 --personal_info 參數")
@@ -136,6 +173,10 @@ async def main():
     except ValueError as e:
         app_logger.error(f"❌ 參數錯誤: {e}")
         sys.exit(1)
+
+    except CircuitOpenError as e:
+        app_logger.error(f"⛔ 任務 {args.task_type} 已由熔斷器中止: {e}")
+        sys.exit(1)
         
     except Exception as e:
         app_logger.error(f"❌ 子進程執行任務 {args.task_type} 時發生錯誤: {e}")
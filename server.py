@@ -3,22 +3,43 @@ import uvicorn
 import os
 import json
 import csv
+import functools
+import hashlib
+import io
 import sys
 import subprocess
 import asyncio
+import threading
 import time
-from typing import List, Optional
+import uuid
+import zipfile
+from bisect import bisect_left
+from itertools import islice
+from typing import List, Literal, Optional
 from pathlib import Path
 
-from fastapi import FastAPI, Request, BackgroundTasks, HTTPException, Depends, Query
-from fastapi.responses import HTMLResponse, StreamingResponse
+from email_validator import EmailNotValidError, validate_email
+from fastapi import FastAPI, Request, BackgroundTasks, HTTPException, Depends, File, Query, UploadFile
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pretty_loguru import setup_fastapi_logging, configure_uvicorn
-from pydantic import BaseModel, HttpUrl, EmailStr
+from pydantic import BaseModel, Field, HttpUrl, EmailStr
 
 from src.utils.logger_manager import app_logger
+from src.utils.job_log import iter_job_log, job_log_path, log_fields, new_job_id
+from src.utils.log_broadcast import DROPPED, LogBroadcaster
+from src.utils.log_search import LogFilter, LogSearchIndex
+from src.utils.profiling import list_profiles, profile_file_path
+from src.utils import metrics, tracing
+from src.utils.log_reader import (
+    LineIndex, LogSource, decode_cursor, encode_cursor, file_identity, iter_range_lines, read_chunk,
+    tail_lines as read_tail_lines,
+)
 from src.config.manager import ConfigManager
+from src.config.settings import get_setting
+from src.utils.survey_utils import CacheManager, campaign_progress_filename
 
 # 在現有導入後添加
 from src.utils.graceful_shutdown import GracefulShutdown
@@ -31,6 +52,44 @@ config = ConfigManager()
 app = FastAPI(
     title="自動化任務啟動器 API", description="透過 Web 介面啟動簽到與測驗自動化腳本"
 )
+
+
+class NonStreamingGZipMiddleware(GZipMiddleware):
+    """壓縮一般回應；SSE 即時監控需要即時送出每個事件，不經過壓縮"""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/api/log/watch"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+app.add_middleware(NonStreamingGZipMiddleware, minimum_size=1024)
+
+# 追蹤啟動自動化任務的請求；背景任務與子進程的 span 都接在這個請求之下
+TRACED_PATHS = ("/run-automation", "/run-campaign", "/run-personal-automation")
+
+
+@app.on_event("startup")
+def configure_server_tracing():
+    # 只在伺服器啟動時設定：子進程的批次流程也會 import server 取得 user_manager，不能覆寫子進程的服務名稱
+    tracing.configure_tracing("auto_survey.server")
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    if not request.url.path.endswith(TRACED_PATHS):
+        return await call_next(request)
+    with tracing.span(
+        f"{request.method} {request.url.path}", tracing.KIND_SERVER,
+        **{"http.method": request.method, "http.target": request.url.path},
+    ) as span:
+        response = await call_next(request)
+        if span is not None:
+            span.set_attribute("http.status_code", response.status_code)
+        return response
+
+
 # 靜態檔案和模板
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/auto_survey/static", StaticFiles(directory="static"), name="static_proxy")
@@ -38,9 +97,19 @@ templates = Jinja2Templates(directory="templates")
 
 
 # ========== 資料模型 ==========
+class LogOptions(BaseModel):
+    """單一任務的步驟日誌設定，未指定的項目使用設定檔"""
+    mode: Optional[Literal["sync", "async"]] = None
+    step_level: Optional[Literal["TRACE", "DEBUG", "INFO"]] = None
+    sample_rate: Optional[float] = Field(None, ge=0, le=1)
+    rate_limit: Optional[int] = Field(None, ge=0)
+
+
 class AutomationRequest(BaseModel):
     attend_url: HttpUrl
     quiz_url: HttpUrl
+    log_options: Optional[LogOptions] = None
+    profile: Optional[Literal["auto", "yappi", "cprofile"]] = None
 
 
 class PersonalAutomationRequest(BaseModel):
@@ -49,6 +118,19 @@ class PersonalAutomationRequest(BaseModel):
     email: str
     attend_url: HttpUrl
     quiz_url: HttpUrl
+    log_options: Optional[LogOptions] = None
+    profile: Optional[Literal["auto", "yappi", "cprofile"]] = None
+
+
+class CampaignItem(BaseModel):
+    url: HttpUrl
+    type: Literal["attend", "quiz"]
+
+
+class CampaignRequest(BaseModel):
+    items: List[CampaignItem]
+    log_options: Optional[LogOptions] = None
+    profile: Optional[Literal["auto", "yappi", "cprofile"]] = None
 
 
 class User(BaseModel):
@@ -63,13 +145,95 @@ class UserResponse(BaseModel):
 
 
 # ========== 用戶管理器 ==========
+USER_FIELDS = ("id", "name", "email")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判斷 If-None-Match 標頭是否包含目前的 ETag（弱比較）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def query_etag(etag: str, **params) -> str:
+    """在名單版本的 ETag 後加上查詢參數的短雜湊，不同的搜尋、分頁或欄位組合各自有不同的 ETag"""
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    base = etag.removesuffix('"')
+    return f'{base}-{digest}"'
+
+
+def is_valid_email(email: str) -> bool:
+    """以與 EmailStr 相同的規則檢查 Email 格式"""
+    try:
+        validate_email(email, check_deliverability=False)
+        return True
+    except EmailNotValidError:
+        return False
+
+
+def iter_import_rows(upload: UploadFile):
+    """
+    逐列讀取上傳的名單檔案，產生 (列號, 姓名, Email)。
+    CSV 以串流方式解析（標題列不分大小寫，需含 name、email），JSON 為用戶物件陣列或 {"users": [...]}。
+    """
+    filename = (upload.filename or "").lower()
+    if filename.endswith(".json"):
+        data = json.load(io.TextIOWrapper(upload.file, encoding="utf-8-sig"))
+        if isinstance(data, dict):
+            data = data.get("users", [])
+        if not isinstance(data, list):
+            raise ValueError("JSON 檔案必須是用戶陣列")
+        for i, item in enumerate(data, 1):
+            item = item if isinstance(item, dict) else {}
+            yield i, item.get("name"), item.get("email")
+        return
+
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    header = [h.strip().lower() for h in next(reader, [])]
+    if "name" not in header or "email" not in header:
+        raise ValueError("CSV 檔案必須包含 name 和 email 欄位")
+    name_index, email_index = header.index("name"), header.index("email")
+    for values in reader:
+        if not any(v.strip() for v in values):
+            continue
+        name = values[name_index] if name_index < len(values) else ""
+        email = values[email_index] if email_index < len(values) else ""
+        yield reader.line_num, name, email
+
+
 class UserManager:
+    """
+    用戶名單管理
+
+    以 id 與 email 兩個雜湊索引提供 O(1) 查詢；異動以 append-only 日誌（CSV 旁的 .journal，JSON Lines）
+    增量寫入，累積到 COMPACT_THRESHOLD 筆後才整理回 CSV。CSV 仍是匯入匯出的格式；
+    未經由本類別讀取名單的模組須使用 survey_utils.read_user_roster（CSV 加上日誌），直接讀 CSV 會漏掉尚未整理的異動。
+    日誌以 email 為鍵，重播具冪等性，id 與原本相同於每次載入時依順序重新編號。
+    """
+
+    COMPACT_THRESHOLD = 200
+
     def __init__(self, csv_path: str = config.system.csv_path):
         self.csv_path = csv_path
+        self.journal_path = csv_path + ".journal"
         app_logger.info(f"用戶管理器初始化，CSV 檔案路徑: {self.csv_path}")
+        self._lock = threading.RLock()
+        self._by_id: dict = {}
+        self._by_email: dict = {}
+        self._journal_entries = 0
+        self._journal_torn = False
+        self.next_id = 1
+        # 名單版本：每次異動遞增，搭配實例代碼作為 ETag
+        self.version = 0
+        self._instance = uuid.uuid4().hex[:8]
+        self._search_keys: list = []
+        self._search_version = -1
         self.ensure_csv_directory()
-        self.users = self.load_users()
-        self.next_id = max([user["id"] for user in self.users], default=0) + 1
+        self.load_users()
 
     def ensure_csv_directory(self):
         os.makedirs(os.path.dirname(self.csv_path), exist_ok=True)
@@ -79,82 +243,274 @@ class UserManager:
                 writer.writerow(["name", "email"])
 
     def load_users(self) -> List[dict]:
-        users = []
+        """從 CSV 載入名單並重播日誌，重建索引"""
+        with self._lock:
+            self._by_id.clear()
+            self._by_email.clear()
+            self.next_id = 1
+            try:
+                with open(self.csv_path, "r", encoding="utf-8") as f:
+                    reader = csv.DictReader(f)
+                    for row in reader:
+                        if row.get("name") and row.get("email"):
+                            self._apply_add(row["name"].strip(), row["email"].strip())
+            except FileNotFoundError:
+                pass
+            self._journal_entries = self._replay_journal()
+            self.version += 1
+            return self.get_all_users()
+
+    # ---------- 索引操作（不寫入檔案） ----------
+    def _apply_add(self, name: str, email: str) -> Optional[dict]:
+        if email in self._by_email:
+            return None
+        user = {"id": self.next_id, "name": name, "email": email}
+        self._by_id[user["id"]] = user
+        self._by_email[email] = user["id"]
+        self.next_id += 1
+        return user
+
+    def _apply_update(self, old_email: str, name: str, email: str) -> Optional[dict]:
+        user_id = self._by_email.get(old_email)
+        if user_id is None:
+            return None
+        if email != old_email and email in self._by_email:
+            return None
+        user = self._by_id[user_id]
+        del self._by_email[old_email]
+        user.update({"name": name, "email": email})
+        self._by_email[email] = user_id
+        return user
+
+    def _apply_delete(self, email: str) -> bool:
+        user_id = self._by_email.pop(email, None)
+        if user_id is None:
+            return False
+        del self._by_id[user_id]
+        return True
+
+    def _apply_entry(self, entry: dict):
+        op = entry.get("op")
+        if op == "add":
+            self._apply_add(entry["name"], entry["email"])
+        elif op == "update":
+            self._apply_update(entry["old_email"], entry["name"], entry["email"])
+        elif op == "delete":
+            self._apply_delete(entry["email"])
+        elif op == "add_many":
+            for user in entry["users"]:
+                self._apply_add(user["name"], user["email"])
+
+    # ---------- 持久化 ----------
+    def _replay_journal(self) -> int:
+        count = 0
+        self._journal_torn = False
         try:
-            with open(self.csv_path, "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for i, row in enumerate(reader, 1):
-                    if row.get("name") and row.get("email"):
-                        users.append(
-                            {
-                                "id": i,
-                                "name": row["name"].strip(),
-                                "email": row["email"].strip(),
-                            }
-                        )
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._journal_torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 寫到一半的最後一行，略過
+                        continue
+                    self._apply_entry(entry)
+                    count += 1
         except FileNotFoundError:
             pass
-        return users
+        return count
+
+    def _append_journal(self, entry: dict):
+        """寫入一行日誌；寫入成功後才更新索引，並呼叫 _journal_applied"""
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        if self._journal_torn:
+            # 前一次寫入中斷留下不完整的行，先換行避免與新紀錄黏在一起
+            line = "\n" + line
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(line)
+        self._journal_torn = False
+
+    def _journal_applied(self, weight: int = 1):
+        """日誌與索引皆已更新；weight 為此行包含的異動筆數，用於判斷何時整理（整理會將索引寫回 CSV，須在更新索引之後）"""
+        self.version += 1
+        self._journal_entries += weight
+        if self._journal_entries >= self.COMPACT_THRESHOLD:
+            self.compact()
 
     def save_users(self):
-        with open(self.csv_path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["name", "email"])
-            for user in self.users:
-                writer.writerow([user["name"], user["email"]])
+        """將目前名單完整寫回 CSV（原子替換）"""
+        with self._lock:
+            tmp_path = self.csv_path + ".tmp"
+            with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["name", "email"])
+                for user in self._by_id.values():
+                    writer.writerow([user["name"], user["email"]])
+            os.replace(tmp_path, self.csv_path)
+
+    def compact(self):
+        """將日誌整理回 CSV 並清空日誌；先替換 CSV 再清空日誌，期間讀取者重播也不會重複套用"""
+        with self._lock:
+            self.save_users()
+            try:
+                os.remove(self.journal_path)
+            except FileNotFoundError:
+                pass
+            self._journal_entries = 0
+            self._journal_torn = False
 
+    # ---------- 查詢 ----------
     def get_all_users(self) -> List[dict]:
-        return self.users.copy()
+        with self._lock:
+            return list(self._by_id.values())
+
+    @property
+    def etag(self) -> str:
+        return f'W/"{self._instance}-{self.version}"'
+
+    def query_users(self, prefix: Optional[str] = None) -> tuple[str, List[dict]]:
+        """
+        回傳 (ETag, 用戶列表)。提供 prefix 時以排序索引搜尋姓名或 Email 前綴（不分大小寫），
+        索引只在名單異動後的第一次搜尋時重建。
+        """
+        with self._lock:
+            if not prefix or not prefix.strip():
+                return self.etag, list(self._by_id.values())
+            if self._search_version != self.version:
+                self._search_keys = sorted(
+                    key
+                    for user in self._by_id.values()
+                    for key in ((user["name"].lower(), user["id"]), (user["email"].lower(), user["id"]))
+                )
+                self._search_version = self.version
+            prefix = prefix.strip().lower()
+            ids = set()
+            for key, user_id in islice(self._search_keys, bisect_left(self._search_keys, (prefix,)), None):
+                if not key.startswith(prefix):
+                    break
+                ids.add(user_id)
+            return self.etag, [self._by_id[user_id] for user_id in sorted(ids)]
 
     def get_user_by_id(self, user_id: int) -> Optional[dict]:
-        return next((user.copy() for user in self.users if user["id"] == user_id), None)
+        user = self._by_id.get(user_id)
+        return user.copy() if user else None
 
     def get_user_by_email(self, email: str) -> Optional[dict]:
-        return next(
-            (user.copy() for user in self.users if user["email"] == email), None
-        )
+        user_id = self._by_email.get(email)
+        return self._by_id[user_id].copy() if user_id is not None else None
 
+    # ---------- 異動 ----------
     def add_user(self, name: str, email: str) -> dict:
-        if self.get_user_by_email(email):
-            raise ValueError("Email 已存在")
-        new_user = {"id": self.next_id, "name": name, "email": email}
-        self.users.append(new_user)
-        self.next_id += 1
-        self.save_users()
-        return new_user.copy()
+        with self._lock:
+            if email in self._by_email:
+                raise ValueError("Email 已存在")
+            # 先寫入日誌再更新索引，寫入失敗時名單維持不變
+            self._append_journal({"op": "add", "name": name, "email": email})
+            new_user = self._apply_add(name, email).copy()
+            self._journal_applied()
+            return new_user
+
+    def add_users_bulk(self, rows) -> tuple[List[dict], List[dict]]:
+        """
+        一次匯入多位用戶：單次走訪驗證並去除重複，全部有效資料以一行日誌原子寫入
+
+        Args:
+            rows: 可迭代的 (列號, 姓名, Email)
+
+        Returns:
+            (新增的用戶列表, 每列錯誤列表 [{"row", "email", "error"}])
+        """
+        errors = []
+        candidates = []
+        seen = set()
+        # 解析與格式驗證不需持有鎖，避免大型檔案阻塞其他查詢
+        for row_no, name, email in rows:
+            name, email = (name or "").strip(), (email or "").strip()
+            if not name or not email:
+                errors.append({"row": row_no, "email": email, "error": "姓名或 Email 為空"})
+            elif not is_valid_email(email):
+                errors.append({"row": row_no, "email": email, "error": "Email 格式不正確"})
+            elif email in seen:
+                errors.append({"row": row_no, "email": email, "error": "Email 在檔案中重複"})
+            else:
+                seen.add(email)
+                candidates.append((row_no, name, email))
+
+        with self._lock:
+            pending = []
+            for row_no, name, email in candidates:
+                if email in self._by_email:
+                    errors.append({"row": row_no, "email": email, "error": "Email 已存在"})
+                else:
+                    pending.append({"name": name, "email": email})
+            if not pending:
+                return [], sorted(errors, key=lambda e: e["row"])
+            # 先寫入日誌再更新索引，寫入失敗時名單維持不變
+            self._append_journal({"op": "add_many", "users": pending})
+            added = [self._apply_add(user["name"], user["email"]).copy() for user in pending]
+            self._journal_applied(weight=len(pending))
+        return added, sorted(errors, key=lambda e: e["row"])
 
     def update_user(self, user_id: int, name: str, email: str) -> dict:
-        user = self.get_user_by_id(user_id)
-        if not user:
-            raise ValueError("用戶不存在")
-        existing_user = self.get_user_by_email(email)
-        if existing_user and existing_user["id"] != user_id:
-            raise ValueError("Email 已被其他用戶使用")
-
-        for i, u in enumerate(self.users):
-            if u["id"] == user_id:
-                self.users[i].update({"name": name, "email": email})
-                self.save_users()
-                return self.users[i].copy()
-        raise ValueError("用戶不存在")
+        with self._lock:
+            user = self._by_id.get(user_id)
+            if not user:
+                raise ValueError("用戶不存在")
+            existing_id = self._by_email.get(email)
+            if existing_id is not None and existing_id != user_id:
+                raise ValueError("Email 已被其他用戶使用")
+
+            old_email = user["email"]
+            self._append_journal({"op": "update", "old_email": old_email, "name": name, "email": email})
+            self._apply_update(old_email, name, email)
+            updated = user.copy()
+            self._journal_applied()
+            return updated
 
     def delete_user(self, user_id: int) -> bool:
-        for i, user in enumerate(self.users):
-            if user["id"] == user_id:
-                del self.users[i]
-                self.save_users()
-                return True
-        return False
+        with self._lock:
+            user = self._by_id.get(user_id)
+            if not user:
+                return False
+            email = user["email"]
+            self._append_journal({"op": "delete", "email": email})
+            self._apply_delete(email)
+            self._journal_applied()
+            return True
 
 
 user_manager = UserManager()
 
 
 # ========== 日誌管理器 ==========
+LOG_FILE_PREFIX = "[auto_survey]"
+
+
+def log_filter_params(
+    level: Optional[str] = Query(None, description="最低日誌等級，例如 WARNING"),
+    since: Optional[str] = Query(None, description="開始時間（ISO 格式）"),
+    until: Optional[str] = Query(None, description="結束時間（ISO 格式）"),
+    q: Optional[str] = Query(None, description="關鍵字（不分大小寫）"),
+    regex: bool = Query(False, description="q 是否為正規表示式"),
+    job_id: Optional[str] = Query(None, description="任務 ID"),
+    email: Optional[str] = Query(None, description="使用者 email"),
+) -> LogFilter:
+    """由查詢參數建立日誌過濾條件"""
+    try:
+        return LogFilter(level=level, since=since, until=until, text=q, regex=regex, job_id=job_id, email=email)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 class LogManager:
     def __init__(self, log_dir: str = "logs"):
         self.log_dir = Path(log_dir)
         self.log_file = self.log_dir / "[auto_survey]daily_latest.temp.log"
+        self.line_index = LineIndex(self.log_file)
+        self.search_index = LogSearchIndex(self.list_search_sources)
+        # 已輪換的日誌（含 zip 壓縮檔）各自的行位移索引；檔案不再變動，只需建立一次
+        self._archive_indexes: dict[str, LineIndex] = {}
+        self._archive_lock = threading.Lock()
 
     def get_log_path(self) -> Path:
         """獲取日誌文件路徑"""
@@ -168,94 +524,144 @@ class LogManager:
         """獲取文件大小（字節）"""
         return self.log_file.stat().st_size if self.file_exists() else 0
 
-    def get_total_lines(self) -> int:
-        """獲取總行數"""
-        if not self.file_exists():
-            return 0
+    def get_total_lines(self, scope: str = "current") -> int:
+        """獲取總行數（由行位移索引增量維護）；scope="all" 時包含已輪換的日誌"""
         try:
-            with open(self.log_file, "r", encoding="utf-8") as f:
-                return sum(1 for _ in f)
+            return sum(index.total_lines for _, index in self.segments(scope))
         except Exception:
             return 0
 
     def read_lines(
-        self, start_line: int = 0, limit: int = 100
+        self, start_line: int = 0, limit: int = 100, scope: str = "current"
     ) -> tuple[list[str], bool]:
         """
-        讀取指定範圍的行
+        讀取指定範圍的行（透過行位移索引直接 seek 到附近位置）
+        scope="all" 時把已輪換的日誌與當前日誌視為一個連續的串流，行號由最舊的封存檔起算
         返回: (行列表, 是否還有更多行)
         """
-        if not self.file_exists():
+        if scope == "current" and not self.file_exists():
             return [], False
 
-        lines = []
-        has_more = False
-
         try:
-            with open(self.log_file, "r", encoding="utf-8") as f:
-                # 跳過前面的行
-                for _ in range(start_line):
-                    if not f.readline():
-                        break
-
-                # 讀取指定數量的行
-                for i in range(limit):
-                    line = f.readline()
-                    if not line:
-                        break
-                    lines.append(line.rstrip("\n\r"))
-
-                # 檢查是否還有更多行
-                has_more = bool(f.readline())
-
+            lines = []
+            segments = self.segments(scope)
+            for position, (_, index) in enumerate(segments):
+                total = index.total_lines
+                if start_line >= total:
+                    start_line -= total
+                    continue
+                chunk, has_more = index.read_lines(start_line, limit - len(lines))
+                lines.extend(chunk)
+                start_line = 0
+                if len(lines) >= limit:
+                    later = any(other.total_lines for _, other in segments[position + 1:])
+                    return lines, has_more or later
+            return lines, False
         except Exception as e:
             app_logger.error(f"讀取日誌文件錯誤: {e}")
             return [], False
 
-        return lines, has_more
-
-    def tail_lines(self, num_lines: int = 100) -> list[str]:
-        """獲取最後 N 行"""
-        if not self.file_exists():
+    def archive_files(self) -> list[Path]:
+        """已輪換的日誌檔（含 zip 壓縮檔），依修改時間由舊到新排列"""
+        if not self.log_dir.exists():
             return []
+        files = []
+        for path in self.log_dir.iterdir():
+            if not path.name.startswith(LOG_FILE_PREFIX) or path == self.log_file:
+                continue
+            if path.suffix in (".log", ".zip"):
+                try:
+                    files.append((path.stat().st_mtime, path))
+                except FileNotFoundError:
+                    continue  # 剛被保留期限清除
+        return [path for _, path in sorted(files)]
+
+    def _archive_index(self, path: Path) -> LineIndex:
+        with self._archive_lock:
+            index = self._archive_indexes.get(str(path))
+            if index is None:
+                index = self._archive_indexes[str(path)] = LineIndex(LogSource(path))
+            return index
+
+    def segments(self, scope: str = "current") -> list[tuple[str, LineIndex]]:
+        """
+        依時間順序列出邏輯日誌串流的各段 (名稱, 已更新的行位移索引)；
+        scope="current" 只有當前日誌檔，"all" 另含所有已輪換的封存檔
+        """
+        segments = []
+        if scope == "all":
+            archives = self.archive_files()
+            with self._archive_lock:
+                for key in set(self._archive_indexes) - {str(path) for path in archives}:
+                    del self._archive_indexes[key]
+            for path in archives:
+                index = self._archive_index(path)
+                try:
+                    index.refresh()
+                except (OSError, zipfile.BadZipFile) as e:
+                    app_logger.debug(f"略過無法讀取的封存日誌 {path.name}: {e}")
+                    continue
+                if index.identity is not None:
+                    segments.append((path.name, index))
+        self.line_index.refresh()
+        if self.line_index.identity is not None:
+            segments.append((self.log_file.name, self.line_index))
+        return segments
+
+    def archive_info(self) -> list[dict]:
+        """已輪換日誌的清單與行數"""
+        return [
+            {
+                "name": name,
+                "compressed": index.source.compressed,
+                "size": index.size,
+                "total_lines": index.total_lines,
+            }
+            for name, index in self.segments("all")[:-1 if self.file_exists() else None]
+        ]
+
+    def list_search_sources(self) -> list[tuple[str, Path, bool]]:
+        """搜尋範圍：已輪換的檔案與壓縮檔（不再變動）加上當前日誌檔"""
+        sources = [(path.name, path, True) for path in self.archive_files()]
+        sources.append((self.log_file.name, self.log_file, False))
+        return sources
+
+    def search(self, log_filter: LogFilter, limit: int = 100, cursor: Optional[str] = None) -> dict:
+        """以區塊摘要索引搜尋當前與已輪換的日誌檔"""
+        return self.search_index.search(log_filter, limit, cursor)
 
+    def tail_lines(self, num_lines: int = 100, scope: str = "current") -> list[str]:
+        """獲取最後 N 行；scope="all" 且當前日誌不足 N 行時，由較新的封存檔往前補齊"""
         try:
-            with open(self.log_file, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-                return [line.rstrip("\n\r") for line in lines[-num_lines:]]
+            lines = read_tail_lines(self.log_file, num_lines) if self.file_exists() else []
+            if scope != "all" or len(lines) >= num_lines:
+                return lines
+            for _, index in reversed(self.segments("all")[:-1 if self.file_exists() else None]):
+                need = num_lines - len(lines)
+                start = max(0, index.total_lines - need)
+                earlier, _ = index.read_lines(start, need)
+                lines = earlier + lines
+                if len(lines) >= num_lines:
+                    break
+            return lines
         except Exception as e:
             app_logger.error(f"讀取日誌尾部錯誤: {e}")
             return []
 
-    async def watch_file(self, start_pos: int = 0):
-        """
-        監控文件變化，yield 新增的行
-        用於 SSE 即時日誌追蹤
-        """
-        if not self.file_exists():
-            yield f"data: {json.dumps({'error': '日誌文件不存在'})}\n\n"
-            return
-
-        try:
-            with open(self.log_file, "r", encoding="utf-8") as f:
-                # 移動到指定位置
-                f.seek(start_pos)
 
-                while True:
-                    line = f.readline()
-                    if line:
-                        # 發送新行
-                        yield f"data: {json.dumps({'type': 'log', 'content': line.rstrip()})}\n\n"
-                    else:
-                        # 沒有新行，發送心跳
-                        yield f"data: {json.dumps({'type': 'heartbeat', 'timestamp': time.time()})}\n\n"
-                        await asyncio.sleep(1)  # 每秒檢查一次
+log_manager = LogManager()
+log_broadcaster = LogBroadcaster(log_manager.get_log_path())
 
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+# 即時監控：閒置時的心跳間隔（秒）、新行合併成一個事件前的等待時間（毫秒）、每個事件最多行數
+LOG_WATCH_HEARTBEAT = get_setting("log_watch_heartbeat", 15.0, float)
+LOG_WATCH_FLUSH_MS = get_setting("log_watch_flush_ms", 200, int)
+LOG_WATCH_MAX_BATCH = 500
 
 
-log_manager = LogManager()
+def sse_frame(payload: dict, event_id: Optional[str] = None) -> str:
+    """組成一個 SSE 事件；event_id 讓瀏覽器重新連線時以 Last-Event-ID 帶回"""
+    frame = f"id: {event_id}\n" if event_id else ""
+    return frame + f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
 
 
 # ========== 工具函數 ==========
@@ -282,63 +688,144 @@ def verify_editor_access(
         )
 
 
-def run_task_in_subprocess(task_type: str, url: str, personal_info: dict = None):
-    """執行子進程任務 - 實時輸出版本"""
-    command = [sys.executable, "playwright_worker.py", task_type, "--url", url]
+def log_options_dict(options: Optional[LogOptions]) -> Optional[dict]:
+    """只保留有指定的步驟日誌設定"""
+    if options is None:
+        return None
+    return options.model_dump(exclude_none=True) or None
+
+
+def with_job_context(func):
+    """
+    背景任務執行期間，主進程的日誌也帶有任務 ID（以關鍵字參數 job_id 傳入）；
+    並以 traceparent 關鍵字參數接續觸發此任務的請求 span
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, traceparent=None, **kwargs):
+        with log_fields(job_id=kwargs.get("job_id")), tracing.resume(traceparent):
+            with tracing.span(func.__name__, **{"job.id": kwargs.get("job_id")}):
+                return func(*args, **kwargs)
+
+    return wrapper
+
+
+def run_task_in_subprocess(
+    task_type: str, url: str = None, personal_info: dict = None, campaign_items: list = None,
+    job_id: str = None, log_options: dict = None, profile: str = None,
+):
+    """執行子進程任務 - 實時輸出版本，回傳是否成功；profile 指定時子進程以該分析器進行效能分析"""
+    command = [sys.executable, "playwright_worker.py", task_type]
+    if job_id:
+        command.extend(["--job_id", job_id])
+    if log_options:
+        command.extend(["--log_options", json.dumps(log_options)])
+    if profile:
+        command.extend(["--profile", profile])
+    if url:
+        command.extend(["--url", url])
     if personal_info:
         command.extend(["--personal_info", json.dumps(personal_info)])
+    if campaign_items:
+        command.extend(["--campaign", json.dumps(campaign_items)])
 
     app_logger.info(f"主進程：準備執行子進程命令: {' '.join(command)}")
     
     try:
-        # 方案1：讓子進程直接輸出到控制台（實時顯示）
-        result = subprocess.run(
-            command, 
-            check=False,
-            text=True, 
-            encoding="utf-8"
-            # 不使用 capture_output=True，讓輸出直接顯示
-        )
+        # 方案1：讓子進程直接輸出到控制台（實時顯示）；子進程經由 TRACEPARENT 接續此 span
+        with tracing.span(f"subprocess {task_type}", tracing.KIND_CLIENT, **{"worker.task_type": task_type}) as span:
+            env = dict(os.environ)
+            if span is not None:
+                env[tracing.TRACEPARENT_ENV] = span.traceparent
+            result = subprocess.run(
+                command, 
+                check=False,
+                text=True, 
+                encoding="utf-8",
+                env=env,
+                # 不使用 capture_output=True，讓輸出直接顯示
+            )
+            if span is not None:
+                span.set_attribute("process.exit_code", result.returncode)
         
         if result.returncode != 0:
             app_logger.error(f"❌ 子進程任務 '{task_type}' 執行失敗，返回碼: {result.returncode}")
-        else:
-            app_logger.info(f"✅ 子進程任務 '{task_type}' 執行成功。")
+            return False
+        app_logger.info(f"✅ 子進程任務 '{task_type}' 執行成功。")
+        return True
 
     except FileNotFoundError:
         app_logger.error("❌ 錯誤：找不到 'playwright_worker.py'")
     except Exception as e:
         app_logger.error(f"❌ 執行子進程時發生錯誤: {e}")
+    return False
+
+
+def record_job_result(job_type: str, succeeded: bool):
+    metrics.inc("jobs_total", type=job_type, status="completed" if succeeded else "failed")
 
 
-def run_tasks_in_background(attend_url: str, quiz_url: str):
+@with_job_context
+def run_tasks_in_background(
+    attend_url: str, quiz_url: str, job_id: str, log_options: dict = None, profile: str = None
+):
     """批次處理背景任務"""
     app_logger.info("🚀 批次背景任務已啟動")
+    worker_options = {"job_id": job_id, "log_options": log_options, "profile": profile}
+    succeeded = False
     try:
+        succeeded = True
         if attend_url:
-            run_task_in_subprocess("batch_attendance", attend_url)
+            succeeded &= run_task_in_subprocess("batch_attendance", attend_url, **worker_options)
         if quiz_url:
-            run_task_in_subprocess("batch_quiz", quiz_url)
+            succeeded &= run_task_in_subprocess("batch_quiz", quiz_url, **worker_options)
         app_logger.info("✅ 所有批次背景任務觸發完畢")
     except Exception as e:
+        succeeded = False
         app_logger.error(f"❌ 批次背景任務發生錯誤: {e}")
+    finally:
+        record_job_result("batch", succeeded)
+
+
+@with_job_context
+def run_campaign_in_background(items: list, job_id: str, log_options: dict = None, profile: str = None):
+    """多網址活動背景任務：所有網址在同一個子進程內共用瀏覽器池"""
+    app_logger.info(f"🚀 活動背景任務已啟動，共 {len(items)} 個網址")
+    succeeded = False
+    try:
+        succeeded = run_task_in_subprocess(
+            "campaign", campaign_items=items, job_id=job_id, log_options=log_options, profile=profile
+        )
+        app_logger.info("✅ 活動背景任務觸發完畢")
+    except Exception as e:
+        app_logger.error(f"❌ 活動背景任務發生錯誤: {e}")
+    finally:
+        record_job_result("campaign", succeeded)
 
 
+@with_job_context
 def run_personal_tasks_in_background(
-    company_name: str, name: str, email: str, attend_url: str, quiz_url: str
+    company_name: str, name: str, email: str, attend_url: str, quiz_url: str, job_id: str,
+    log_options: dict = None, profile: str = None,
 ):
     """個人處理背景任務"""
     app_logger.info(f"🧑‍💼 個人背景任務已啟動 - {name} ({email}) - {company_name}")
     personal_info = {"name": name, "email": email, "company_name": company_name}
+    worker_options = {"job_id": job_id, "log_options": log_options, "profile": profile}
 
+    succeeded = False
     try:
+        succeeded = True
         if attend_url:
-            run_task_in_subprocess("personal_attendance", attend_url, personal_info)
+            succeeded &= run_task_in_subprocess("personal_attendance", attend_url, personal_info, **worker_options)
         if quiz_url:
-            run_task_in_subprocess("personal_quiz", quiz_url, personal_info)
+            succeeded &= run_task_in_subprocess("personal_quiz", quiz_url, personal_info, **worker_options)
         app_logger.info(f"✅ {name} 的個人任務觸發完畢")
     except Exception as e:
+        succeeded = False
         app_logger.error(f"❌ {name} 的個人任務發生錯誤: {e}")
+    finally:
+        record_job_result("personal", succeeded)
 
 
 # ========== 路由註冊器 ==========
@@ -377,92 +864,132 @@ def register_routes():
 
     # 日誌 API 路由
     @app.get("/api/log/info")
-    async def get_log_info():
+    async def get_log_info(
+        scope: Literal["current", "all"] = Query("current", description="all 時一併列出已輪換的封存日誌"),
+    ):
         """獲取日誌文件基本資訊"""
-        return {
+        info = {
             "file_exists": log_manager.file_exists(),
             "file_size": log_manager.get_file_size(),
-            "total_lines": log_manager.get_total_lines(),
+            "total_lines": await asyncio.to_thread(log_manager.get_total_lines, scope),
             "file_path": str(log_manager.get_log_path()),
+            "scope": scope,
         }
+        if scope == "all":
+            info["archives"] = await asyncio.to_thread(log_manager.archive_info)
+        return info
 
     @app.get("/api/log")
     async def get_log_content(
         page: int = Query(1, ge=1, description="頁碼，從1開始"),
         limit: int = Query(100, ge=1, le=1000, description="每頁行數，最大1000"),
         tail: Optional[int] = Query(None, ge=1, le=5000, description="獲取最後N行"),
+        scope: Literal["current", "all"] = Query("current", description="all 時包含已輪換（含壓縮）的日誌"),
     ):
         """
         分頁獲取日誌內容
         - page: 頁碼
         - limit: 每頁行數
         - tail: 如果指定，則忽略分頁，直接返回最後N行
+        - scope: all 時把封存日誌與當前日誌視為一個連續的串流（壓縮檔以串流方式解壓）
         """
-        if not log_manager.file_exists():
+        if scope == "current" and not log_manager.file_exists():
             raise HTTPException(status_code=404, detail="日誌文件不存在")
 
         if tail:
             # 返回最後 N 行
-            lines = log_manager.tail_lines(tail)
+            lines = await asyncio.to_thread(log_manager.tail_lines, tail, scope)
             return {
                 "mode": "tail",
+                "scope": scope,
                 "lines": lines,
                 "count": len(lines),
-                "total_lines": log_manager.get_total_lines(),
+                "total_lines": await asyncio.to_thread(log_manager.get_total_lines, scope),
             }
 
         # 分頁模式
         start_line = (page - 1) * limit
-        lines, has_more = log_manager.read_lines(start_line, limit)
+        lines, has_more = await asyncio.to_thread(log_manager.read_lines, start_line, limit, scope)
 
         return {
             "mode": "paginated",
+            "scope": scope,
             "page": page,
             "limit": limit,
             "lines": lines,
             "count": len(lines),
             "has_more": has_more,
-            "total_lines": log_manager.get_total_lines(),
+            "total_lines": await asyncio.to_thread(log_manager.get_total_lines, scope),
         }
 
     @app.get("/api/log/stream")
     async def stream_log_content(
         start_line: int = Query(0, ge=0, description="開始行數"),
         chunk_size: int = Query(50, ge=1, le=200, description="每次傳送行數"),
+        cursor: Optional[str] = Query(None, description="上次回應中的游標，從該位置續傳"),
+        chunk_bytes: Optional[int] = Query(
+            None, ge=1024, le=4 * 1024 * 1024, description="每次傳送約多少位元組（指定時忽略 chunk_size）"
+        ),
     ):
         """
         串流方式傳送日誌內容（非即時）
-        適合一次性讀取大型日誌文件
+        在單一檔案代號上以位元組位移游標線性讀取，每段回應都附帶可續傳的 cursor
         """
         if not log_manager.file_exists():
             raise HTTPException(status_code=404, detail="日誌文件不存在")
 
-        async def generate_log_chunks():
-            current_line = start_line
-
-            while True:
-                lines, has_more = log_manager.read_lines(current_line, chunk_size)
-
-                if not lines:
-                    break
+        start_offset = None
+        if cursor:
+            try:
+                cursor_identity, start_offset = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
 
-                chunk_data = {
-                    "lines": lines,
-                    "start_line": current_line,
-                    "count": len(lines),
-                    "has_more": has_more,
-                }
+        async def generate_log_chunks():
+            with open(log_manager.get_log_path(), "rb") as f:
+                identity = file_identity(os.fstat(f.fileno()))
+                reset = False
+                current_line = None
+                if start_offset is not None:
+                    # 游標指向已輪換的舊檔案或超出檔尾時，從新檔案開頭重新開始
+                    if cursor_identity != identity or start_offset > os.fstat(f.fileno()).st_size:
+                        reset = True
+                        f.seek(0)
+                        current_line = 0
+                    else:
+                        f.seek(start_offset)
+                else:
+                    # 建立或更新行索引需讀取整個檔案，交給執行緒處理，避免阻塞事件迴圈
+                    await asyncio.to_thread(log_manager.line_index.seek_line, f, start_line)
+                    current_line = start_line
 
-                yield f"data: {json.dumps(chunk_data)}\n\n"
+                while True:
+                    lines = await asyncio.to_thread(read_chunk, f, chunk_bytes=chunk_bytes, max_lines=chunk_size)
+                    if not lines:
+                        break
 
-                if not has_more:
-                    break
+                    has_more = f.tell() < os.fstat(f.fileno()).st_size
+                    chunk_data = {
+                        "lines": lines,
+                        "start_line": current_line,
+                        "count": len(lines),
+                        "has_more": has_more,
+                        "cursor": encode_cursor(identity, f.tell()),
+                    }
+                    if reset:
+                        chunk_data["reset"] = True
+                        reset = False
+
+                    yield f"data: {json.dumps(chunk_data)}\n\n"
+
+                    if not has_more:
+                        break
 
-                current_line += len(lines)
-                await asyncio.sleep(0.1)  # 避免阻塞
+                    if current_line is not None:
+                        current_line += len(lines)
 
-            # 發送結束信號
-            yield f"data: {json.dumps({'type': 'end'})}\n\n"
+                # 發送結束信號（附帶游標，之後可從此處續傳新增的內容）
+                yield f"data: {json.dumps({'type': 'end', 'cursor': encode_cursor(identity, f.tell())})}\n\n"
 
         return StreamingResponse(
             generate_log_chunks(),
@@ -472,31 +999,93 @@ def register_routes():
 
     @app.get("/api/log/watch")
     async def watch_log_realtime(
-        tail: int = Query(10, ge=0, le=100, description="初始顯示最後N行")
+        request: Request,
+        tail: int = Query(10, ge=0, le=100, description="初始顯示最後N行"),
+        last_event_id: Optional[str] = Query(None, description="從指定事件 ID 之後續傳（等同 Last-Event-ID 標頭）"),
+        log_filter: LogFilter = Depends(log_filter_params),
     ):
         """
         SSE 即時監控日誌
-        會先發送最後 N 行，然後即時推送新增的日誌
+        新行在短暫間隔內合併為一個 batch 事件送出，事件 ID 為檔案位移；
+        瀏覽器重新連線時帶回 Last-Event-ID，只補送斷線期間的新行而不重送歷史記錄。
+        指定過濾條件時只送出符合的行（歷史記錄為最後 N 行中符合的部分）
         """
         if not log_manager.file_exists():
             raise HTTPException(status_code=404, detail="日誌文件不存在")
 
-        async def generate_realtime_logs():
-            # 先發送 SSE 標頭
-            yield f"data: {json.dumps({'type': 'connected', 'message': '已連接到日誌監控'})}\n\n"
+        resume_id = request.headers.get("last-event-id") or last_event_id
+        flush_interval = LOG_WATCH_FLUSH_MS / 1000
 
-            # 發送最後 N 行作為歷史記錄
-            if tail > 0:
-                history_lines = log_manager.tail_lines(tail)
-                for line in history_lines:
-                    yield f"data: {json.dumps({'type': 'history', 'content': line})}\n\n"
+        def select(lines):
+            if not log_filter.active:
+                return lines
+            return [line for line in lines if log_filter.matches(line)]
 
-            # 獲取當前文件大小作為起始位置
-            start_pos = log_manager.get_file_size()
+        async def generate_realtime_logs():
+            # 訂閱共用的日誌讀取者，所有連線共用同一個檔案代號
+            subscription = log_broadcaster.subscribe()
+            log_path = log_manager.get_log_path()
+            try:
+                yield sse_frame({'type': 'connected', 'message': '已連接到日誌監控'})
+
+                resume_offset = None
+                if resume_id:
+                    try:
+                        identity, offset = decode_cursor(resume_id)
+                        if identity == subscription.identity and offset <= subscription.start_offset:
+                            resume_offset = offset
+                    except ValueError:
+                        pass
+
+                if resume_offset is not None:
+                    # 續傳：補送斷線期間寫入的行
+                    for lines, end_offset in iter_range_lines(
+                        log_path, resume_offset, subscription.start_offset, LOG_WATCH_MAX_BATCH
+                    ):
+                        lines = select(lines)
+                        if lines:
+                            yield sse_frame(
+                                {'type': 'batch', 'lines': lines},
+                                encode_cursor(subscription.identity, end_offset),
+                            )
+                elif tail > 0 and subscription.identity is not None:
+                    # 訂閱時間點之前的最後 N 行，合併為一個事件
+                    history_lines = select(read_tail_lines(log_path, tail, end=subscription.start_offset))
+                    yield sse_frame(
+                        {'type': 'batch', 'history': True, 'lines': history_lines},
+                        encode_cursor(subscription.identity, subscription.start_offset),
+                    )
 
-            # 開始即時監控
-            async for event in log_manager.watch_file(start_pos):
-                yield event
+                while True:
+                    try:
+                        item = await asyncio.wait_for(subscription.get(), timeout=LOG_WATCH_HEARTBEAT)
+                    except asyncio.TimeoutError:
+                        yield sse_frame({'type': 'heartbeat', 'timestamp': time.time()})
+                        continue
+
+                    # 等待一小段時間，把這期間的新行合併成一個事件
+                    items = [item]
+                    if item is not DROPPED:
+                        await asyncio.sleep(flush_interval)
+                        while len(items) < LOG_WATCH_MAX_BATCH and items[-1] is not DROPPED:
+                            try:
+                                items.append(subscription.get_nowait())
+                            except asyncio.QueueEmpty:
+                                break
+
+                    received = [i for i in items if i is not DROPPED]
+                    lines = select([i.text for i in received])
+                    if lines:
+                        yield sse_frame(
+                            {'type': 'batch', 'lines': lines},
+                            encode_cursor(received[-1].identity, received[-1].offset),
+                        )
+                    if items[-1] is DROPPED:
+                        # 中斷後瀏覽器會以 Last-Event-ID 重新連線並從上次位置續傳
+                        yield sse_frame({'type': 'error', 'message': '連線處理過慢，已中斷日誌監控'})
+                        break
+            finally:
+                subscription.close()
 
         return StreamingResponse(
             generate_realtime_logs(),
@@ -508,37 +1097,106 @@ def register_routes():
             },
         )
 
+    @app.get("/api/log/search")
+    def search_log(
+        limit: int = Query(100, ge=1, le=1000, description="最多回傳幾筆"),
+        cursor: Optional[str] = Query(None, description="上次結果的 next_cursor，從該位置之後繼續"),
+        log_filter: LogFilter = Depends(log_filter_params),
+    ):
+        """
+        搜尋當前與已輪換的日誌檔，只回傳符合過濾條件的行
+        以區塊摘要索引略過不可能符合的區塊；結果依時間順序排列，has_more 時以 next_cursor 取得下一頁
+        """
+        if not log_filter.active:
+            raise HTTPException(status_code=400, detail="請至少指定一個搜尋條件")
+        try:
+            return log_manager.search(log_filter, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     # 為代理訪問添加日誌 API
     @app.get("/auto_survey/api/log/info")
-    async def get_log_info_proxy():
-        return await get_log_info()
+    async def get_log_info_proxy(scope: Literal["current", "all"] = Query("current")):
+        return await get_log_info(scope)
 
     @app.get("/auto_survey/api/log")
     async def get_log_content_proxy(
         page: int = Query(1, ge=1),
         limit: int = Query(100, ge=1, le=1000),
         tail: Optional[int] = Query(None, ge=1, le=5000),
+        scope: Literal["current", "all"] = Query("current"),
     ):
-        return await get_log_content(page, limit, tail)
+        return await get_log_content(page, limit, tail, scope)
 
     @app.get("/auto_survey/api/log/stream")
     async def stream_log_content_proxy(
-        start_line: int = Query(0, ge=0), chunk_size: int = Query(50, ge=1, le=200)
+        start_line: int = Query(0, ge=0),
+        chunk_size: int = Query(50, ge=1, le=200),
+        cursor: Optional[str] = Query(None),
+        chunk_bytes: Optional[int] = Query(None, ge=1024, le=4 * 1024 * 1024),
     ):
-        return await stream_log_content(start_line, chunk_size)
+        return await stream_log_content(start_line, chunk_size, cursor, chunk_bytes)
 
     @app.get("/auto_survey/api/log/watch")
-    async def watch_log_realtime_proxy(tail: int = Query(10, ge=0, le=100)):
-        return await watch_log_realtime(tail)
+    async def watch_log_realtime_proxy(
+        request: Request,
+        tail: int = Query(10, ge=0, le=100),
+        last_event_id: Optional[str] = Query(None),
+        log_filter: LogFilter = Depends(log_filter_params),
+    ):
+        return await watch_log_realtime(request, tail, last_event_id, log_filter)
+
+    @app.get("/auto_survey/api/log/search")
+    def search_log_proxy(
+        limit: int = Query(100, ge=1, le=1000),
+        cursor: Optional[str] = Query(None),
+        log_filter: LogFilter = Depends(log_filter_params),
+    ):
+        return search_log(limit, cursor, log_filter)
 
     # API 路由
     api_prefixes = ["", "/auto_survey"]
 
     for prefix in api_prefixes:
         # 用戶 CRUD
-        @app.get(f"{prefix}/api/users", response_model=List[UserResponse])
-        async def get_users():
-            return user_manager.get_all_users()
+        @app.get(f"{prefix}/api/users")
+        async def get_users(
+            request: Request,
+            page: Optional[int] = Query(None, ge=1),
+            page_size: int = Query(100, ge=1, le=1000),
+            q: Optional[str] = Query(None, max_length=100),
+            fields: Optional[str] = Query(None),
+        ):
+            """
+            用戶列表。回應本體維持為用戶陣列；總筆數放在 X-Total-Count 標頭。
+            提供 page 時分頁，q 搜尋姓名或 Email 前綴，fields 指定回傳欄位（逗號分隔）。
+            名單未異動時，帶 If-None-Match 的請求回傳 304。
+            """
+            wanted = None
+            if fields:
+                wanted = [f.strip() for f in fields.split(",") if f.strip()]
+                unknown = set(wanted) - set(USER_FIELDS)
+                if unknown:
+                    raise HTTPException(status_code=400, detail=f"未知的欄位: {', '.join(sorted(unknown))}")
+
+            etag, users = user_manager.query_users(q)
+            etag = query_etag(
+                etag,
+                q=(q or "").strip().lower(),
+                page=page,
+                page_size=page_size if page is not None else None,
+                fields=wanted or None,
+            )
+            headers = {"ETag": etag, "Cache-Control": "no-cache"}
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=headers)
+
+            headers["X-Total-Count"] = str(len(users))
+            if page is not None:
+                users = users[(page - 1) * page_size : page * page_size]
+            if wanted:
+                users = [{f: user[f] for f in wanted} for user in users]
+            return JSONResponse(content=users, headers=headers)
 
         @app.post(f"{prefix}/api/users", response_model=UserResponse)
         async def create_user(user: User, _=Depends(verify_editor_access)):
@@ -547,6 +1205,15 @@ def register_routes():
             except ValueError as e:
                 raise HTTPException(status_code=400, detail=str(e))
 
+        @app.post(f"{prefix}/api/users/bulk")
+        def import_users(file: UploadFile = File(...), _=Depends(verify_editor_access)):
+            try:
+                added, errors = user_manager.add_users_bulk(iter_import_rows(file))
+            except (ValueError, UnicodeDecodeError, csv.Error) as e:
+                raise HTTPException(status_code=400, detail=f"無法解析匯入檔案: {e}")
+            app_logger.info(f"批次匯入用戶：新增 {len(added)} 筆，錯誤 {len(errors)} 筆")
+            return {"added": len(added), "users": added, "errors": errors}
+
         @app.get(f"{prefix}/api/users/{{user_id}}", response_model=UserResponse)
         async def get_user(user_id: int):
             user = user_manager.get_user_by_id(user_id)
@@ -589,13 +1256,117 @@ def register_routes():
             app_logger.info(
                 f"收到批次請求: 簽到 URL='{attend_url}', 測驗 URL='{quiz_url}', 用戶數={len(users)}"
             )
-            background_tasks.add_task(run_tasks_in_background, attend_url, quiz_url)
+            job_id = new_job_id()
+            tracing.set_current_attribute("job.id", job_id)
+            metrics.inc("jobs_total", type="batch", status="accepted")
+            background_tasks.add_task(
+                run_tasks_in_background, attend_url, quiz_url,
+                job_id=job_id, log_options=log_options_dict(payload.log_options), profile=payload.profile,
+                traceparent=tracing.current_traceparent(),
+            )
 
             return {
                 "status": "success",
                 "message": f"批次請求已接收 (共 {len(users)} 位用戶)，自動化任務已在背景子進程開始執行。",
+                "job_id": job_id,
+            }
+
+        @app.post(f"{prefix}/run-campaign")
+        async def start_campaign(
+            payload: CampaignRequest, background_tasks: BackgroundTasks
+        ):
+            if not payload.items:
+                raise HTTPException(status_code=400, detail="活動至少需要一個網址。")
+
+            users = user_manager.get_all_users()
+            if not users:
+                raise HTTPException(
+                    status_code=400, detail="請先新增用戶資料才能啟動批次任務。"
+                )
+
+            items = [{"url": str(item.url), "type": item.type} for item in payload.items]
+            app_logger.info(f"收到活動請求: 網址數={len(items)}, 用戶數={len(users)}")
+            job_id = new_job_id()
+            tracing.set_current_attribute("job.id", job_id)
+            metrics.inc("jobs_total", type="campaign", status="accepted")
+            background_tasks.add_task(
+                run_campaign_in_background, items,
+                job_id=job_id, log_options=log_options_dict(payload.log_options), profile=payload.profile,
+                traceparent=tracing.current_traceparent(),
+            )
+
+            return {
+                "status": "success",
+                "message": f"活動請求已接收 ({len(items)} 個網址 × {len(users)} 位用戶)，已在背景子進程開始執行。",
+                "job_id": job_id,
             }
 
+        @app.get(f"{prefix}/api/jobs/{{job_id}}/log")
+        def get_job_log(
+            job_id: str,
+            offset: int = Query(0, ge=0, description="從指定位元組位移開始（續傳用，見 X-Next-Offset）"),
+            user: Optional[str] = Query(None, description="只回傳指定使用者 email 的記錄"),
+        ):
+            """
+            串流單一任務的 JSONL 日誌，直接讀取 logs/jobs/<id>/job.jsonl，不經過全域日誌。
+            X-Next-Offset 為本次回應讀到的位置，任務仍在執行時可帶入 offset 取得後續記錄
+            """
+            try:
+                path = job_log_path(job_id)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if not path.exists():
+                raise HTTPException(status_code=404, detail="任務日誌不存在")
+
+            end = path.stat().st_size
+            start = min(offset, end)
+            return StreamingResponse(
+                iter_job_log(path, start, end, user),
+                media_type="application/x-ndjson",
+                headers={"X-Next-Offset": str(end), "Cache-Control": "no-cache"},
+            )
+
+        @app.get(f"{prefix}/api/jobs/{{job_id}}/profiles")
+        def get_job_profiles(job_id: str):
+            """列出任務的效能分析結果（以 profile 參數或 --profile 啟動的任務）"""
+            try:
+                return {"job_id": job_id, "profiles": list_profiles(job_id)}
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        @app.get(f"{prefix}/api/jobs/{{job_id}}/profiles/{{filename}}")
+        def download_job_profile(job_id: str, filename: str):
+            """下載效能分析檔案：.pstats 可用 snakeviz 等工具開啟，.txt 為文字摘要"""
+            try:
+                path = profile_file_path(job_id, filename)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if not path.is_file():
+                raise HTTPException(status_code=404, detail="效能分析檔案不存在")
+            media_type = "text/plain; charset=utf-8" if path.suffix == ".txt" else "application/octet-stream"
+            return FileResponse(path, media_type=media_type, filename=filename)
+
+        @app.get(f"{prefix}/metrics")
+        def get_metrics():
+            """Prometheus 指標：合併伺服器與各子進程（survey_cache/metrics 下的快照）的計數"""
+            return Response(
+                metrics.render(metrics.collect()),
+                media_type="text/plain; version=0.0.4; charset=utf-8",
+            )
+
+        @app.get(f"{prefix}/api/campaign/progress")
+        async def get_campaign_progress(
+            key: str = Query(..., description="活動的任務 ID（/run-campaign 回應中的 job_id）或 CLI 執行時日誌中的活動鍵"),
+        ):
+            try:
+                filename = campaign_progress_filename(key)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            progress = CacheManager().load_json_file(filename)
+            if not progress:
+                raise HTTPException(status_code=404, detail="尚無此活動的進度")
+            return progress
+
         @app.post(f"{prefix}/run-personal-automation")
         async def start_personal_automation(
             payload: PersonalAutomationRequest, background_tasks: BackgroundTasks
@@ -613,6 +1384,9 @@ def register_routes():
 
             company_name, name, email, attend_url, quiz_url = data
             app_logger.info(f"收到個人請求: {name} ({email}) - {company_name}")
+            job_id = new_job_id()
+            tracing.set_current_attribute("job.id", job_id)
+            metrics.inc("jobs_total", type="personal", status="accepted")
 
             background_tasks.add_task(
                 run_personal_tasks_in_background,
@@ -621,11 +1395,16 @@ def register_routes():
                 email,
                 attend_url,
                 quiz_url,
+                job_id=job_id,
+                log_options=log_options_dict(payload.log_options),
+                profile=payload.profile,
+                traceparent=tracing.current_traceparent(),
             )
 
             return {
                 "status": "success",
                 "message": f"個人請求已接收，{name} 的自動化任務已在背景子進程開始執行。",
+                "job_id": job_id,
             }
 
 
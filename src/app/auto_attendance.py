@@ -5,8 +5,10 @@
 使用共用模組，專注於簽到特有功能，並加入快取系統
 """
 import asyncio
+from src.utils.circuit_breaker import CircuitOpenError
 from src.utils.survey_utils import CacheManager, batch_process_forms, batch_process_forms_from_manager
 
+from src.utils.log_pipeline import step_log
 from src.utils.logger_manager import app_logger
 from src.config.manager import ConfigManager
 config = ConfigManager()
@@ -24,16 +26,17 @@ async def fill_attendance_form(page, name):
     """
     # 簽到表單通常只需要基本欄位（姓名、Email、公司、同意書）
     # 這些已經在 fill_basic_form_fields 和 fill_agreement_checkbox 中處理
-    app_logger.info(f"{name} 的簽到表單特有邏輯處理完成")
+    step_log(f"{name} 的簽到表單特有邏輯處理完成")
     pass
 
 # ========== 主流程函式 (可被外部呼叫) ==========
-async def run_attendance_automation(survey_url: str):
+async def run_attendance_automation(survey_url: str, browser_pool=None):
     """
     執行自動簽到流程的主函式。
 
     Args:
         survey_url (str): 要處理的簽到問卷網址。
+        browser_pool (BrowserPool, optional): 共用瀏覽器池，未提供時由批次自行建立。
     """
     app_logger.info(f"=== 開始自動簽到流程（目標 URL: {survey_url}）===")
     
@@ -57,7 +60,8 @@ async def run_attendance_automation(survey_url: str):
                 user_manager=user_manager,
                 company_name=company_name,
                 cache_manager=cache_manager,
-                custom_fill_func=fill_attendance_form
+                custom_fill_func=fill_attendance_form,
+                browser_pool=browser_pool
             )
         except ImportError:
             # 如果無法導入用戶管理器，回退到 CSV 模式
@@ -67,8 +71,12 @@ async def run_attendance_automation(survey_url: str):
                 csv_path=CSV_PATH,
                 company_name=company_name,
                 cache_manager=cache_manager,
-                custom_fill_func=fill_attendance_form
+                custom_fill_func=fill_attendance_form,
+                browser_pool=browser_pool
             )
+    except CircuitOpenError:
+        # 目標網址本身故障，回退到 CSV 模式也只會再失敗一次
+        raise
     except Exception as e:
         app_logger.error(f"簽到處理過程中發生錯誤: {e}")
         # 回退到 CSV 模式
@@ -78,7 +86,8 @@ async def run_attendance_automation(survey_url: str):
             csv_path=CSV_PATH,
             company_name=company_name,
             cache_manager=cache_manager,
-            custom_fill_func=fill_attendance_form
+            custom_fill_func=fill_attendance_form,
+            browser_pool=browser_pool
         )
     
     app_logger.info(f"\n=== 自動簽到完成！快取檔案位置: {cache_manager.cache_dir} ===")
@@ -7,12 +7,29 @@ import json
 import re
 import asyncio
 import random
+import time
 from datetime import datetime
-from src.utils.survey_utils import CacheManager, batch_process_forms, batch_process_forms_from_manager
-from playwright.async_api import async_playwright
+from src.utils.survey_utils import (
+    CacheManager, batch_process_forms, batch_process_forms_from_manager, open_form_page, read_user_roster
+)
+from src.utils.browser_pool import ensure_pool
+from src.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
 
 from src.config.manager import ConfigManager
+from src.config.settings import get_setting
+from src.utils.job_log import with_user_context
+from src.utils.latency import get_latency_tracker
+from src.utils.log_pipeline import step_log
 from src.utils.logger_manager import app_logger
+from src.utils.metrics import count_user_result, inc, timer
+from src.utils.pacing import get_pacing_engine
+from src.utils.quiz_dom import answer_quiz_bulk, build_answer_plan, build_option_index
+from src.utils.retry import (
+    LLM_ERROR, LLMError, RetryEngine, RetryExhaustedError, SubmitUnconfirmedError, classify_failure, retry_call
+)
+from src.utils.score_capture import ScoreCapture, parse_score_text
+from src.utils.timings import batch_timings, timed_step, with_session_timings
+from src.utils.tracing import span
 
 config = ConfigManager()
 
@@ -22,6 +39,9 @@ CSV_PATH = config.system.csv_path
 openai_model = config.system.openai_model
 company_name = config.system.company_name
 
+# LLM 分析失敗時原地重試的次數
+LLM_ATTEMPTS = 3
+
 class QuizCacheManager(CacheManager):
     """問卷專用的快取管理器"""
     
@@ -43,23 +63,49 @@ class QuizCacheManager(CacheManager):
         }
         self.save_json_file("quiz_analysis.json", data)
 
-async def extract_html_content(url, cache_manager):
+async def extract_html_content(url, cache_manager, browser_pool=None):
     """抓取並清理HTML內容"""
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
-        page = await browser.new_page()
-        await page.goto(url)
-        await page.wait_for_timeout(3000)
-        
-        # 獲取純文字內容
-        body_content = await page.locator('body').text_content()
-        await browser.close()
+    async with ensure_pool(browser_pool) as pool:
+        async with pool.session() as session:
+            page = session.page
+            await open_form_page(page, url, wait_until="load")
+            await page.wait_for_timeout(3000)
+            
+            # 獲取純文字內容
+            body_content = await page.locator('body').text_content()
         
         # 簡單清理
         cleaned = re.sub(r'\s+', ' ', body_content).strip()
         app_logger.info(f"抓取完成，內容長度: {len(cleaned)}")
         return cleaned
 
+async def get_quiz_analysis(url, cache_manager, browser_pool=None):
+    """取得問卷分析結果，已有快取時不再開啟頁面抓取內容"""
+    cached = cache_manager.load_quiz_analysis(url)
+    inc("cache_lookups_total", cache="quiz_analysis", result="hit" if cached else "miss")
+    if cached:
+        app_logger.info("✅ 從快取載入分析結果")
+        return cached["questions"], cached["answers"]
+    
+    html_content = await extract_html_content(url, cache_manager, browser_pool)
+    try:
+        return analyze_quiz_with_llm(url, html_content, cache_manager)
+    except Exception as e:
+        raise LLMError(f"LLM 分析問卷失敗: {e}") from e
+
+def create_chat_completion(client, prompt):
+    """呼叫 LLM 並記錄耗時與 token 用量"""
+    with timer("llm_request_duration_seconds", model=openai_model), span("llm.chat", model=openai_model):
+        response = client.chat.completions.create(
+            model=openai_model,
+            messages=[{"role": "user", "content": prompt}]
+        )
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        inc("llm_tokens_total", usage.prompt_tokens or 0, model=openai_model, kind="prompt")
+        inc("llm_tokens_total", usage.completion_tokens or 0, model=openai_model, kind="completion")
+    return response
+
 def analyze_quiz_with_llm(url, html_content, cache_manager):
     """使用LLM分析問卷"""
     # 檢查快取
@@ -96,10 +142,7 @@ HTML內容：{html_content}
 """
     
     # 獲取題目結構
-    response1 = client.chat.completions.create(
-        model=openai_model,
-        messages=[{"role": "user", "content": analysis_prompt}]
-    )
+    response1 = create_chat_completion(client, analysis_prompt)
     
     # 清理並解析JSON
     result = response1.choices[0].message.content
@@ -127,10 +170,7 @@ HTML內容：{html_content}
 {questions_text}
 """
     
-    response2 = client.chat.completions.create(
-        model=openai_model,
-        messages=[{"role": "user", "content": answer_prompt}]
-    )
+    response2 = create_chat_completion(client, answer_prompt)
     
     # 解析答案
     answer_result = response2.choices[0].message.content
@@ -148,186 +188,174 @@ HTML內容：{html_content}
     return questions, answers
 
 async def fill_quiz_simple(page, questions, answers):
-    """簡單的問卷填寫邏輯"""
-    app_logger.info("開始填寫測驗題目...")
-    
-    for question in questions:
-        q_id = str(question["id"])
-        if q_id not in answers:
-            continue
-            
-        selected_letter = answers[q_id]
-        
-        # 找到選項文字
-        option_text = None
-        for opt in question["options"]:
-            if opt["letter"] == selected_letter:
-                option_text = opt["text"]
-                break
-        
-        if not option_text:
-            continue
-        
-        # 嘗試點擊選項
-        success = await click_option_simple(page, q_id, selected_letter, option_text)
+    """
+    問卷填寫邏輯：先建立頁面選項索引，預設以單一頁面腳本批次作答，只有未成功的題目才逐題點擊
+    """
+    step_log("開始填寫測驗題目...")
+    plan = build_answer_plan(questions, answers)
+    index = await build_option_index(page, questions)
+    app_logger.debug(f"選項索引完成：{index.count} 個選項")
+    
+    report = {}
+    if get_setting("quiz_bulk_answer", True, bool):
+        report = await answer_quiz_bulk(page, index, plan)
+        answered = [item for item in plan if report.get(item["id"])]
+        app_logger.info(f"批次作答完成：{len(answered)}/{len(plan)} 題")
+    
+    pending = [item for item in plan if not report.get(item["id"])]
+    if any(index.selector(item["id"], item["letter"]) is None for item in pending):
+        # 可能有選項尚未渲染，重建一次索引
+        index = await build_option_index(page, questions)
+    
+    for item in pending:
+        q_id, selected_letter, option_text = item["id"], item["letter"], item["text"]
+        
+        # 批次作答未成功的題目，逐題點擊
+        success = await click_option_simple(page, index, q_id, selected_letter)
         
         if success:
-            app_logger.info(f"✅ 題目 {q_id} 選擇 {selected_letter}: {option_text}")
+            step_log(f"✅ 題目 {q_id} 選擇 {selected_letter}: {option_text}")
             await page.wait_for_timeout(500)  # 短暫延遲
         else:
             app_logger.warning(f"❌ 題目 {q_id} 點擊失敗: {option_text}")
 
-async def click_option_simple(page, question_id, letter, option_text):
-    """簡單的選項點擊策略"""
-    
-    # 策略1: 使用XPATH（最精確）
+async def click_option_simple(page, index, question_id, letter):
+    """透過選項索引點擊單一選項"""
+    selector = index.selector(question_id, letter)
+    if selector is None:
+        app_logger.debug(f"題目{question_id} 選項{letter} 不在選項索引中")
+        return False
+    
+    tracker = get_latency_tracker()
+    click_timeout = tracker.timeout_for(page.url, "option_click")
     try:
-        # 根據真實XPATH規律：題目5對應div[6]，題目7對應div[8]，題目9對應div[10]
-        question_div = int(question_id) + 1  # 題目N對應div[N+1]
-        option_div = ord(letter) - ord('A') + 1  # A=1, B=2, C=3, D=4
-        
-        xpath = f"//div[1]/div[{question_div}]/div/div[2]/div[2]/div[2]/div/div[{option_div}]//span[2]"
-        
-        app_logger.debug(f"嘗試XPATH: {xpath} (題目{question_id}, 選項{letter})")
-        
-        element = page.locator(f"xpath={xpath}")
-        if await element.count() > 0:
-            await element.click(timeout=3000)
-            app_logger.debug(f"✅ XPATH點擊成功")
-            return True
+        async with tracker.measure(page.url, "option_click", count_failures=False):
+            await page.click(selector, timeout=click_timeout)
+        return True
     except Exception as e:
-        app_logger.debug(f"XPATH策略失敗: {e}")
-        pass
-    
-    # 策略2: data-qa選擇器（如果唯一）
-    try:
-        selector = f'[data-qa="option-{option_text}"]'
-        elements = await page.locator(selector).all()
-        
-        if len(elements) == 1:  # 只有唯一元素才點擊
-            await elements[0].click(timeout=2000)
-            return True
-    except:
-        pass
-    
-    # 策略3: 文字匹配（如果唯一）
-    try:
-        elements = await page.locator(f'text="{option_text}"').all()
-        
-        if len(elements) == 1:  # 只有唯一元素才點擊
-            await elements[0].click(timeout=2000)
-            return True
-    except:
-        pass
-    
-    return False
+        app_logger.debug(f"點擊 {selector} 失敗: {e}")
+        return False
 
 async def fill_basic_fields(page, name, email, company_name):
     """填寫基本欄位"""
     try:
         # 選擇「其他」公司
         await page.click('[data-qa="option-其他"]')
-        app_logger.info("已選擇公司：其他")
+        step_log("已選擇公司：其他")
         
         # 填入公司名稱（第一個文字輸入框）
         await page.fill('input[placeholder="請填入文字"]', company_name)
-        app_logger.info(f"已填入公司名稱：{company_name}")
+        step_log(f"已填入公司名稱：{company_name}")
         
         # 填入姓名（第二個文字輸入框）
         await page.fill('input[placeholder="請填入文字"] >> nth=1', name)
-        app_logger.info(f"已填入姓名：{name}")
+        step_log(f"已填入姓名：{name}")
         
         # 填入Email
         await page.fill('input[type="email"]', email)
-        app_logger.info(f"已填入Email：{email}")
+        step_log(f"已填入Email：{email}")
         
         # 勾選同意書
         await page.click('[data-qa*="本人已詳閱"]')
-        app_logger.info("已勾選同意書")
+        step_log("已勾選同意書")
         
     except Exception as e:
         app_logger.error(f"填寫基本欄位失敗: {e}")
         raise
 
-async def submit_form_simple(page, name):
-    """提交表單並等待成績顯示"""
+async def submit_form_simple(page, name, session=None):
+    """
+    提交表單並等待成績顯示（送出時機由全域節奏控制決定，提供 session 時等待期間讓出工作槽供下一位預載）
+
+    點擊送出之前的錯誤直接拋出，交由重試引擎分類；已送出後無法確認時回傳 (False, None)
+    """
+    capture = ScoreCapture(page)
     try:
-        # 隨機等待
-        wait_time = random.randint(0, 5)
-        app_logger.info(f"等待 {wait_time} 秒後提交...")
-        await asyncio.sleep(wait_time)
-        
-        # 點擊送出
-        await page.click('button:has-text("送出")')
-        app_logger.info("已點擊送出按鈕")
-        
-        # 等待並處理確認彈窗
-        await page.wait_for_timeout(1000)
-        
-        # 嘗試點擊確認按鈕
-        confirm_selectors = ['button:has-text("確定")', 'button:has-text("確認")', 'button:has-text("確定送出")']
+        # 依全域節奏控制等待
+        wait_time = await get_pacing_engine().reserve(page.url)
+        app_logger.info(f"依節奏控制等待 {wait_time:.1f} 秒後提交...")
+        with timed_step("pacing_wait"):
+            if session:
+                await session.pace(wait_time)
+            else:
+                await asyncio.sleep(wait_time)
         
-        confirmed = False
-        for selector in confirm_selectors:
-            try:
-                await page.click(selector, timeout=3000)
-                app_logger.info(f"已點擊確認按鈕: {selector}")
-                confirmed = True
-                break
-            except:
-                continue
+        # 送出前開始監聽回應，成績在伺服器回應時即可取得
+        capture.start()
         
-        if not confirmed:
-            app_logger.warning("未找到確認按鈕，嘗試繼續等待成績...")
+        # 點擊送出
+        with timer("step_duration_seconds", step="submit"), timed_step("submit"):
+            await page.click('button:has-text("送出")')
+        step_log("已點擊送出按鈕")
         
-        # 等待成績顯示
-        score = await wait_for_score_display(page, name)
+        try:
+            confirmed = False
+            with timed_step("confirmation"):
+                # 等待並處理確認彈窗
+                await page.wait_for_timeout(1000)
+                
+                # 嘗試點擊確認按鈕
+                confirm_selectors = ['button:has-text("確定")', 'button:has-text("確認")', 'button:has-text("確定送出")']
+                
+                tracker = get_latency_tracker()
+                confirm_timeout = tracker.timeout_for(page.url, "quiz_confirm")
+                for selector in confirm_selectors:
+                    try:
+                        async with tracker.measure(page.url, "quiz_confirm", count_failures=False):
+                            await page.click(selector, timeout=confirm_timeout)
+                        step_log(f"已點擊確認按鈕: {selector}")
+                        confirmed = True
+                        break
+                    except Exception:
+                        continue
+            
+            if not confirmed:
+                app_logger.warning("未找到確認按鈕，嘗試繼續等待成績...")
+            
+            # 等待成績顯示
+            with timed_step("score"):
+                score = await wait_for_score_display(page, name, capture)
+        except Exception as e:
+            app_logger.error(f"已送出但確認提交結果時發生錯誤: {e}")
+            return False, None
         
         return True, score
-        
-    except Exception as e:
-        app_logger.error(f"提交表單失敗: {e}")
-        return False, None
+    finally:
+        capture.stop()
 
-async def wait_for_score_display(page, name):
-    """等待並提取成績顯示"""
-    app_logger.info(f"等待 {name} 的成績顯示...")
+async def wait_for_score_display(page, name, capture=None):
+    """等待成績：優先採用送出回應中的成績，否則等待頁面出現成績文字後提取"""
+    step_log(f"等待 {name} 的成績顯示...")
     
     try:
-        # 等待成績文字出現（最多等待30秒）
-        score_selectors = [
-            'text="本次課後測驗，成績為"',
-            'text*="本次課後測驗"',
-            'text*="成績為"',
-            'text*="分數"'
-        ]
+        if capture is None:
+            capture = ScoreCapture(page)
         
-        score_found = False
-        for selector in score_selectors:
-            try:
-                await page.wait_for_selector(selector, timeout=10000)
-                score_found = True
-                app_logger.info("✅ 檢測到成績顯示")
-                break
-            except:
-                continue
+        tracker = get_latency_tracker()
+        score_timeout = tracker.timeout_for(page.url, "score")
+        started = time.perf_counter()
+        score, source = await capture.wait(score_timeout)
         
-        if not score_found:
+        if source:
+            tracker.record(page.url, "score", (time.perf_counter() - started) * 1000)
+            app_logger.info(f"✅ 檢測到成績（{'網路回應' if source == 'network' else '頁面'}）")
+        else:
             app_logger.warning("未檢測到成績顯示，嘗試提取頁面內容...")
         
-        # 提取成績
-        score = await extract_score_from_page(page)
+        # 回應中沒有成績時，從頁面提取
+        if score is None:
+            score = await extract_score_from_page(page)
         
-        if score:
+        if score is not None:
             app_logger.info(f"🎉 {name} 的測驗成績：{score} 分")
             
-            # 等待用戶確認看到成績（額外等待幾秒）
-            await page.wait_for_timeout(3000)
-            app_logger.info("成績顯示完成，準備關閉瀏覽器")
+            if not get_setting("headless", False, bool):
+                # 有畫面時讓使用者看到成績（額外等待幾秒）
+                await page.wait_for_timeout(3000)
+            step_log("成績顯示完成，準備關閉瀏覽器")
         else:
             app_logger.warning("無法提取到具體成績")
         
-        await page.wait_for_timeout(1000)
         return score
         
     except Exception as e:
@@ -338,41 +366,12 @@ async def extract_score_from_page(page):
     """從頁面提取成績"""
     try:
         # 獲取頁面文字內容
-        page_text = await page.locator('body').text_content()
-        
-        if not page_text:
-            return None
-        
-        # 使用正則表達式提取成績
-        patterns = [
-            r'本次課後測驗，成績為\s*(\d+)',
-            r'成績為\s*(\d+)',
-            r'分數：\s*(\d+)',
-            r'得分：\s*(\d+)',
-            r'您的成績：\s*(\d+)'
-        ]
+        page_text = await page.locator('body').inner_text()
         
-        for pattern in patterns:
-            match = re.search(pattern, page_text)
-            if match:
-                score = int(match.group(1))
-                app_logger.info(f"成功提取成績：{score} 分")
-                return score
-        
-        # 如果正則表達式找不到，嘗試查找包含數字的成績相關文字
-        lines = page_text.split('\n')
-        for line in lines:
-            line = line.strip()
-            if '成績' in line or '分數' in line:
-                # 提取該行中的數字
-                numbers = re.findall(r'\d+', line)
-                if numbers:
-                    # 取最可能是分數的數字（通常是0-100之間）
-                    for num in numbers:
-                        score = int(num)
-                        if 0 <= score <= 100:
-                            app_logger.info(f"從文字中提取成績：{score} 分")
-                            return score
+        score = parse_score_text(page_text)
+        if score is not None:
+            app_logger.info(f"成功提取成績：{score} 分")
+            return score
         
         app_logger.warning("未能從頁面提取到成績")
         return None
@@ -381,49 +380,71 @@ async def extract_score_from_page(page):
         app_logger.error(f"提取成績時發生錯誤: {e}")
         return None
 
-async def process_single_quiz(url, name, email, company_name, cache_manager):
-    """處理單個問卷 - 包含成績記錄"""
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
-        page = await browser.new_page()
-        
+@with_user_context
+@count_user_result
+@with_session_timings
+async def process_single_quiz(url, name, email, company_name, cache_manager, browser_pool=None):
+    """
+    處理單個問卷 - 包含成績記錄
+
+    Returns:
+        True 表示成功提交，False 表示提交失敗，None 表示已提交過而跳過
+    """
+    # 檢查是否已經提交過（開啟瀏覽器前先檢查，避免浪費工作階段）
+    submitted, timestamp = cache_manager.is_user_submitted(url, name, email)
+    if submitted:
+        app_logger.info(f"⏭️ {name} ({email}) 已於 {timestamp} 成功提交過表單，跳過")
+        return None
+    
+    async with ensure_pool(browser_pool) as pool:
         try:
-            await page.goto(url)
-            await page.wait_for_timeout(3000)
-            
-            # 檢查是否已經提交過
-            submitted, timestamp = cache_manager.is_user_submitted(url, name, email)
-            if submitted:
-                app_logger.info(f"⏭️ {name} ({email}) 已於 {timestamp} 成功提交過表單，跳過")
-                return
+            # 獲取問卷分析（通常已在批次開始前快取；LLM 失敗時原地重試）
+            questions, answers = await retry_call(
+                get_quiz_analysis, url, cache_manager, pool, kinds=(LLM_ERROR,), attempts=LLM_ATTEMPTS, delay=2
+            )
+        except Exception as e:
+            app_logger.error(f"{name} 的問卷分析失敗: {e}")
+            kind = classify_failure(e)
+            cache_manager.log_user_submission_with_score(
+                url, name, email, success=False, score=None,
+                attempts=LLM_ATTEMPTS if kind == LLM_ERROR else 1, failure=kind
+            )
+            return False
+        
+        async def flow(session):
+            page = session.page
+            await open_form_page(page, url, wait_until="load")
+            with timed_step("readiness"):
+                await page.wait_for_timeout(3000)
             
             # 填寫基本欄位
-            await fill_basic_fields(page, name, email, company_name)
-            
-            # 獲取問卷分析
-            html_content = await extract_html_content(url, cache_manager)
-            questions, answers = analyze_quiz_with_llm(url, html_content, cache_manager)
+            with timer("step_duration_seconds", step="fill"), timed_step("basic_fields"):
+                await retry_call(fill_basic_fields, page, name, email, company_name)
             
             # 填寫測驗題目
-            await fill_quiz_simple(page, questions, answers)
+            with timer("step_duration_seconds", step="quiz_answer"), timed_step("quiz_answer"):
+                await fill_quiz_simple(page, questions, answers)
             
             # 提交表單並獲取成績
-            success, score = await submit_form_simple(page, name)
-            
-            if success:
-                app_logger.info(f"✅ {name} 的問卷填寫完成")
-                # 記錄提交成功，包含成績
-                cache_manager.log_user_submission_with_score(url, name, email, success=True, score=score)
-            else:
-                app_logger.warning(f"⚠️ {name} 的問卷提交失敗")
-                cache_manager.log_user_submission_with_score(url, name, email, success=False, score=None)
-                
-        except Exception as e:
+            success, score = await submit_form_simple(page, name, session)
+            if not success:
+                raise SubmitUnconfirmedError(f"{name} 的問卷提交失敗")
+            return score
+        
+        engine = RetryEngine(pool, label=name)
+        try:
+            score = await engine.run(flow)
+        except RetryExhaustedError as e:
             app_logger.error(f"{name} 的問卷處理失敗: {e}")
-            cache_manager.log_user_submission_with_score(url, name, email, success=False, score=None)
-            
-        finally:
-            await browser.close()
+            cache_manager.log_user_submission_with_score(
+                url, name, email, success=False, score=None, attempts=e.attempts, failure=e.kind
+            )
+            return False
+    
+    app_logger.info(f"✅ {name} 的問卷填寫完成")
+    # 記錄提交成功，包含成績
+    cache_manager.log_user_submission_with_score(url, name, email, success=True, score=score, attempts=engine.attempts)
+    return True
 
 # 擴展QuizCacheManager以支持成績記錄
 class QuizCacheManager(CacheManager):
@@ -447,47 +468,32 @@ class QuizCacheManager(CacheManager):
         }
         self.save_json_file("quiz_analysis.json", data)
     
-    def log_user_submission_with_score(self, url, name, email, success=True, score=None):
+    def log_user_submission_with_score(self, url, name, email, success=True, score=None, **details):
         """記錄使用者提交狀態，包含成績"""
-        data = self.load_json_file("submission_log.json")
-        url_hash = self.get_url_hash(url)
-        
-        if url_hash not in data:
-            data[url_hash] = {
-                "url": url,
-                "submissions": []
-            }
-        
-        submission_data = {
-            "name": name,
-            "email": email,
-            "timestamp": datetime.now().isoformat(),
-            "success": success
-        }
-        
         # 如果有成績，則記錄
         if score is not None:
-            submission_data["score"] = score
             app_logger.info(f"📊 記錄 {name} 的測驗成績：{score} 分")
-        
-        data[url_hash]["submissions"].append(submission_data)
-        self.save_json_file("submission_log.json", data)
+        self.log_user_submission(url, name, email, success=success, score=score, **details)
 
 # 創建專用的問卷填寫函數
-async def fill_quiz_form_complete(url, name, email, company_name, cache_manager):
+async def fill_quiz_form_complete(url, name, email, company_name, cache_manager, browser_pool=None):
     """完整的問卷填寫流程，包含成績記錄"""
-    await process_single_quiz(url, name, email, company_name, cache_manager)
+    return await process_single_quiz(url, name, email, company_name, cache_manager, browser_pool)
 
-async def run_quiz_automation(survey_url: str):
+async def run_quiz_automation(survey_url: str, browser_pool=None):
     """主執行函數 - 使用專用的問卷填寫流程"""
     app_logger.info(f"=== 開始問卷自動化：{survey_url} ===")
     
+    async with ensure_pool(browser_pool) as pool:
+        await _run_quiz_batch(survey_url, pool)
+
+async def _run_quiz_batch(survey_url, browser_pool):
+    """在指定的瀏覽器池中執行問卷批次"""
     cache_manager = QuizCacheManager()
     
     # 先分析問卷結構
     app_logger.info("分析問卷結構...")
-    html_content = await extract_html_content(survey_url, cache_manager)
-    questions, answers = analyze_quiz_with_llm(survey_url, html_content, cache_manager)
+    questions, answers = await get_quiz_analysis(survey_url, cache_manager, browser_pool)
     
     app_logger.info(f"問卷分析完成：{len(questions)} 道題目")
     app_logger.info(f"LLM答案：{answers}")
@@ -498,13 +504,9 @@ async def run_quiz_automation(survey_url: str):
         users = user_manager.get_all_users()
         app_logger.info(f"從用戶管理器獲取 {len(users)} 位用戶")
     except ImportError:
-        # 回退到CSV模式
-        import csv
-        users = []
+        # 回退到CSV模式（含用戶管理器尚未整理回 CSV 的異動日誌）
         try:
-            with open(CSV_PATH, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                users = [{'name': row['name'], 'email': row['email']} for row in reader]
+            users = read_user_roster(CSV_PATH)
             app_logger.info(f"從CSV獲取 {len(users)} 位用戶")
         except Exception as e:
             app_logger.error(f"無法讀取用戶資料: {e}")
@@ -515,32 +517,40 @@ async def run_quiz_automation(survey_url: str):
         return
     
     # 隨機排序用戶
-    import random
     random.shuffle(users)
     app_logger.info("用戶順序已隨機排列")
     
-    # 批次處理每個用戶
-    for i, user in enumerate(users, 1):
-        try:
-            app_logger.info(f"\n=== 處理第 {i}/{len(users)} 位用戶：{user['name']} ===")
-            await fill_quiz_form_complete(
-                url=survey_url,
-                name=user['name'],
-                email=user['email'],
-                company_name=company_name,
-                cache_manager=cache_manager
-            )
-            
-            # 用戶間隨機間隔
-            if i < len(users):  # 不是最後一個用戶
-                interval = random.randint(1, 4)
-                app_logger.info(f"⏳ 等待 {interval} 秒後處理下一位用戶...")
-                await asyncio.sleep(interval)
-                
-        except Exception as e:
-            app_logger.error(f"處理 {user['name']} 時發生錯誤: {e}")
-            continue
-    
+    # 依序排入瀏覽器池：前一位用戶進入送出前等待時，下一位即開始預載並填寫頁面
+    # 只在取得派送名額時才檢查熔斷器，熔斷後尚未開始的用戶會暫停而非直接排入瀏覽器池
+    breaker = CircuitBreaker(survey_url)
+    dispatch = asyncio.Semaphore(browser_pool.capacity)
+
+    async def process_user(i, user):
+        async with dispatch:
+            try:
+                app_logger.info(f"\n=== 處理第 {i}/{len(users)} 位用戶：{user['name']} ===")
+                return await breaker.call(
+                    fill_quiz_form_complete,
+                    url=survey_url,
+                    name=user['name'],
+                    email=user['email'],
+                    company_name=company_name,
+                    cache_manager=cache_manager,
+                    browser_pool=browser_pool
+                )
+            except CircuitOpenError:
+                app_logger.warning(f"⛔ 已中止，未處理 {user['name']} 的測驗")
+            except Exception as e:
+                app_logger.error(f"處理 {user['name']} 時發生錯誤: {e}")
+            return False
+    
+    with batch_timings(cache_manager):
+        await asyncio.gather(*(process_user(i, user) for i, user in enumerate(users, 1)))
+    
+    if breaker.aborted:
+        await show_score_summary(survey_url, cache_manager)
+        raise CircuitOpenError(breaker.abort_reason)
+
     app_logger.info("=== 問卷自動化完成 ===")
     
     # 顯示成績統計
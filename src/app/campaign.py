@@ -0,0 +1,252 @@
+# campaign.py
+
+"""
+多網址活動（campaign）模式
+一次載入使用者、共用瀏覽器池與快取，將所有「使用者 × 網址」工作項目排入同一個排程，
+省去每個網址各自啟動子進程、暖機瀏覽器與載入使用者的成本
+"""
+import asyncio
+import csv
+import hashlib
+import json
+import time
+from datetime import datetime
+
+from src.app.auto_attendance import fill_attendance_form
+from src.app.auto_quiz import QuizCacheManager, get_quiz_analysis, process_single_quiz, show_score_summary
+from src.config.manager import ConfigManager
+from src.utils.browser_pool import BrowserPool
+from src.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.utils.log_pipeline import current_log_context
+from src.utils.logger_manager import app_logger
+from src.utils.timings import batch_timings
+from src.utils.survey_utils import (
+    campaign_progress_filename, fill_form_with_cache_check, load_and_shuffle_csv_data, load_users_from_manager
+)
+
+config = ConfigManager()
+
+CSV_PATH = config.system.csv_path
+company_name = config.system.company_name
+
+TASK_TYPES = ("attend", "quiz")
+
+
+# ========== 活動設定載入 ==========
+def normalize_campaign_items(items):
+    """
+    驗證並整理活動項目，移除重複的 (url, type)。
+
+    Args:
+        items (list): 每項為含 url 與 type 的 dict。
+
+    Returns:
+        list: 整理後的活動項目。
+    """
+    normalized = []
+    seen = set()
+    for i, item in enumerate(items, 1):
+        url = str(item.get("url", "")).strip()
+        task_type = str(item.get("type", "")).strip().lower()
+        if not url:
+            raise ValueError(f"第 {i} 個活動項目缺少 url")
+        if task_type not in TASK_TYPES:
+            raise ValueError(f"第 {i} 個活動項目的 type 必須是 {'/'.join(TASK_TYPES)}，收到 '{task_type}'")
+        if (url, task_type) in seen:
+            app_logger.warning(f"略過重複的活動項目: {task_type} {url}")
+            continue
+        seen.add((url, task_type))
+        normalized.append({"url": url, "type": task_type})
+    if not normalized:
+        raise ValueError("活動中沒有任何網址")
+    return normalized
+
+
+def load_campaign_file(path):
+    """
+    從檔案載入活動項目。支援 JSON（列表或含 items 的物件）與含 url、type 欄位的 CSV。
+
+    Args:
+        path (str): 活動檔案路徑。
+
+    Returns:
+        list: 整理後的活動項目。
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            items = [row for row in csv.DictReader(f)]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        items = data.get("items", []) if isinstance(data, dict) else data
+    return normalize_campaign_items(items)
+
+
+def load_campaign_users():
+    """載入一次使用者名單，供活動中所有網址共用"""
+    try:
+        from server import user_manager
+        return load_users_from_manager(user_manager)
+    except ImportError:
+        app_logger.info("無法使用用戶管理系統，回退到 CSV 模式...")
+        return load_and_shuffle_csv_data(CSV_PATH)
+
+
+# ========== 進度追蹤 ==========
+def campaign_progress_key(items):
+    """進度檔的鍵：在伺服器任務內執行時為任務 ID，否則（例如 main.py --campaign）為活動項目的雜湊"""
+    job_id = current_log_context().get("job_id")
+    if job_id:
+        return job_id
+    return hashlib.md5(json.dumps(items, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class CampaignProgress:
+    """記錄每個網址的處理進度，並定期寫入快取目錄（每個活動各自一個檔案）供 API 查詢"""
+
+    SAVE_INTERVAL = 2.0  # 秒
+
+    def __init__(self, items, user_count, cache_manager, key):
+        self.cache_manager = cache_manager
+        self.key = key
+        self.filename = campaign_progress_filename(key)
+        self.started_at = datetime.now().isoformat()
+        self.finished_at = None
+        self.urls = {
+            item["url"] + "|" + item["type"]: {
+                "url": item["url"],
+                "type": item["type"],
+                "total": user_count,
+                "submitted": 0,
+                "skipped": 0,
+                "failed": 0,
+                "cancelled": 0,
+                "aborted": None,
+            }
+            for item in items
+        }
+        self._last_saved = 0.0
+        self.save(force=True)
+
+    def record(self, item, result, aborted=None):
+        """記錄單一工作項目的結果（True 成功、False 失敗、None 跳過）；aborted 為熔斷中止的原因"""
+        entry = self.urls[item["url"] + "|" + item["type"]]
+        if aborted is not None:
+            entry["cancelled"] += 1
+            entry["aborted"] = aborted
+        elif result is None:
+            entry["skipped"] += 1
+        elif result:
+            entry["submitted"] += 1
+        else:
+            entry["failed"] += 1
+        done = entry["submitted"] + entry["skipped"] + entry["failed"] + entry["cancelled"]
+        app_logger.info(
+            f"📈 [{item['type']}] {item['url']} 進度 {done}/{entry['total']}"
+            f"（成功 {entry['submitted']}、跳過 {entry['skipped']}、失敗 {entry['failed']}、"
+            f"中止 {entry['cancelled']}）"
+        )
+        self.save()
+
+    def snapshot(self):
+        return {
+            "key": self.key,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "urls": list(self.urls.values()),
+        }
+
+    def save(self, force=False):
+        now = time.monotonic()
+        if force or now - self._last_saved >= self.SAVE_INTERVAL:
+            self._last_saved = now
+            self.cache_manager.save_json_file(self.filename, self.snapshot())
+
+    def finish(self):
+        self.finished_at = datetime.now().isoformat()
+        self.save(force=True)
+
+
+# ========== 主流程 ==========
+async def _run_work_item(item, user, cache_manager, browser_pool, breaker, progress):
+    """執行單一「使用者 × 網址」工作項目，經由該活動項目的熔斷器派送"""
+    try:
+        if item["type"] == "attend":
+            result = await breaker.call(
+                fill_form_with_cache_check,
+                item["url"], user["name"], user["email"], company_name,
+                cache_manager, fill_attendance_form, browser_pool=browser_pool
+            )
+        else:
+            result = await breaker.call(
+                process_single_quiz,
+                item["url"], user["name"], user["email"], company_name,
+                cache_manager, browser_pool=browser_pool
+            )
+    except CircuitOpenError as e:
+        progress.record(item, False, aborted=str(e))
+        return
+    except Exception as e:
+        app_logger.error(f"❌ {user['name']} 在 {item['url']} 的處理失敗: {e}")
+        result = False
+    progress.record(item, result)
+
+
+async def run_campaign(items, browser_pool_size=None):
+    """
+    執行多網址活動。
+
+    Args:
+        items (list): 活動項目，每項含 url 與 type（'attend' 或 'quiz'）。
+        browser_pool_size (int, optional): 共用瀏覽器池的工作階段上限。
+    """
+    items = normalize_campaign_items(items)
+    app_logger.info(f"=== 開始多網址活動：共 {len(items)} 個網址 ===")
+
+    users = load_campaign_users()
+    if not users:
+        app_logger.warning("❌ 沒有用戶資料可以處理")
+        return
+
+    # 簽到與測驗共用同一個快取與提交記錄
+    cache_manager = QuizCacheManager()
+    progress = CampaignProgress(items, len(users), cache_manager, campaign_progress_key(items))
+    app_logger.info(f"活動進度可由 GET /api/campaign/progress?key={progress.key} 查詢")
+
+    async with BrowserPool(max_sessions=browser_pool_size) as pool:
+        # 每個測驗網址只分析一次
+        for item in items:
+            if item["type"] == "quiz":
+                app_logger.info(f"分析問卷結構: {item['url']}")
+                try:
+                    await get_quiz_analysis(item["url"], cache_manager, pool)
+                except Exception as e:
+                    app_logger.error(f"❌ 問卷分析失敗，將在處理各用戶時重試: {e}")
+
+        # 每個活動項目（網址 × 類型）各自一個熔斷器：單一項目故障只會暫停或中止該項目，
+        # 同一網址的簽到與測驗不共用失敗統計，其餘項目照常進行
+        breakers = {
+            (item["url"], item["type"]): CircuitBreaker(f"[{item['type']}] {item['url']}") for item in items
+        }
+        dispatch = asyncio.Semaphore(pool.capacity)
+
+        async def dispatch_item(item, user):
+            async with dispatch:
+                breaker = breakers[(item["url"], item["type"])]
+                await _run_work_item(item, user, cache_manager, pool, breaker, progress)
+
+        # 依網址順序排入工作項目，由派送名額與瀏覽器池控制並行數量
+        tasks = [dispatch_item(item, user) for item in items for user in users]
+        app_logger.info(f"🚀 共排入 {len(tasks)} 個工作項目（{len(users)} 位用戶 × {len(items)} 個網址）")
+        with batch_timings(cache_manager):
+            await asyncio.gather(*tasks)
+
+    progress.finish()
+    for item in items:
+        if item["type"] == "quiz":
+            await show_score_summary(item["url"], cache_manager)
+    for breaker in breakers.values():
+        if breaker.aborted:
+            app_logger.error(f"⛔ {breaker.name} 已中止：{breaker.abort_reason}")
+    app_logger.info(f"=== 多網址活動完成！快取檔案位置: {cache_manager.cache_dir} ===")
+
@@ -106,4 +106,73 @@ class SystemSchema(ConfigSchema):
     @property
     def editor_password(self):
         return self._config_section.get('editor_password')
+    @property
+    def browser_pool_size(self):
+        return self._config_section.get('browser_pool_size')
+    @property
+    def headless(self):
+        return self._config_section.get('headless')
+    @property
+    def preload_depth(self):
+        return self._config_section.get('preload_depth')
+    @property
+    def pacing_rate(self):
+        return self._config_section.get('pacing_rate')
+    @property
+    def pacing_burst(self):
+        return self._config_section.get('pacing_burst')
+    @property
+    def pacing_jitter(self):
+        return self._config_section.get('pacing_jitter')
+    @property
+    def pacing_jitter_max(self):
+        return self._config_section.get('pacing_jitter_max')
+    @property
+    def retry_max_attempts(self):
+        return self._config_section.get('retry_max_attempts')
+    @property
+    def retry_base_delay(self):
+        return self._config_section.get('retry_base_delay')
+    @property
+    def circuit_failure_rate(self):
+        return self._config_section.get('circuit_failure_rate')
+    @property
+    def circuit_min_calls(self):
+        return self._config_section.get('circuit_min_calls')
+    @property
+    def circuit_window(self):
+        return self._config_section.get('circuit_window')
+    @property
+    def circuit_cooldown(self):
+        return self._config_section.get('circuit_cooldown')
+    @property
+    def circuit_max_probes(self):
+        return self._config_section.get('circuit_max_probes')
+    @property
+    def quiz_bulk_answer(self):
+        return self._config_section.get('quiz_bulk_answer')
+    @property
+    def quiz_submit_url_pattern(self):
+        return self._config_section.get('quiz_submit_url_pattern')
+    @property
+    def log_watch_heartbeat(self):
+        return self._config_section.get('log_watch_heartbeat')
+    @property
+    def log_watch_flush_ms(self):
+        return self._config_section.get('log_watch_flush_ms')
+    @property
+    def log_mode(self):
+        return self._config_section.get('log_mode')
+    @property
+    def step_log_level(self):
+        return self._config_section.get('step_log_level')
+    @property
+    def step_log_sample_rate(self):
+        return self._config_section.get('step_log_sample_rate')
+    @property
+    def step_log_rate_limit(self):
+        return self._config_section.get('step_log_rate_limit')
+    @property
+    def tracing_enabled(self):
+        return self._config_section.get('tracing_enabled')
 # ---------- GENERATED CLASSES END ----------
\ No newline at end of file
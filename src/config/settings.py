@@ -0,0 +1,31 @@
+"""
+選用設定讀取工具
+config.ini 的 [System] 區段中，效能相關設定皆為選填；缺少或格式錯誤時使用預設值
+"""
+from src.config.manager import ConfigManager
+
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def get_setting(key, default, cast=str):
+    """
+    讀取 [System] 區段的選用設定。
+
+    Args:
+        key (str): 設定名稱（對應 SystemSchema 的屬性名稱）。
+        default: 設定缺少或無法轉換時的預設值。
+        cast (type): 轉換型別，支援 str、int、float、bool。
+
+    Returns:
+        轉換後的設定值或預設值。
+    """
+    value = getattr(ConfigManager().system, key, None)
+    if value is None or str(value).strip() == "":
+        return default
+    value = str(value).strip()
+    try:
+        if cast is bool:
+            return value.lower() in _TRUE_VALUES
+        return cast(value)
+    except (TypeError, ValueError):
+        return default
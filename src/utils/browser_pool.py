@@ -0,0 +1,178 @@
+"""
+共用瀏覽器池
+以單一 Playwright / Chromium 實例提供彼此隔離的 BrowserContext，
+讓批次與多網址活動中的所有使用者共用同一個瀏覽器，而不是各自啟動
+
+送出前的節奏等待（pacing）以計時器處理：等待中的工作階段會暫時釋放工作槽，
+讓下一位使用者的頁面先在另一個 context 中開啟並預填（look-ahead 預載）
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+
+from src.config.settings import get_setting
+from src.utils.logger_manager import app_logger
+from src.utils.metrics import add_gauge
+from src.utils.tracing import trace_page
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_PRELOAD_DEPTH = 1
+
+
+class BrowserSession:
+    """單一使用者的瀏覽器工作階段（獨立的 context 與 page）"""
+
+    def __init__(self, pool, context, page):
+        self.pool = pool
+        self.context = context
+        self.page = page
+        self._holding_slot = True
+
+    async def idle(self, awaitable):
+        """
+        等待 awaitable 完成，期間釋放工作槽讓其他使用者預先開啟與填寫頁面。
+        頁面與 context 仍保留，等待結束後重新取得工作槽再繼續。
+        """
+        self.pool._active.release()
+        self._holding_slot = False
+        try:
+            return await awaitable
+        finally:
+            await self.pool._active.acquire()
+            self._holding_slot = True
+
+    async def pace(self, seconds):
+        """送出前的節奏等待，以計時器處理而不佔用工作槽"""
+        if seconds > 0:
+            await self.idle(asyncio.sleep(seconds))
+
+
+class BrowserPool:
+    """
+    共用瀏覽器池
+
+    Args:
+        max_sessions: 同時進行瀏覽器操作的工作階段上限，預設讀取設定 browser_pool_size
+        headless: 是否以無頭模式啟動，預設讀取設定 headless
+        preload: 額外允許開啟、用於預載下一位使用者的 context 數量，預設讀取設定 preload_depth
+    """
+
+    def __init__(self, max_sessions=None, headless=None, preload=None):
+        if max_sessions is None:
+            max_sessions = get_setting("browser_pool_size", DEFAULT_POOL_SIZE, int)
+        if headless is None:
+            headless = get_setting("headless", False, bool)
+        if preload is None:
+            preload = get_setting("preload_depth", DEFAULT_PRELOAD_DEPTH, int)
+        self.max_sessions = max(1, max_sessions)
+        self.preload = max(0, preload)
+        self.headless = headless
+        self._playwright = None
+        self._browser = None
+        # _contexts 限制同時開啟的 context 總數；_active 限制正在操作頁面的數量
+        self._contexts = asyncio.Semaphore(self.capacity)
+        self._active = asyncio.Semaphore(self.max_sessions)
+        self._launch_lock = asyncio.Lock()
+        self._open_sessions = 0
+
+    @property
+    def capacity(self):
+        """可同時開啟的工作階段總數（含預載）"""
+        return self.max_sessions + self.preload
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """啟動 Playwright 與共用瀏覽器"""
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        await self._ensure_browser()
+
+    async def _ensure_browser(self):
+        """確保共用瀏覽器仍在運作，必要時重新啟動"""
+        async with self._launch_lock:
+            if self._browser is None or not self._browser.is_connected():
+                self._browser = await self._playwright.chromium.launch(headless=self.headless)
+                app_logger.info(
+                    f"🌐 已啟動共用瀏覽器（工作階段上限 {self.max_sessions}，預載 {self.preload}）"
+                )
+            return self._browser
+
+    async def restart_browser(self):
+        """
+        重新啟動共用瀏覽器（重試引擎的最高層級）。
+        瀏覽器仍連線且有其他工作階段使用中時不強制關閉，避免連帶中斷其他使用者。
+        """
+        async with self._launch_lock:
+            browser = self._browser
+            if browser is not None and browser.is_connected():
+                if self._open_sessions > 0:
+                    app_logger.warning("其他工作階段仍在使用共用瀏覽器，改以新的 context 重試")
+                    return
+                try:
+                    await browser.close()
+                except Exception as e:
+                    app_logger.warning(f"關閉共用瀏覽器時發生錯誤: {e}")
+            self._browser = None
+        app_logger.info("🔄 重新啟動共用瀏覽器...")
+        await self._ensure_browser()
+
+    async def close(self):
+        """關閉共用瀏覽器與 Playwright"""
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception as e:
+                app_logger.warning(f"關閉共用瀏覽器時發生錯誤: {e}")
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    @asynccontextmanager
+    async def session(self):
+        """取得一個工作階段，離開時自動關閉其 context"""
+        add_gauge("browser_sessions_waiting", 1)
+        try:
+            await self._contexts.acquire()
+        finally:
+            add_gauge("browser_sessions_waiting", -1)
+        try:
+            await self._active.acquire()
+            session = None
+            try:
+                browser = await self._ensure_browser()
+                context = await browser.new_context()
+                self._open_sessions += 1
+                add_gauge("browser_sessions_in_flight", 1)
+                try:
+                    page = trace_page(await context.new_page())
+                    session = BrowserSession(self, context, page)
+                    yield session
+                finally:
+                    self._open_sessions -= 1
+                    add_gauge("browser_sessions_in_flight", -1)
+                    try:
+                        await context.close()
+                    except Exception as e:
+                        app_logger.debug(f"關閉瀏覽器 context 時發生錯誤: {e}")
+            finally:
+                if session is None or session._holding_slot:
+                    self._active.release()
+        finally:
+            self._contexts.release()
+
+
+@asynccontextmanager
+async def ensure_pool(browser_pool=None, max_sessions=1):
+    """沿用呼叫端提供的瀏覽器池；未提供時建立一個臨時池並在結束時關閉"""
+    if browser_pool is not None:
+        yield browser_pool
+        return
+    async with BrowserPool(max_sessions=max_sessions) as pool:
+        yield pool
@@ -0,0 +1,151 @@
+"""
+批次熔斷器（circuit breaker）
+目標網站故障或表單已關閉時，避免為每位使用者啟動瀏覽器、等完所有逾時與重試。
+失敗率超過門檻即暫停派送，冷卻後只放行一個探測工作階段：成功則恢復，持續失敗則以明確原因中止任務
+"""
+import asyncio
+import time
+from collections import deque
+
+from src.config.settings import get_setting
+from src.utils.logger_manager import app_logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔斷器已中止任務"""
+
+
+class CircuitBreaker:
+    """
+    單一目標網址的熔斷器
+
+    Args:
+        name: 顯示用名稱（通常為網址）
+        failure_rate: 觸發熔斷的失敗率門檻，預設讀取設定 circuit_failure_rate
+        min_calls: 計算失敗率所需的最少結果數，預設讀取設定 circuit_min_calls
+        window: 計算失敗率的最近結果數，預設讀取設定 circuit_window
+        cooldown: 熔斷後到探測前的暫停秒數，預設讀取設定 circuit_cooldown
+        max_probes: 連續探測失敗幾次後中止任務，預設讀取設定 circuit_max_probes
+    """
+
+    def __init__(self, name, failure_rate=None, min_calls=None, window=None, cooldown=None, max_probes=None):
+        self.name = name
+        self.failure_rate = failure_rate if failure_rate is not None else get_setting("circuit_failure_rate", 0.5, float)
+        self.min_calls = min_calls if min_calls is not None else get_setting("circuit_min_calls", 5, int)
+        window = window if window is not None else get_setting("circuit_window", 20, int)
+        self.cooldown = cooldown if cooldown is not None else get_setting("circuit_cooldown", 30.0, float)
+        self.max_probes = max_probes if max_probes is not None else get_setting("circuit_max_probes", 2, int)
+
+        self.state = CLOSED
+        self.results = deque(maxlen=max(window, self.min_calls))
+        self.opened_at = None
+        self.failed_probes = 0
+        self.abort_reason = None
+        self._probe_in_flight = False
+        self._changed = asyncio.Event()
+
+    @property
+    def aborted(self):
+        return self.abort_reason is not None
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def before_dispatch(self):
+        """
+        派送工作項目前呼叫。熔斷開啟時會暫停等待；
+        回傳 True 表示此工作項目是半開狀態下的探測。
+        """
+        while True:
+            if self.aborted:
+                raise CircuitOpenError(self.abort_reason)
+            if self.state == CLOSED:
+                return False
+            if self.state == OPEN:
+                remaining = self.opened_at + self.cooldown - time.monotonic()
+                if remaining <= 0:
+                    self.state = HALF_OPEN
+                    self._probe_in_flight = True
+                    app_logger.info(f"🔎 熔斷器冷卻結束，以單一工作階段探測 {self.name}")
+                    return True
+                changed = self._changed
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # HALF_OPEN：已有探測進行中，等待結果
+            if not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            await self._changed.wait()
+
+    def record(self, result, probe=False):
+        """
+        記錄工作項目結果：True 成功、False 失敗、None 跳過（不列入統計）。
+        """
+        if result is None:
+            if probe:
+                # 跳過的項目沒有真正探測，讓下一個項目接手探測
+                self._probe_in_flight = False
+                self._notify()
+            return
+
+        self.results.append(bool(result))
+        if probe:
+            self._probe_in_flight = False
+            if result:
+                app_logger.info(f"✅ 探測成功，{self.name} 恢復派送")
+                self.state = CLOSED
+                self.failed_probes = 0
+                self.results.clear()
+            else:
+                self.failed_probes += 1
+                if self.failed_probes >= self.max_probes:
+                    self.abort_reason = (
+                        f"目標 {self.name} 持續失敗（近期失敗率 {self._failure_ratio():.0%}，"
+                        f"{self.failed_probes} 次探測皆失敗），已中止剩餘工作"
+                    )
+                    app_logger.error(f"⛔ {self.abort_reason}")
+                else:
+                    self._trip()
+            self._notify()
+            return
+
+        if self.state == CLOSED and len(self.results) >= self.min_calls:
+            if self._failure_ratio() >= self.failure_rate:
+                self._trip()
+                self._notify()
+
+    def _failure_ratio(self):
+        if not self.results:
+            return 0.0
+        return self.results.count(False) / len(self.results)
+
+    def _trip(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        app_logger.warning(
+            f"⚡ 熔斷器開啟：{self.name} 近期失敗率 {self._failure_ratio():.0%}，"
+            f"暫停派送 {self.cooldown:.0f} 秒後探測"
+        )
+
+    async def call(self, func, *args, **kwargs):
+        """在熔斷器保護下執行工作項目，結果會自動記錄"""
+        probe = await self.before_dispatch()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            self.record(False, probe)
+            raise
+        except BaseException:
+            # 被取消（CancelledError 等）時不列入統計，但要釋放探測並喚醒等待中的工作項目
+            self.record(None, probe)
+            raise
+        self.record(result, probe)
+        return result
@@ -0,0 +1,152 @@
+"""
+任務日誌
+每個任務（一次批次、活動或個人請求）有一個任務 ID，透過 app_logger.contextualize 帶入該任務的所有日誌記錄；
+處理個別使用者時再帶入使用者 email。全域日誌的訊息前會加上 [job:<id>] [user:<email>] 標籤，
+同時每筆記錄以 JSON 格式寫入 logs/jobs/<id>/job.jsonl（由背景執行緒批次寫入），
+檢視單一任務時直接讀取該檔案，不必掃描全域日誌
+"""
+import functools
+import json
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.utils.log_pipeline import BatchedLineWriter, log_context, shutdown_logging
+from src.utils.logger_manager import app_logger
+
+JOBS_LOG_DIR = Path("logs") / "jobs"
+JOB_LOG_FILENAME = "job.jsonl"
+JOB_ID_PATTERN = re.compile(r"^[\w-][\w.-]{0,63}$")
+STREAM_CHUNK = 64 * 1024
+
+
+def new_job_id():
+    """產生任務 ID：時間戳記加上隨機碼，依建立時間排序"""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def validate_job_id(job_id):
+    if not job_id or not JOB_ID_PATTERN.match(job_id):
+        raise ValueError(f"無效的任務 ID: {job_id}")
+    return job_id
+
+
+def job_dir(job_id):
+    """任務專屬目錄（任務日誌、效能分析等檔案都放在這裡）"""
+    return JOBS_LOG_DIR / validate_job_id(job_id)
+
+
+def job_log_path(job_id):
+    return job_dir(job_id) / JOB_LOG_FILENAME
+
+
+@contextmanager
+def log_fields(**fields):
+    """在此區塊內的日誌都帶有指定的關聯欄位（同時提供給非同步日誌的背景執行緒）"""
+    token = log_context.set({**log_context.get(), **fields})
+    try:
+        with app_logger.contextualize(**fields):
+            yield
+    finally:
+        log_context.reset(token)
+
+
+class JobLogSink:
+    """將記錄以 JSON Lines 寫入任務日誌檔（背景執行緒批次寫入，不阻塞記錄日誌的呼叫端）"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer = BatchedLineWriter(self.path)
+
+    @staticmethod
+    def to_entry(record):
+        extra = record["extra"]
+        entry = {
+            "time": record["time"].isoformat(),
+            "level": record["level"].name,
+            "job_id": extra.get("job_id"),
+            "user": extra.get("user"),
+            "module": record["name"],
+            "function": record["function"],
+            "line": record["line"],
+            "message": extra.get("raw_message", record["message"]),
+        }
+        if record["exception"] is not None:
+            exc_type, exc_value, _ = record["exception"]
+            entry["exception"] = f"{getattr(exc_type, '__name__', exc_type)}: {exc_value}"
+        return entry
+
+    def __call__(self, message):
+        self._writer.write(json.dumps(self.to_entry(message.record), ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._writer.close()
+
+
+@contextmanager
+def job_logging(job_id):
+    """
+    在此區塊內記錄的日誌都帶有任務 ID，並另外寫入該任務的 JSONL 日誌檔
+
+    Yields:
+        Path: 任務日誌檔路徑
+    """
+    path = job_log_path(job_id)
+    sink = JobLogSink(path)
+    handler_id = app_logger.add(
+        sink, level="DEBUG", format="{message}", filter=lambda record: record["extra"].get("job_id") == job_id
+    )
+    try:
+        with log_fields(job_id=job_id):
+            yield path
+    finally:
+        # 先送出非同步佇列中剩餘的日誌，再移除任務日誌的輸出
+        shutdown_logging()
+        app_logger.remove(handler_id)
+        sink.close()
+
+
+def with_user_context(func):
+    """以 email 作為使用者關聯 ID：處理單一使用者 (url, name, email, ...) 期間的日誌都帶有 user"""
+
+    @functools.wraps(func)
+    async def wrapper(url, name, email, *args, **kwargs):
+        with log_fields(user=email):
+            return await func(url, name, email, *args, **kwargs)
+
+    return wrapper
+
+
+def iter_job_log(path, offset=0, end=None, user=None):
+    """
+    讀取任務日誌檔 [offset, end) 的內容；指定 user 時只產生該使用者的記錄
+
+    Yields:
+        bytes: 原始的 JSON Lines 內容
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        position = offset
+        if user is None:
+            while end is None or position < end:
+                chunk = f.read(STREAM_CHUNK if end is None else min(STREAM_CHUNK, end - position))
+                if not chunk:
+                    break
+                position += len(chunk)
+                yield chunk
+            return
+
+        user = user.lower()
+        while end is None or position < end:
+            raw = f.readline()
+            if not raw:
+                break
+            position += len(raw)
+            try:
+                if (json.loads(raw).get("user") or "").lower() == user:
+                    yield raw
+            except ValueError:
+                continue
@@ -0,0 +1,154 @@
+"""
+自適應逾時
+依「目標主機 × 步驟」記錄實際耗時，以滾動百分位數推算各步驟的逾時，
+並套用下限與上限；統計資料保存在快取目錄，跨次執行與子進程沿用
+"""
+import atexit
+import json
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+from src.utils.logger_manager import app_logger
+from src.utils.metrics import inc, observe
+
+STATS_FILE = "latency_stats.json"
+
+# 各步驟的 (預設逾時, 下限, 上限)，單位毫秒；樣本不足時使用預設值
+STEP_LIMITS = {
+    "goto": (20000, 5000, 60000),
+    "goto_load": (30000, 5000, 60000),
+    "form_ready": (5000, 1500, 20000),
+    "agreement": (5000, 1500, 20000),
+    "option_click": (3000, 1000, 10000),
+    "confirm_popup": (2000, 1000, 8000),
+    "quiz_confirm": (3000, 1000, 10000),
+    "score": (10000, 3000, 30000),
+}
+_FALLBACK_LIMITS = (5000, 1000, 30000)
+
+
+def percentile(values, q):
+    """最近秩百分位數（values 不需排序，q 介於 0~1）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LatencyTracker:
+    """
+    以滾動視窗記錄各步驟耗時並推算逾時
+
+    Args:
+        cache_dir: 統計檔案所在目錄
+        window: 每個 (主機, 步驟) 保留的最近樣本數
+        min_samples: 少於此樣本數時使用預設逾時
+        quantile: 推算逾時所依據的百分位數
+        multiplier: 百分位數乘上的安全倍數
+    """
+
+    def __init__(self, cache_dir="survey_cache", window=200, min_samples=5, quantile=0.95, multiplier=2.0):
+        self.path = os.path.join(cache_dir, STATS_FILE)
+        self.window = window
+        self.min_samples = min_samples
+        self.quantile = quantile
+        self.multiplier = multiplier
+        self._samples = {}
+        self._pending = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def key_for(url, step):
+        host = urlparse(url).netloc or url
+        return f"{host}|{step}"
+
+    def record(self, url, step, duration_ms):
+        """記錄一次步驟耗時（毫秒）"""
+        key = self.key_for(url, step)
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(duration_ms)
+        self._pending.setdefault(key, []).append(duration_ms)
+        observe("step_duration_seconds", duration_ms / 1000, step=step)
+
+    def stats(self, url, step):
+        """回傳 (樣本數, p50, p95) ，無樣本時百分位數為 None"""
+        values = self._samples.get(self.key_for(url, step), ())
+        return len(values), percentile(values, 0.5), percentile(values, 0.95)
+
+    def timeout_for(self, url, step, default=None):
+        """
+        推算步驟逾時（毫秒）：百分位數 × 安全倍數，並限制在下限與上限之間。
+        樣本不足時回傳預設值。
+        """
+        step_default, floor, cap = STEP_LIMITS.get(step, _FALLBACK_LIMITS)
+        default = step_default if default is None else default
+        values = self._samples.get(self.key_for(url, step), ())
+        if len(values) < self.min_samples:
+            return default
+        observed = percentile(values, self.quantile) * self.multiplier
+        return int(min(cap, max(floor, observed)))
+
+    @asynccontextmanager
+    async def measure(self, url, step, count_failures=True):
+        """
+        量測區塊耗時，只有成功的樣本列入統計：失敗或逾時的耗時約等於逾時本身，
+        若計入會推高百分位數，使逾時一路升到上限而無法回落。
+        失敗改記入 step_failures_total 計數；count_failures 為 False 時不計，
+        適用於本來就會嘗試多個選擇器、失敗屬正常的情況。
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            if count_failures:
+                inc("step_failures_total", step=step)
+            raise
+        self.record(url, step, (time.perf_counter() - start) * 1000)
+
+    # ---------- 持久化 ----------
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, values in data.items():
+            self._samples[key] = deque(values[-self.window:], maxlen=self.window)
+
+    def save(self):
+        """將本進程新增的樣本合併寫回統計檔案（與其他子進程寫入的樣本合併）"""
+        if not self._pending:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        for key, values in self._pending.items():
+            merged = data.get(key, []) + [round(v, 1) for v in values]
+            data[key] = merged[-self.window:]
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self._pending = {}
+        except OSError as e:
+            app_logger.warning(f"儲存延遲統計時發生錯誤: {e}")
+
+
+_latency_tracker = None
+
+
+def get_latency_tracker():
+    """取得進程內共用的延遲統計，進程結束時自動保存"""
+    global _latency_tracker
+    if _latency_tracker is None:
+        _latency_tracker = LatencyTracker()
+        atexit.register(_latency_tracker.save)
+    return _latency_tracker
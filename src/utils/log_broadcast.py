@@ -0,0 +1,217 @@
+"""
+共用日誌廣播器
+每個日誌檔只有一個讀取者：以 watchdog（inotify 等）得知檔案變動，無法使用時改為輪詢，
+讀到的新行透過有上限的佇列分送給所有訂閱者。會處理檔案輪換與截斷，跟不上的訂閱者會被中斷，
+因此 N 個即時監控連線只需要一個讀取者
+"""
+import asyncio
+import os
+from collections import namedtuple
+from pathlib import Path
+
+from src.utils.log_reader import decode_line, file_identity
+from src.utils.logger_manager import app_logger
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # 沒有 watchdog 時改用輪詢
+    FileSystemEventHandler = object
+    Observer = None
+
+DEFAULT_QUEUE_SIZE = 2000
+POLL_INTERVAL = 0.5        # 沒有檔案事件通知時的輪詢間隔（秒）
+WATCH_SAFETY_INTERVAL = 5  # 有事件通知時仍定期檢查一次，避免漏接事件
+
+# 一行新日誌：所在檔案的識別、該行結尾的位元組位移、內容
+LogLine = namedtuple("LogLine", ["identity", "offset", "text"])
+
+# 訂閱者跟不上而被中斷時放入佇列的標記
+DROPPED = object()
+
+
+class _LogFileEventHandler(FileSystemEventHandler):
+    """目錄中與目標檔名相關的任何事件都喚醒讀取者"""
+
+    def __init__(self, filename, notify):
+        self.filename = filename
+        self.notify = notify
+
+    def on_any_event(self, event):
+        paths = (getattr(event, "src_path", ""), getattr(event, "dest_path", ""))
+        if any(path and os.path.basename(path) == self.filename for path in paths):
+            self.notify()
+
+
+class Subscription:
+    """單一訂閱者：以有上限的佇列接收新行"""
+
+    def __init__(self, broadcaster, maxsize, identity, start_offset):
+        self.broadcaster = broadcaster
+        self.queue = asyncio.Queue(maxsize)
+        self.identity = identity
+        self.start_offset = start_offset  # 訂閱時讀取者所在的位置，之後的新行都會送進佇列
+        self.dropped = False
+
+    async def get(self):
+        """取得下一個項目（LogLine 或 DROPPED）"""
+        return await self.queue.get()
+
+    def get_nowait(self):
+        return self.queue.get_nowait()
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
+
+
+class LogBroadcaster:
+    """
+    單一日誌檔的共用讀取者
+
+    Args:
+        path: 日誌檔路徑
+        queue_size: 每位訂閱者佇列的上限，超過即中斷該訂閱者
+    """
+
+    def __init__(self, path, queue_size=DEFAULT_QUEUE_SIZE):
+        self.path = Path(path)
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._task = None
+        self._observer = None
+        self._changed = None
+        self._file = None
+        self.identity = None
+        self.position = 0
+        self._partial = b""
+
+    # ---------- 訂閱 ----------
+    def subscribe(self):
+        """新增訂閱者；第一位訂閱者出現時啟動讀取者"""
+        if self._task is None or self._task.done():
+            self._open(at_end=True)
+            self._changed = asyncio.Event()
+            self._start_observer()
+            self._task = asyncio.create_task(self._run())
+        subscription = Subscription(self, self.queue_size, self.identity, self.position - len(self._partial))
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """移除訂閱者；最後一位離開時停止讀取者"""
+        self._subscribers.discard(subscription)
+        if not self._subscribers:
+            self._stop()
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    # ---------- 讀取者 ----------
+    def _open(self, at_end):
+        self._close_file()
+        self._partial = b""
+        try:
+            self._file = open(self.path, "rb")
+        except FileNotFoundError:
+            self._file, self.identity, self.position = None, None, 0
+            return
+        self.identity = file_identity(os.fstat(self._file.fileno()))
+        self.position = self._file.seek(0, os.SEEK_END) if at_end else 0
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _start_observer(self):
+        if Observer is None or self._observer is not None:
+            return
+        loop = asyncio.get_running_loop()
+        handler = _LogFileEventHandler(self.path.name, lambda: loop.call_soon_threadsafe(self._changed.set))
+        try:
+            observer = Observer()
+            observer.schedule(handler, str(self.path.parent), recursive=False)
+            observer.daemon = True
+            observer.start()
+            self._observer = observer
+        except Exception as e:
+            app_logger.warning(f"無法啟動日誌檔案監控，改用輪詢: {e}")
+
+    def _stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        self._close_file()
+
+    async def _run(self):
+        interval = WATCH_SAFETY_INTERVAL if self._observer is not None else POLL_INTERVAL
+        while self._subscribers:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+            try:
+                self._read_new()
+            except Exception as e:
+                app_logger.debug(f"讀取日誌新內容時發生錯誤: {e}")
+
+    def _read_new(self):
+        try:
+            stat_result = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if self._file is None:
+            self._open(at_end=False)
+        elif file_identity(stat_result) != self.identity:
+            # 檔案已輪換：先讀完舊檔案剩下的內容，再從新檔案開頭讀起
+            self._drain()
+            if self._partial and self._subscribers:
+                self._broadcast(LogLine(self.identity, self.position, decode_line(self._partial)))
+            if not self._subscribers:
+                # 廣播期間最後一位訂閱者已被中斷，讀取者已停止，不再開啟新檔案
+                return
+            self._open(at_end=False)
+        elif stat_result.st_size < self.position:
+            # 檔案被截斷
+            self._file.seek(0)
+            self.position = 0
+            self._partial = b""
+        self._drain()
+
+    def _drain(self):
+        if self._file is None:
+            return
+        data = self._file.read()
+        if not data:
+            return
+        data = self._partial + data
+        start_position = self.position - len(self._partial)
+        end = data.rfind(b"\n") + 1
+        self._partial = data[end:]
+        self.position = start_position + len(data)
+        offset = start_position
+        for raw in data[:end].split(b"\n")[:-1]:
+            if not self._subscribers:
+                return
+            offset += len(raw) + 1
+            self._broadcast(LogLine(self.identity, offset, decode_line(raw)))
+
+    def _broadcast(self, item):
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                # 跟不上的訂閱者：清空佇列並通知中斷
+                subscription.dropped = True
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.queue.put_nowait(DROPPED)
+                self._subscribers.discard(subscription)
+                app_logger.warning("日誌即時監控的訂閱者處理過慢，已中斷連線")
+        if not self._subscribers:
+            self._stop()
@@ -0,0 +1,226 @@
+"""
+熱路徑日誌管線
+批次處理時每位使用者的每個細部步驟（填欄位、點選項、送出確認…）都會記錄日誌，
+數百個並行工作階段下，同步寫入主控台與輪換檔案的成本會落在事件迴圈上。此模組提供：
+- step_log：細部步驟日誌，依設定的等級輸出，並可抽樣與限制每秒筆數
+- 非同步模式：呼叫端只把記錄放入佇列，由背景執行緒代為呼叫 app_logger，寫入不在關鍵路徑上
+- BatchedLineWriter：背景執行緒批次寫入檔案（任務 JSONL 日誌使用）
+抽樣率、速率上限與模式可由設定檔指定，也可在每個任務啟動時覆寫
+"""
+import queue
+import random
+import sys
+import threading
+import time
+from contextvars import ContextVar
+
+from src.config.settings import get_setting
+from src.utils.logger_manager import app_logger
+
+LOG_MODES = ("sync", "async")
+DEFAULT_QUEUE_SIZE = 10000
+FLUSH_INTERVAL = 0.2   # 背景寫入的最長等待時間（秒）
+MAX_BATCH = 500
+
+# 非同步模式下，背景執行緒無法取得呼叫端的 contextvars，因此另外保存日誌關聯欄位（任務 ID、使用者）
+log_context = ContextVar("log_context", default={})
+
+_STOP = object()
+
+
+def current_log_context():
+    return log_context.get()
+
+
+def _caller_origin(depth):
+    """呼叫端的 (模組, 函式, 行號)，讓背景執行緒送出的記錄保留原始位置"""
+    frame = sys._getframe(depth + 1)
+    return (frame.f_globals.get("__name__", ""), frame.f_code.co_name, frame.f_lineno)
+
+
+class BatchedLineWriter:
+    """
+    以背景執行緒批次寫入文字行：呼叫端只放入佇列，
+    背景執行緒每 FLUSH_INTERVAL 秒或累積 MAX_BATCH 行時一次寫入並 flush
+
+    Args:
+        path: 檔案路徑（附加模式）
+        maxsize: 佇列上限，超過時捨棄並計數，不會阻塞呼叫端
+    """
+
+    def __init__(self, path, maxsize=DEFAULT_QUEUE_SIZE):
+        self._file = open(path, "a", encoding="utf-8")
+        self._queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="batched-line-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, line):
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is _STOP
+            lines = [line for line in batch if line is not _STOP]
+            if lines:
+                self._file.write("".join(lines))
+                self._file.flush()
+            if stop:
+                return
+
+    def close(self):
+        """寫完佇列中剩餘的內容後關閉"""
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._file.close()
+
+
+class LogDispatcher:
+    """
+    非同步日誌：呼叫端只把 (等級, 訊息, 關聯欄位) 放入佇列，背景執行緒再逐筆交給 app_logger，
+    主控台與輪換檔案的寫入都在背景執行緒完成
+    """
+
+    def __init__(self, maxsize=DEFAULT_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="log-dispatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, level, message, extra):
+        try:
+            self._queue.put_nowait((level, message, extra))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            level, message, extra = item
+            try:
+                app_logger.bind(**extra).log(level, message)
+            except Exception:
+                pass
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self.dropped:
+            app_logger.warning(f"日誌佇列已滿，共捨棄 {self.dropped} 筆步驟日誌")
+
+
+class StepLogger:
+    """
+    細部步驟日誌：依抽樣率與每秒上限過濾，超過上限的筆數在下一個時間窗開始時彙總成一筆
+
+    Args:
+        level: 輸出等級
+        sample_rate: 抽樣率（0~1）
+        rate_limit: 每秒最多幾筆（0 表示不限制）
+        dispatcher: 非同步模式的 LogDispatcher；None 時同步呼叫 app_logger
+    """
+
+    def __init__(self, level="DEBUG", sample_rate=1.0, rate_limit=0, dispatcher=None):
+        self.level = level
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.rate_limit = rate_limit
+        self.dispatcher = dispatcher
+        self._lock = threading.Lock()
+        self._window = 0
+        self._count = 0
+        self._suppressed = 0
+
+    def _admit(self):
+        """回傳 (是否輸出, 上一個時間窗被略過的筆數)"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False, 0
+        if not self.rate_limit:
+            return True, 0
+        with self._lock:
+            window = int(time.monotonic())
+            suppressed = 0
+            if window != self._window:
+                self._window, self._count = window, 0
+                suppressed, self._suppressed = self._suppressed, 0
+            if self._count >= self.rate_limit:
+                self._suppressed += 1
+                return False, suppressed
+            self._count += 1
+            return True, suppressed
+
+    def _emit(self, message, origin):
+        if self.dispatcher is not None:
+            self.dispatcher.submit(self.level, message, dict(current_log_context(), origin=origin))
+        else:
+            app_logger.bind(origin=origin).log(self.level, message)
+
+    def log(self, message, depth=1):
+        admitted, suppressed = self._admit()
+        if not admitted and not suppressed:
+            return
+        origin = _caller_origin(depth)
+        if suppressed:
+            self._emit(f"（已略過 {suppressed} 筆步驟日誌：超過每秒 {self.rate_limit} 筆上限）", origin)
+        if admitted:
+            self._emit(message, origin)
+
+
+_step_logger = None
+_dispatcher = None
+
+
+def configure_logging(mode=None, step_level=None, sample_rate=None, rate_limit=None):
+    """
+    設定本進程的步驟日誌；未指定的項目使用設定檔的值
+
+    Args:
+        mode: "sync" 或 "async"
+        step_level: 步驟日誌等級
+        sample_rate: 抽樣率（0~1）
+        rate_limit: 每秒最多幾筆（0 表示不限制）
+    """
+    global _step_logger, _dispatcher
+    mode = mode or get_setting("log_mode", "sync")
+    if mode not in LOG_MODES:
+        raise ValueError(f"未知的日誌模式: {mode}")
+    shutdown_logging()
+    if mode == "async":
+        _dispatcher = LogDispatcher()
+    _step_logger = StepLogger(
+        level=(step_level or get_setting("step_log_level", "DEBUG")).upper(),
+        sample_rate=sample_rate if sample_rate is not None else get_setting("step_log_sample_rate", 1.0, float),
+        rate_limit=rate_limit if rate_limit is not None else get_setting("step_log_rate_limit", 50, int),
+        dispatcher=_dispatcher,
+    )
+    return _step_logger
+
+
+def step_log(message):
+    """記錄一個細部步驟（熱路徑使用）"""
+    logger = _step_logger or configure_logging()
+    logger.log(message, depth=2)
+
+
+def shutdown_logging():
+    """送出非同步佇列中剩餘的日誌並停止背景執行緒"""
+    global _dispatcher
+    if _dispatcher is not None:
+        _dispatcher.close()
+        _dispatcher = None
+        if _step_logger is not None:
+            _step_logger.dispatcher = None
@@ -0,0 +1,310 @@
+"""
+日誌檔讀取工具
+以稀疏的行位移索引（每 K 行記錄一次位元組位移）支援分頁：
+索引隨檔案成長增量更新、檔案輪換或截斷時重建，任何一頁都只需一次 seek 加上最多 K 行的讀取；
+讀取最後 N 行則從檔尾反向逐塊讀取，耗用的記憶體與時間只與 N 成正比；
+串流下載以位元組位移游標（cursor）在單一檔案代號上線性讀取，可隨時中斷後續傳；
+已輪換並以 zip 壓縮的日誌透過 LogSource 以串流方式解壓讀取，同樣可建立行位移索引，不需整個解壓到記憶體
+"""
+import base64
+import os
+import threading
+import zipfile
+
+DEFAULT_STRIDE = 1000
+READ_BLOCK = 1024 * 1024
+TAIL_BLOCK = 64 * 1024
+
+
+def decode_line(raw: bytes) -> str:
+    """將一行原始位元組轉為字串並去除換行"""
+    return raw.decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+def file_identity(stat_result):
+    """以 (裝置, inode) 辨識檔案，輪換後同名的新檔案會有不同的識別"""
+    return (stat_result.st_dev, stat_result.st_ino)
+
+
+def tail_lines(path, num_lines, end=None, block_size=TAIL_BLOCK):
+    """
+    從檔尾反向逐塊讀取最後 num_lines 行。
+
+    只在換行位元組處切分，UTF-8 的多位元組字元不含 0x0A，因此不會被切斷。
+
+    Args:
+        path: 檔案路徑
+        num_lines: 行數
+        end: 視為檔尾的位移（預設為目前檔案大小）
+        block_size: 每次反向讀取的位元組數
+    """
+    if num_lines <= 0:
+        return []
+    with open(path, "rb") as f:
+        if end is None:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+        position = end
+        blocks = []
+        newlines = 0
+        # 結尾的換行不算一行的分隔；需要找到 num_lines 個分隔才能確定第一行的開頭
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size)
+            newlines += block.count(b"\n", 0, len(block) - 1 if not blocks else len(block))
+            blocks.append(block)
+            if newlines >= num_lines:
+                break
+    data = b"".join(reversed(blocks))
+    if not data:
+        return []
+    if data.endswith(b"\n"):
+        data = data[:-1]
+    lines = data.split(b"\n")
+    if position > 0 or len(lines) > num_lines:
+        lines = lines[-num_lines:]
+    return [decode_line(line) for line in lines]
+
+
+def encode_cursor(identity, offset):
+    """將 (檔案識別, 位元組位移) 編碼為不透明的游標字串"""
+    dev, ino = identity or (0, 0)
+    raw = f"{dev}:{ino}:{offset}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """解析游標字串，回傳 (檔案識別, 位元組位移)；格式錯誤時拋出 ValueError"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        dev, ino, offset = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii").split(":")
+        return (int(dev), int(ino)), int(offset)
+    except Exception as e:
+        raise ValueError(f"無效的游標: {token}") from e
+
+
+def read_chunk(f, chunk_bytes=None, max_lines=None):
+    """
+    從檔案代號目前位置讀取一段完整的行：
+    指定 chunk_bytes 時讀取約該位元組數並補齊到行尾，否則讀取 max_lines 行。
+
+    Returns:
+        行列表（已到檔尾時為空列表）
+    """
+    if chunk_bytes:
+        data = f.read(chunk_bytes)
+        if data and not data.endswith(b"\n"):
+            data += f.readline()
+        if not data:
+            return []
+        if data.endswith(b"\n"):
+            data = data[:-1]
+        return [decode_line(raw) for raw in data.split(b"\n")]
+
+    lines = []
+    for _ in range(max_lines or 1):
+        raw = f.readline()
+        if not raw:
+            break
+        lines.append(decode_line(raw))
+    return lines
+
+
+def iter_range_lines(path, start, end, batch_lines=500):
+    """
+    逐批讀取 [start, end) 位元組範圍內的行（兩端需位於行邊界），
+    產生 (行列表, 該批結尾的位移)
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        lines = []
+        while f.tell() < end:
+            raw = f.readline()
+            if not raw:
+                break
+            lines.append(decode_line(raw))
+            if len(lines) >= batch_lines:
+                yield lines, f.tell()
+                lines = []
+        if lines:
+            yield lines, f.tell()
+
+
+class _ZipMemberReader:
+    """zip 壓縮檔中單一成員的串流讀取器；往後 seek 時邊解壓邊略過，不會整個解壓"""
+
+    def __init__(self, path, member):
+        self._zip = zipfile.ZipFile(path)
+        try:
+            self._member = self._zip.open(member)
+        except Exception:
+            self._zip.close()
+            raise
+
+    def read(self, size=-1):
+        return self._member.read(size)
+
+    def readline(self):
+        return self._member.readline()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._member.seek(offset, whence)
+
+    def tell(self):
+        return self._member.tell()
+
+    def close(self):
+        self._member.close()
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LogSource:
+    """
+    一個可讀取的日誌來源：一般日誌檔，或 zip 壓縮檔中的日誌（以解壓後的位元組位移定位）
+
+    Args:
+        path: 檔案路徑；副檔名為 .zip 時讀取其中的日誌成員
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.compressed = self.path.endswith(".zip")
+        self._zip_meta = None  # (檔案識別, 修改時間, 成員名稱, 解壓後大小)
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+    def stat(self):
+        """回傳 (檔案識別, 內容大小)；壓縮檔的大小為解壓後的大小"""
+        stat_result = os.stat(self.path)
+        identity = file_identity(stat_result)
+        if not self.compressed:
+            return identity, stat_result.st_size
+        meta = self._zip_meta
+        if meta is None or meta[:2] != (identity, stat_result.st_mtime):
+            with zipfile.ZipFile(self.path) as archive:
+                infos = [info for info in archive.infolist() if not info.is_dir()]
+                if not infos:
+                    raise FileNotFoundError(f"壓縮檔中沒有日誌: {self.path}")
+                info = next((i for i in infos if i.filename.endswith(".log")), infos[0])
+            meta = self._zip_meta = (identity, stat_result.st_mtime, info.filename, info.file_size)
+        return identity, meta[3]
+
+    def open(self):
+        """開啟為二進位讀取（支援 read、readline、seek、tell）"""
+        if not self.compressed:
+            return open(self.path, "rb")
+        if self._zip_meta is None:
+            self.stat()
+        return _ZipMemberReader(self.path, self._zip_meta[2])
+
+
+class LineIndex:
+    """
+    單一日誌檔的稀疏行位移索引
+
+    Args:
+        path: 日誌檔路徑（或 LogSource）
+        stride: 每隔幾行記錄一次位元組位移
+    """
+
+    def __init__(self, path, stride=DEFAULT_STRIDE):
+        self.source = path if isinstance(path, LogSource) else LogSource(path)
+        self.path = self.source.path
+        self.stride = stride
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, identity):
+        self.identity = identity
+        self.offsets = [0]        # offsets[i] 為第 i * stride 行的起始位移
+        self.indexed_bytes = 0    # 已掃描到的位置（最後一個完整行的結尾）
+        self.complete_lines = 0   # indexed_bytes 之前的完整行數
+        self.size = 0
+
+    def refresh(self):
+        """掃描自上次更新後新增的內容；檔案被輪換或截斷時從頭重建"""
+        with self._lock:
+            try:
+                identity, size = self.source.stat()
+            except FileNotFoundError:
+                self._reset(None)
+                return
+            if identity != self.identity or size < self.indexed_bytes:
+                self._reset(identity)
+            self.size = size
+            if self.size <= self.indexed_bytes:
+                return
+
+            with self.source.open() as f:
+                f.seek(self.indexed_bytes)
+                position = self.indexed_bytes
+                while True:
+                    block = f.read(READ_BLOCK)
+                    if not block:
+                        break
+                    start = 0
+                    while True:
+                        newline = block.find(b"\n", start)
+                        if newline < 0:
+                            break
+                        self.complete_lines += 1
+                        line_end = position + newline + 1
+                        if self.complete_lines % self.stride == 0:
+                            self.offsets.append(line_end)
+                        self.indexed_bytes = line_end
+                        start = newline + 1
+                    position += len(block)
+
+    @property
+    def total_lines(self):
+        """總行數（未以換行結尾的最後一行也計入）"""
+        partial = 1 if self.size > self.indexed_bytes else 0
+        return self.complete_lines + partial
+
+    def locate(self, line_no):
+        """回傳 (位元組位移, 該位移所在的行號)，行號為不超過 line_no 的最近索引點"""
+        with self._lock:
+            slot = min(line_no // self.stride, len(self.offsets) - 1)
+            return self.offsets[slot], slot * self.stride
+
+    def seek_line(self, f, line_no):
+        """將已開啟的檔案代號移到第 line_no 行的開頭"""
+        self.refresh()
+        offset, at = self.locate(line_no)
+        f.seek(offset)
+        for _ in range(line_no - at):
+            if not f.readline():
+                break
+
+    def read_lines(self, start_line, limit):
+        """
+        讀取從 start_line 起的 limit 行
+
+        Returns:
+            (行列表, 是否還有更多行)
+        """
+        self.refresh()
+        offset, line_no = self.locate(start_line)
+        lines = []
+        with self.source.open() as f:
+            f.seek(offset)
+            for _ in range(start_line - line_no):
+                if not f.readline():
+                    return [], False
+            for _ in range(limit):
+                raw = f.readline()
+                if not raw:
+                    break
+                lines.append(decode_line(raw))
+            has_more = bool(f.readline())
+        return lines, has_more
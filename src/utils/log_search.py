@@ -0,0 +1,372 @@
+"""
+日誌過濾與搜尋
+過濾條件（等級、時間範圍、關鍵字/正規表示式、任務 ID、使用者 email）在伺服器端評估，只有符合的行才送出；
+搜尋以區塊摘要索引加速：每個日誌檔切成約 64KB 的區塊，記錄區塊內的時間範圍、出現過的等級、任務 ID 與 email，
+搜尋時先以摘要略過不可能符合的區塊。當前日誌檔的索引隨檔案成長增量更新，已輪換的檔案只建立一次
+"""
+import re
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from src.utils.log_reader import LogSource, decode_cursor, decode_line, encode_cursor
+
+LEVELS = ("TRACE", "DEBUG", "INFO", "SUCCESS", "WARNING", "ERROR", "CRITICAL")
+LEVEL_RANK = {name: rank for rank, name in enumerate(LEVELS)}
+
+# 日誌行開頭：2025-06-20 10:11:20 | INFO    24368 | ...
+HEADER_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \| ([A-Z]+)\b")
+JOB_TAG_PATTERN = re.compile(r"\[job:([\w.-]+)\]")
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SEARCH_BLOCK = 64 * 1024
+MAX_PATTERN_LENGTH = 200
+
+# 區塊摘要：位元組範圍、起始行號與行數、時間範圍、等級位元遮罩、任務 ID 與 email 集合、區塊開頭承接的記錄狀態
+BlockSummary = namedtuple(
+    "BlockSummary",
+    ["start", "end", "first_line", "line_count", "first_ts", "last_ts", "level_mask", "jobs", "emails", "context"],
+)
+
+
+def job_tag(job_id):
+    """日誌訊息中標示任務 ID 的標籤"""
+    return f"[job:{job_id}]"
+
+
+def _normalize_time(value, end_of_day=False):
+    """將 ISO 格式的時間轉為日誌使用的格式；只有日期時視為當天開始（或結束）"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", ""))
+    except ValueError as e:
+        raise ValueError(f"無效的時間格式: {value}") from e
+    if end_of_day and len(value.strip()) == 10:
+        parsed = parsed.replace(hour=23, minute=59, second=59)
+    return parsed.strftime(TIME_FORMAT)
+
+
+class LineContext:
+    """
+    目前所在記錄的時間、等級與任務 ID。
+    例外追蹤等多行記錄只有第一行帶有表頭，後續行承接同一筆記錄的狀態
+    """
+
+    __slots__ = ("timestamp", "level", "job")
+
+    def __init__(self, timestamp=None, level=None, job=None):
+        self.timestamp = timestamp
+        self.level = level
+        self.job = job
+
+    def feed(self, line):
+        match = HEADER_PATTERN.match(line)
+        if match:
+            self.timestamp, self.level = match.group(1), match.group(2)
+            job_match = JOB_TAG_PATTERN.search(line)
+            self.job = job_match.group(1) if job_match else None
+
+    def snapshot(self):
+        return (self.timestamp, self.level, self.job)
+
+
+class LogFilter:
+    """
+    日誌行過濾條件（有狀態：逐行依序餵入以承接多行記錄的表頭）
+
+    Args:
+        level: 最低等級，例如 WARNING 會包含 ERROR 與 CRITICAL
+        since / until: 時間範圍（ISO 格式）
+        text: 關鍵字（不分大小寫）或正規表示式
+        regex: text 是否為正規表示式
+        job_id: 任務 ID
+        email: 使用者 email（完整比對，不分大小寫）
+    """
+
+    def __init__(self, level=None, since=None, until=None, text=None, regex=False, job_id=None, email=None):
+        self.min_rank = None
+        if level:
+            if level.upper() not in LEVEL_RANK:
+                raise ValueError(f"未知的日誌等級: {level}")
+            self.min_rank = LEVEL_RANK[level.upper()]
+        self.since = _normalize_time(since)
+        self.until = _normalize_time(until, end_of_day=True)
+        self.text = None
+        self.pattern = None
+        if text:
+            if len(text) > MAX_PATTERN_LENGTH:
+                raise ValueError(f"搜尋字串過長（上限 {MAX_PATTERN_LENGTH} 字元）")
+            if regex:
+                try:
+                    self.pattern = re.compile(text)
+                except re.error as e:
+                    raise ValueError(f"無效的正規表示式: {e}") from e
+            else:
+                self.text = text.lower()
+        self.job_id = job_id or None
+        self.email = email.strip().lower() if email else None
+        self.context = LineContext()
+
+    @property
+    def active(self):
+        return any(
+            value is not None
+            for value in (self.min_rank, self.since, self.until, self.text, self.pattern, self.job_id, self.email)
+        )
+
+    def reset(self, context=None):
+        """從指定的記錄狀態重新開始（例如從區塊開頭掃描）"""
+        self.context = LineContext(*(context or ()))
+
+    def matches(self, line):
+        """餵入下一行並判斷是否符合"""
+        context = self.context
+        context.feed(line)
+        if self.min_rank is not None and LEVEL_RANK.get(context.level, -1) < self.min_rank:
+            return False
+        if self.since and (context.timestamp is None or context.timestamp < self.since):
+            return False
+        if self.until and (context.timestamp is None or context.timestamp > self.until):
+            return False
+        if self.job_id and context.job != self.job_id:
+            return False
+        if self.email and self.email not in (found.lower() for found in EMAIL_PATTERN.findall(line)):
+            return False
+        if self.text and self.text not in line.lower():
+            return False
+        if self.pattern and not self.pattern.search(line):
+            return False
+        return True
+
+    def may_match(self, block):
+        """以區塊摘要判斷區塊內是否可能有符合的行"""
+        if self.min_rank is not None and not block.level_mask >> self.min_rank:
+            return False
+        if self.since or self.until:
+            if block.last_ts is None:
+                return False
+            if self.since and block.last_ts < self.since:
+                return False
+            if self.until and block.first_ts > self.until:
+                return False
+        if self.job_id and self.job_id not in block.jobs:
+            return False
+        if self.email and self.email not in block.emails:
+            return False
+        return True
+
+
+class FileSearchIndex:
+    """
+    單一日誌檔的區塊摘要索引
+
+    Args:
+        path: 日誌檔路徑（或 LogSource，壓縮檔以解壓後的位移建立區塊）
+        block_size: 區塊大小（位元組，區塊一律在換行處結束）
+    """
+
+    def __init__(self, path, block_size=SEARCH_BLOCK):
+        self.source = path if isinstance(path, LogSource) else LogSource(path)
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, identity):
+        self.identity = identity
+        self.blocks = []
+        self.indexed_bytes = 0
+        self.indexed_lines = 0
+        self.context = LineContext()
+
+    def refresh(self, final=False):
+        """
+        為新增的內容建立區塊摘要；檔案被輪換或截斷時從頭重建。
+        仍在寫入的檔案只索引完整的區塊，剩餘不足一塊的尾端在搜尋時直接掃描；
+        final=True（已輪換、不再變動的檔案）時連尾端一併索引
+        """
+        with self._lock:
+            try:
+                identity, size = self.source.stat()
+            except FileNotFoundError:
+                self._reset(None)
+                return
+            if identity != self.identity or size < self.indexed_bytes:
+                self._reset(identity)
+            if size - self.indexed_bytes < (1 if final else self.block_size):
+                return
+
+            # 只往前讀取（壓縮檔往回 seek 需要從頭解壓），區塊結尾之後的內容留給下一塊
+            with self.source.open() as f:
+                f.seek(self.indexed_bytes)
+                pending = b""
+                while True:
+                    data = pending + f.read(self.block_size - len(pending))
+                    at_eof = len(data) < self.block_size
+                    if not data or (at_eof and not final):
+                        break
+                    pending = b""
+                    cut = data.rfind(b"\n") + 1
+                    if cut == 0 and not at_eof:
+                        # 單行超過區塊大小：讀到該行結尾
+                        data += f.readline()
+                        if not data.endswith(b"\n") and not final:
+                            break
+                    elif 0 < cut < len(data) and not at_eof:
+                        data, pending = data[:cut], data[cut:]
+                    self._add_block(data)
+
+    def _add_block(self, data):
+        context = self.context
+        start_context = context.snapshot()
+        first_ts = last_ts = context.timestamp
+        level_mask = 0
+        jobs, emails = set(), set()
+        lines = data.split(b"\n")
+        if data.endswith(b"\n"):
+            lines.pop()
+        for raw in lines:
+            line = decode_line(raw)
+            context.feed(line)
+            if context.timestamp:
+                first_ts = first_ts or context.timestamp
+                last_ts = context.timestamp
+            if context.level in LEVEL_RANK:
+                level_mask |= 1 << LEVEL_RANK[context.level]
+            if context.job:
+                jobs.add(context.job)
+            if "@" in line:
+                emails.update(found.lower() for found in EMAIL_PATTERN.findall(line))
+        self.blocks.append(BlockSummary(
+            self.indexed_bytes, self.indexed_bytes + len(data), self.indexed_lines, len(lines),
+            first_ts, last_ts, level_mask, frozenset(jobs), frozenset(emails), start_context,
+        ))
+        self.indexed_bytes += len(data)
+        self.indexed_lines += len(lines)
+
+    def search(self, log_filter, after=0, limit=100):
+        """
+        搜尋本檔案中位移 after 之後的符合行
+
+        Returns:
+            (符合的 (行號, 內容, 行尾位移) 列表, 略過的區塊數, 是否因達到 limit 而提前結束)
+        """
+        with self._lock:
+            blocks = list(self.blocks)
+            tail = (self.indexed_bytes, self.indexed_lines, self.context.snapshot())
+        matches = []
+        skipped = 0
+        with self.source.open() as f:
+            for block in blocks:
+                if block.end <= after:
+                    continue
+                if not log_filter.may_match(block):
+                    skipped += 1
+                    continue
+                if self._scan(f, block.start, block.end, block.first_line, block.context,
+                              log_filter, after, limit, matches):
+                    return matches, skipped, True
+            start, first_line, context = tail
+            if self._scan(f, start, None, first_line, context, log_filter, after, limit, matches):
+                return matches, skipped, True
+        return matches, skipped, False
+
+    @staticmethod
+    def _scan(f, start, end, first_line, context, log_filter, after, limit, matches):
+        """掃描一段範圍；達到 limit 時回傳 True"""
+        log_filter.reset(context)
+        f.seek(start)
+        position = start
+        line_no = first_line
+        while end is None or position < end:
+            raw = f.readline()
+            if not raw:
+                break
+            position += len(raw)
+            line = decode_line(raw)
+            if log_filter.matches(line) and position > after:
+                matches.append((line_no, line, position))
+                if len(matches) >= limit:
+                    return True
+            line_no += 1
+        return False
+
+
+class LogSearchIndex:
+    """
+    多個日誌檔（已輪換的檔案加上當前檔案）的搜尋索引
+
+    Args:
+        list_sources: 回傳 [(顯示名稱, 路徑, 是否不再變動), ...] 的函式，依時間由舊到新排列
+    """
+
+    def __init__(self, list_sources):
+        self.list_sources = list_sources
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _index_for(self, path):
+        with self._lock:
+            index = self._indexes.get(str(path))
+            if index is None:
+                index = self._indexes[str(path)] = FileSearchIndex(path)
+            return index
+
+    def _prune(self, paths):
+        with self._lock:
+            for key in set(self._indexes) - {str(p) for p in paths}:
+                del self._indexes[key]
+
+    def search(self, log_filter, limit=100, cursor=None):
+        """
+        依時間順序搜尋所有日誌檔
+
+        Args:
+            log_filter: LogFilter
+            limit: 最多回傳幾筆
+            cursor: 上次結果的 next_cursor，從該位置之後繼續
+
+        Returns:
+            dict: matches、scanned_files、skipped_blocks、has_more、next_cursor
+        """
+        sources = self.list_sources()
+        self._prune([path for _, path, _ in sources])
+
+        start_identity, after = decode_cursor(cursor) if cursor else (None, 0)
+        started = cursor is None
+        matches, skipped_blocks, scanned_files = [], 0, 0
+        for name, path, final in sources:
+            index = self._index_for(path)
+            index.refresh(final=final)
+            if index.identity is None:
+                continue
+            file_after = 0
+            if not started:
+                if index.identity != start_identity:
+                    continue
+                started, file_after = True, after
+            scanned_files += 1
+            found, skipped, truncated = index.search(log_filter, file_after, limit - len(matches))
+            skipped_blocks += skipped
+            matches.extend(
+                {"file": name, "line": line_no, "content": content, "_cursor": encode_cursor(index.identity, end)}
+                for line_no, content, end in found
+            )
+            if truncated:
+                break
+        if not started:
+            raise ValueError("游標所在的日誌檔已不存在，請重新搜尋")
+
+        has_more = len(matches) >= limit
+        next_cursor = matches[-1]["_cursor"] if has_more else None
+        for match in matches:
+            del match["_cursor"]
+        return {
+            "matches": matches,
+            "count": len(matches),
+            "scanned_files": scanned_files,
+            "skipped_blocks": skipped_blocks,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+        }
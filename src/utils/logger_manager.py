@@ -12,3 +12,28 @@ app_logger = create_logger(
         "compression": "zip",  # 壓縮格式
     },
 )
+
+
+def _tag_context(record):
+    """
+    帶有任務 ID 或使用者的記錄在訊息前加上 [job:<id>] [user:<email>] 標籤，
+    讓全域日誌也能依任務或使用者過濾；原始訊息保留在 extra["raw_message"]。
+    由背景執行緒代為送出的記錄以 extra["origin"] 還原呼叫端的模組、函式與行號
+    """
+    extra = record["extra"]
+    origin = extra.pop("origin", None)
+    if origin:
+        record["name"], record["function"], record["line"] = origin
+    tags = []
+    if extra.get("job_id"):
+        tags.append(f"[job:{extra['job_id']}]")
+    if extra.get("user"):
+        tags.append(f"[user:{extra['user']}]")
+    if tags:
+        extra["raw_message"] = record["message"]
+        record["message"] = f"{' '.join(tags)} {record['message']}"
+
+
+# 以衍生的 logger 套用標籤，不覆寫 loguru 核心唯一的全域 patcher（pretty_loguru 或其他呼叫端可能已設定）；
+# 衍生 logger 與原本共用輸出，bind / contextualize / add 的行為不變
+app_logger = app_logger.patch(_tag_context)
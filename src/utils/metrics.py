@@ -0,0 +1,279 @@
+"""
+自動化流程的量測指標（Prometheus 文字格式）
+每個進程有自己的指標登錄表；子進程定期把累計值寫成快照檔，
+伺服器在 /metrics 被讀取時合併本身的登錄表與所有子進程的快照：
+計數器與直方圖累加，量表（gauge）只採用仍在執行的子進程。
+已結束子進程的快照會併入 retired.json，避免快照檔無限增加
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from src.utils.logger_manager import app_logger
+
+METRICS_DIR = os.path.join("survey_cache", "metrics")
+RETIRED_FILE = "retired.json"
+PREFIX = "auto_survey_"
+SNAPSHOT_INTERVAL = 5      # 子進程寫入快照的間隔（秒）
+STALE_AFTER = 30           # 超過此秒數未更新的快照視為已中斷的子進程
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# 指標定義：名稱 → (類型, 說明)
+METRICS = {
+    "jobs_total": ("counter", "任務數（type=任務類型, status=accepted/completed/failed）"),
+    "user_results_total": ("counter", "使用者處理結果（result=submitted/skipped/failed）"),
+    "step_duration_seconds": ("histogram", "瀏覽器流程各步驟耗時"),
+    "step_failures_total": ("counter", "瀏覽器流程步驟等待失敗或逾時次數（不列入耗時統計）"),
+    "llm_request_duration_seconds": ("histogram", "LLM 請求耗時"),
+    "llm_tokens_total": ("counter", "LLM 使用的 token 數（kind=prompt/completion）"),
+    "cache_lookups_total": ("counter", "快取查詢次數（result=hit/miss）"),
+    "browser_sessions_in_flight": ("gauge", "目前開啟中的瀏覽器工作階段"),
+    "browser_sessions_waiting": ("gauge", "等待瀏覽器工作階段的使用者數"),
+}
+
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())], ensure_ascii=False)
+
+
+def _parse_key(key):
+    name, labels = json.loads(key)
+    return name, dict(labels)
+
+
+class MetricsRegistry:
+    """單一進程的指標登錄表（執行緒安全）"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}  # key → [各區間計數..., +Inf 計數, 總和]
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def add(self, name, delta, **labels):
+        """量表增減"""
+        key = _key(name, labels)
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0) + delta
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            slots = self.histograms.get(key)
+            if slots is None:
+                slots = self.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            slots[index] += 1
+            slots[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "buckets": list(self.buckets),
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {key: list(slots) for key, slots in self.histograms.items()},
+            }
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics():
+    return _registry
+
+
+def inc(name, value=1, **labels):
+    _registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    _registry.observe(name, value, **labels)
+
+
+def add_gauge(name, delta, **labels):
+    _registry.add(name, delta, **labels)
+
+
+@contextmanager
+def timer(name, **labels):
+    """量測區塊耗時（秒）並記入直方圖，例外時同樣記錄"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registry.observe(name, time.perf_counter() - start, **labels)
+
+
+def count_user_result(func):
+    """記錄單一使用者流程 (url, name, email, ...) 的結果：True 送出、None 跳過、False 或例外為失敗"""
+
+    @functools.wraps(func)
+    async def wrapper(url, *args, **kwargs):
+        result = False
+        try:
+            result = await func(url, *args, **kwargs)
+            return result
+        finally:
+            outcome = "submitted" if result else ("skipped" if result is None else "failed")
+            _registry.inc("user_results_total", url=url, result=outcome)
+
+    return wrapper
+
+
+# ---------- 跨進程快照 ----------
+_STARTED = int(time.time())
+
+
+def _snapshot_path():
+    # 檔名帶進程啟動時間，避免 PID 重複使用時覆蓋尚未彙整的舊快照
+    return os.path.join(METRICS_DIR, f"worker-{os.getpid()}-{_STARTED}.json")
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(final=False):
+    """將本進程的累計指標寫成快照檔；final 表示進程即將結束"""
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        data = _registry.snapshot()
+        data["final"] = final
+        _write_json(_snapshot_path(), data)
+    except OSError as e:
+        app_logger.warning(f"寫入指標快照時發生錯誤: {e}")
+
+
+def start_snapshot_writer(interval=SNAPSHOT_INTERVAL):
+    """子進程使用：定期寫入快照，結束時寫入最終快照"""
+
+    def run():
+        while True:
+            time.sleep(interval)
+            write_snapshot()
+
+    threading.Thread(target=run, name="metrics-snapshot", daemon=True).start()
+    atexit.register(write_snapshot, final=True)
+
+
+def _merge(target, snapshot, include_gauges):
+    for key, value in snapshot.get("counters", {}).items():
+        target["counters"][key] = target["counters"].get(key, 0) + value
+    if include_gauges:
+        for key, value in snapshot.get("gauges", {}).items():
+            target["gauges"][key] = target["gauges"].get(key, 0) + value
+    if snapshot.get("buckets", target["buckets"]) != target["buckets"]:
+        return  # 區間設定不同的舊快照無法合併直方圖
+    for key, slots in snapshot.get("histograms", {}).items():
+        merged = target["histograms"].get(key)
+        if merged is None:
+            target["histograms"][key] = list(slots)
+        else:
+            target["histograms"][key] = [a + b for a, b in zip(merged, slots)]
+
+
+def _load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def collect():
+    """
+    合併本進程與所有子進程快照的指標（伺服器使用）。
+    已結束或中斷的子進程快照會併入 retired.json 後刪除
+    """
+    merged = _registry.snapshot()
+    if not os.path.isdir(METRICS_DIR):
+        return merged
+
+    retired_path = os.path.join(METRICS_DIR, RETIRED_FILE)
+    retired = _load_json(retired_path) or {"buckets": merged["buckets"], "counters": {}, "gauges": {}, "histograms": {}}
+    retired_changed = []
+    now = time.time()
+    for filename in os.listdir(METRICS_DIR):
+        if not (filename.startswith("worker-") and filename.endswith(".json")):
+            continue
+        path = os.path.join(METRICS_DIR, filename)
+        snapshot = _load_json(path)
+        if snapshot is None:
+            continue
+        try:
+            stale = now - os.path.getmtime(path) > STALE_AFTER
+        except OSError:
+            continue
+        if snapshot.get("final") or stale:
+            _merge(retired, snapshot, include_gauges=False)
+            retired_changed.append(path)
+        else:
+            _merge(merged, snapshot, include_gauges=True)
+
+    if retired_changed:
+        try:
+            _write_json(retired_path, retired)
+            for path in retired_changed:
+                os.remove(path)
+        except OSError as e:
+            app_logger.warning(f"彙整已結束子進程的指標時發生錯誤: {e}")
+    _merge(merged, retired, include_gauges=False)
+    return merged
+
+
+# ---------- Prometheus 文字格式 ----------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(snapshot):
+    """將合併後的指標輸出為 Prometheus 文字格式"""
+    grouped = {}
+    for kind in ("counters", "gauges", "histograms"):
+        for key, value in snapshot.get(kind, {}).items():
+            name, labels = _parse_key(key)
+            grouped.setdefault(name, []).append((labels, value))
+
+    buckets = snapshot.get("buckets", DEFAULT_BUCKETS)
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        full_name = PREFIX + name
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        for labels, value in sorted(grouped.get(name, []), key=lambda item: sorted(item[0].items())):
+            if kind != "histogram":
+                lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ["+Inf"], value[:-1]):
+                cumulative += count
+                bucket_labels = dict(labels, le=bound if bound == "+Inf" else _format_value(bound))
+                lines.append(f"{full_name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{full_name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+            lines.append(f"{full_name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
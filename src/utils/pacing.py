@@ -0,0 +1,181 @@
+"""
+全域送出節奏控制（pacing）
+以「每個目標主機一個 token bucket」控制送出速率，取代分散在各處的隨機 sleep。
+桶的狀態存放在快取目錄並以檔案鎖保護，因此同一台機器上的所有協程與子進程共用同一個速率上限。
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from urllib.parse import urlparse
+
+from src.config.settings import get_setting
+from src.utils.logger_manager import app_logger
+
+DEFAULT_RATE_PER_MINUTE = 20.0
+DEFAULT_BURST = 2.0
+DEFAULT_JITTER = "uniform"
+DEFAULT_JITTER_MAX = 3.0
+
+JITTER_DISTRIBUTIONS = ("none", "uniform", "exponential")
+
+STATE_FILE = "pacing_state.json"
+LOCK_STALE_SECONDS = 10.0
+
+
+def sample_jitter(distribution, jitter_max):
+    """
+    依分布抽樣額外的隨機延遲（秒）。
+
+    - none: 不加延遲
+    - uniform: 0 ~ jitter_max 均勻分布
+    - exponential: 平均 jitter_max / 2 的指數分布，上限 jitter_max * 3
+    """
+    if jitter_max <= 0 or distribution == "none":
+        return 0.0
+    if distribution == "exponential":
+        return min(random.expovariate(2.0 / jitter_max), jitter_max * 3)
+    return random.uniform(0, jitter_max)
+
+
+class TokenBucket:
+    """
+    可預約的 token bucket：每次預約取走一個 token，token 不足時回傳需等待的秒數
+    （允許 token 為負值，代表已被後續預約排隊佔用）
+    """
+
+    def __init__(self, rate_per_second, burst, tokens=None, updated_at=None):
+        self.rate = rate_per_second
+        self.burst = burst
+        self.tokens = burst if tokens is None else tokens
+        self.updated_at = time.time() if updated_at is None else updated_at
+
+    def reserve(self, now=None):
+        """預約一個 token，回傳需等待的秒數"""
+        now = time.time() if now is None else now
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def to_dict(self):
+        return {"tokens": self.tokens, "updated_at": self.updated_at}
+
+
+class PacingEngine:
+    """
+    全域節奏控制器
+
+    Args:
+        rate_per_minute: 每個主機每分鐘允許的送出次數，預設讀取設定 pacing_rate
+        burst: 允許的瞬間突發量，預設讀取設定 pacing_burst
+        jitter: 額外隨機延遲的分布（none / uniform / exponential），預設讀取設定 pacing_jitter
+        jitter_max: 隨機延遲的尺度（秒），預設讀取設定 pacing_jitter_max
+        state_dir: 桶狀態檔案所在目錄（跨進程共用）
+    """
+
+    def __init__(self, rate_per_minute=None, burst=None, jitter=None, jitter_max=None, state_dir="survey_cache"):
+        if rate_per_minute is None:
+            rate_per_minute = get_setting("pacing_rate", DEFAULT_RATE_PER_MINUTE, float)
+        if burst is None:
+            burst = get_setting("pacing_burst", DEFAULT_BURST, float)
+        if jitter is None:
+            jitter = get_setting("pacing_jitter", DEFAULT_JITTER).lower()
+        if jitter_max is None:
+            jitter_max = get_setting("pacing_jitter_max", DEFAULT_JITTER_MAX, float)
+        if jitter not in JITTER_DISTRIBUTIONS:
+            app_logger.warning(f"未知的 pacing_jitter '{jitter}'，改用 {DEFAULT_JITTER}")
+            jitter = DEFAULT_JITTER
+
+        self.rate_per_second = max(rate_per_minute, 0.001) / 60.0
+        self.burst = max(burst, 1.0)
+        self.jitter = jitter
+        self.jitter_max = max(jitter_max, 0.0)
+        self.state_dir = state_dir
+        self.state_path = os.path.join(state_dir, STATE_FILE)
+        self.lock_path = self.state_path + ".lock"
+        self._local_lock = asyncio.Lock()
+        os.makedirs(state_dir, exist_ok=True)
+
+    @staticmethod
+    def host_of(url):
+        """取得網址的主機名稱作為節奏控制的鍵"""
+        return urlparse(url).netloc or url
+
+    async def reserve(self, url):
+        """
+        為目標網址預約一次送出，回傳應等待的秒數（含隨機抖動）。
+        """
+        host = self.host_of(url)
+        async with self._local_lock:
+            await self._acquire_file_lock()
+            try:
+                state = self._load_state()
+                entry = state.get(host, {})
+                bucket = TokenBucket(
+                    self.rate_per_second, self.burst,
+                    tokens=entry.get("tokens"), updated_at=entry.get("updated_at"),
+                )
+                delay = bucket.reserve()
+                state[host] = bucket.to_dict()
+                self._save_state(state)
+            finally:
+                self._release_file_lock()
+        return delay + sample_jitter(self.jitter, self.jitter_max)
+
+    async def acquire(self, url):
+        """預約並等待輪到自己送出"""
+        delay = await self.reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    # ---------- 跨進程狀態 ----------
+    async def _acquire_file_lock(self):
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.lock_path) > LOCK_STALE_SECONDS:
+                        os.remove(self.lock_path)
+                        continue
+                except OSError:
+                    continue
+                await asyncio.sleep(0.01)
+
+    def _release_file_lock(self):
+        try:
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+
+_pacing_engine = None
+
+
+def get_pacing_engine():
+    """取得進程內共用的節奏控制器"""
+    global _pacing_engine
+    if _pacing_engine is None:
+        _pacing_engine = PacingEngine()
+    return _pacing_engine
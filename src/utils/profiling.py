@@ -0,0 +1,114 @@
+"""
+任務效能分析
+以 playwright_worker.py --profile 或任務請求的 profile 欄位開啟，只在開啟時才啟動分析器，關閉時沒有額外成本。
+- yappi（選用套件）：以牆鐘時間分析，協程在 await 期間的等待時間也會計入，可看出時間花在等待 Chromium 或 LLM
+- cProfile：未安裝 yappi 時使用；協程只計入實際執行的 CPU 時間，等待時間集中在事件迴圈的 select
+結果存放在任務目錄 logs/jobs/<id>/：profile-<任務類型>.pstats（可用 snakeviz 等工具開啟）與同名 .txt 摘要
+"""
+import cProfile
+import io
+import pstats
+import re
+from contextlib import contextmanager, nullcontext
+
+from src.utils.job_log import job_dir
+from src.utils.logger_manager import app_logger
+
+try:
+    import yappi
+except ImportError:
+    yappi = None
+
+PROFILERS = ("auto", "yappi", "cprofile")
+PROFILE_FILE_PATTERN = re.compile(r"^profile-[\w.-]+\.(pstats|txt)$")
+SUMMARY_LINES = 60
+
+
+def resolve_profiler(profiler):
+    """auto 時優先使用 yappi；指定 yappi 但未安裝時改用 cProfile"""
+    if profiler not in PROFILERS:
+        raise ValueError(f"未知的效能分析器: {profiler}")
+    if profiler in ("auto", "yappi") and yappi is not None:
+        return "yappi"
+    if profiler == "yappi":
+        app_logger.warning("未安裝 yappi，改用 cProfile 進行效能分析")
+    return "cprofile"
+
+
+def profile_paths(job_id, label):
+    directory = job_dir(job_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"profile-{label}.pstats", directory / f"profile-{label}.txt"
+
+
+def _write_summary(stats, path, header):
+    buffer = io.StringIO()
+    stats.stream = buffer
+    buffer.write(f"{header}\n\n")
+    stats.sort_stats("cumulative").print_stats(SUMMARY_LINES)
+    stats.sort_stats("tottime").print_stats(SUMMARY_LINES)
+    path.write_text(buffer.getvalue(), encoding="utf-8")
+
+
+@contextmanager
+def _cprofile(stats_path, summary_path):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(stats_path))
+        _write_summary(pstats.Stats(profiler), summary_path, "cProfile（CPU 時間；協程等待時間計入事件迴圈的 select）")
+
+
+@contextmanager
+def _yappi(stats_path, summary_path):
+    yappi.set_clock_type("wall")
+    yappi.clear_stats()
+    yappi.start(builtins=False)
+    try:
+        yield
+    finally:
+        yappi.stop()
+        func_stats = yappi.get_func_stats()
+        func_stats.save(str(stats_path), type="pstat")
+        _write_summary(pstats.Stats(str(stats_path)), summary_path, "yappi（牆鐘時間；包含協程 await 期間的等待）")
+        yappi.clear_stats()
+
+
+def profile_job(job_id, label, profiler=None):
+    """
+    在此區塊內執行的任務進行效能分析；profiler 為 None 時不做任何事
+
+    Args:
+        job_id: 任務 ID（結果存放在該任務目錄）
+        label: 結果檔名標籤（同一任務有多個子進程時區分，例如任務類型）
+        profiler: "auto"、"yappi" 或 "cprofile"
+    """
+    if not profiler:
+        return nullcontext()
+    profiler = resolve_profiler(profiler)
+    stats_path, summary_path = profile_paths(job_id, label)
+    app_logger.info(f"🔬 以 {profiler} 進行效能分析，結果將寫入 {stats_path}")
+    if profiler == "yappi":
+        return _yappi(stats_path, summary_path)
+    return _cprofile(stats_path, summary_path)
+
+
+def list_profiles(job_id):
+    """任務目錄下的效能分析檔案"""
+    directory = job_dir(job_id)
+    if not directory.is_dir():
+        return []
+    return [
+        {"name": path.name, "size": path.stat().st_size}
+        for path in sorted(directory.iterdir()) if PROFILE_FILE_PATTERN.match(path.name)
+    ]
+
+
+def profile_file_path(job_id, filename):
+    """下載用的效能分析檔案路徑，檔名不符合格式時拋出 ValueError"""
+    if not PROFILE_FILE_PATTERN.match(filename or ""):
+        raise ValueError(f"無效的效能分析檔名: {filename}")
+    return job_dir(job_id) / filename
@@ -0,0 +1,204 @@
+"""
+測驗頁面的批次 DOM 操作
+頁面載入後以單次腳本建立選項索引：將 (題目, 選項字母) 對應到的元素標上 data-auto-option 屬性，
+之後的作答只需以唯一選擇器查表，不再每題重新掃描整個 DOM；
+整份答案也可一次送進頁面點擊，只需一次往返（round-trip）
+"""
+from src.utils.logger_manager import app_logger
+
+OPTION_ATTR = "data-auto-option"
+
+# 一次掃描 data-qa 與文字節點，依題目建立選項索引。
+# 優先使用 XPath 規律；同一選項文字出現在多題時，以最接近題目文字的元素為準
+BUILD_INDEX_SCRIPT = """
+([questions, attr]) => {
+    const normalize = (s) => (s || '').replace(/\\s+/g, ' ').trim();
+    document.querySelectorAll('[' + attr + ']').forEach((el) => el.removeAttribute(attr));
+
+    const wanted = new Set();
+    questions.forEach((q) => q.options.forEach((o) => wanted.add(normalize(o.text))));
+
+    const byText = new Map();
+    const add = (text, el, source) => {
+        if (!byText.has(text)) byText.set(text, []);
+        byText.get(text).push([el, source]);
+    };
+    document.querySelectorAll('[data-qa^="option-"]').forEach((el) => {
+        const text = normalize(el.getAttribute('data-qa').slice('option-'.length));
+        if (wanted.has(text)) add(text, el, 'data-qa');
+    });
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    while (walker.nextNode()) {
+        const text = normalize(walker.currentNode.nodeValue);
+        const el = walker.currentNode.parentElement;
+        if (wanted.has(text) && el && !el.closest('[data-qa^="option-"]')) add(text, el, 'text');
+    }
+
+    const depthToQuestion = (el, questionText) => {
+        let depth = 0;
+        for (let node = el; node && node !== document.body; node = node.parentElement, depth++) {
+            if (normalize(node.textContent).includes(questionText)) return depth;
+        }
+        return Infinity;
+    };
+    const pick = (candidates, question) => {
+        if (candidates.length === 1) return candidates[0];
+        const questionText = normalize(question.question).slice(0, 30);
+        if (!questionText) return null;
+        let best = null, bestDepth = Infinity, tie = false;
+        for (const candidate of candidates) {
+            const depth = depthToQuestion(candidate[0], questionText);
+            if (depth < bestDepth) {
+                best = candidate; bestDepth = depth; tie = false;
+            } else if (depth === bestDepth) {
+                tie = true;
+            }
+        }
+        return best && !tie && bestDepth !== Infinity ? best : null;
+    };
+    const byXpath = (xpath) => document.evaluate(
+        xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue;
+
+    const index = {};
+    for (const question of questions) {
+        index[question.id] = {};
+        for (const option of question.options) {
+            let found = null;
+            const el = byXpath(option.xpath);
+            if (el) {
+                found = [el, 'xpath'];
+            } else {
+                found = pick(byText.get(normalize(option.text)) || [], question);
+            }
+            if (!found || found[0].hasAttribute(attr)) continue;
+            found[0].setAttribute(attr, question.id + '-' + option.letter);
+            index[question.id][option.letter] = found[1];
+        }
+    }
+    return index;
+}
+"""
+
+# 依索引一次點擊所有答案。只有找不到元素或點擊拋出錯誤的題目回報 null，交由逐題點擊處理；
+# 不以推測的樣式判斷是否選取，避免把已勾選的核取方塊再點一次而取消。
+# 唯一的確認是選項對應的原生單選鈕（<input type="radio">）：點擊後仍未勾選時才回報 null，單選鈕重複點擊不會取消選取
+BULK_ANSWER_SCRIPT = """
+async ([plan, attr]) => {
+    // 選項對應的原生輸入元素：元素本身、所屬 label 的 control，或同一選項外框（data-qa="option-…"）內的 input
+    const associatedInput = (el) => {
+        if (el.matches('input')) return el;
+        const label = el.closest('label');
+        if (label && label.control) return label.control;
+        const wrapper = el.closest('[data-qa^="option-"]');
+        return wrapper ? wrapper.querySelector('input[type="radio"], input[type="checkbox"]') : null;
+    };
+
+    const report = {};
+    const radios = [];
+    for (const item of plan) {
+        const el = document.querySelector('[' + attr + '="' + item.id + '-' + item.letter + '"]');
+        report[item.id] = null;
+        if (!el) continue;
+        try {
+            el.scrollIntoView({block: 'center'});
+            el.click();
+        } catch (e) {
+            continue;
+        }
+        report[item.id] = 'bulk';
+        const input = associatedInput(el);
+        if (input && input.type === 'radio') radios.push([item.id, input]);
+    }
+    if (radios.length) {
+        // 讓頁面框架完成點擊後的狀態更新
+        await new Promise((resolve) => requestAnimationFrame(() => setTimeout(resolve, 0)));
+        for (const [id, input] of radios) {
+            if (!input.checked) report[id] = null;
+        }
+    }
+    return report;
+}
+"""
+
+
+def option_xpath(question_id, letter):
+    """題目 N 對應 div[N+1]，選項 A/B/C/D 對應 div[1~4]"""
+    question_div = int(question_id) + 1
+    option_div = ord(letter) - ord('A') + 1
+    return f"//div[1]/div[{question_div}]/div/div[2]/div[2]/div[2]/div/div[{option_div}]//span[2]"
+
+
+class OptionIndex:
+    """頁面選項索引：題號 → 選項字母 → 建立索引時使用的策略"""
+
+    def __init__(self, entries=None):
+        self.entries = entries or {}
+
+    @property
+    def count(self):
+        return sum(len(options) for options in self.entries.values())
+
+    def selector(self, question_id, letter):
+        """回傳選項的唯一選擇器，未建立索引時回傳 None"""
+        if letter not in self.entries.get(str(question_id), {}):
+            return None
+        return f'[{OPTION_ATTR}="{question_id}-{letter}"]'
+
+
+async def build_option_index(page, questions):
+    """以單次 page.evaluate 為頁面上所有題目的選項建立索引"""
+    payload = [
+        {
+            "id": str(q["id"]),
+            "question": q.get("question", ""),
+            "options": [
+                {"letter": opt["letter"], "text": opt["text"], "xpath": option_xpath(q["id"], opt["letter"])}
+                for opt in q["options"]
+            ],
+        }
+        for q in questions
+    ]
+    try:
+        return OptionIndex(await page.evaluate(BUILD_INDEX_SCRIPT, [payload, OPTION_ATTR]))
+    except Exception as e:
+        app_logger.warning(f"建立選項索引失敗: {e}")
+        return OptionIndex()
+
+
+def build_answer_plan(questions, answers):
+    """
+    將題目與答案整理成作答清單
+
+    Returns:
+        list: 每項含 id、letter、text
+    """
+    plan = []
+    for question in questions:
+        q_id = str(question["id"])
+        letter = answers.get(q_id)
+        if not letter:
+            continue
+        option_text = next((opt["text"] for opt in question["options"] if opt["letter"] == letter), None)
+        if not option_text:
+            continue
+        plan.append({"id": q_id, "letter": letter, "text": option_text})
+    return plan
+
+
+async def answer_quiz_bulk(page, index, plan):
+    """
+    以單一 page.evaluate 點擊所有已建立索引的選項
+
+    Returns:
+        dict: 題號 → 已點擊時為 'bulk'（找不到元素、點擊失敗、單選鈕未勾選或未建立索引為 None）
+    """
+    indexed = [item for item in plan if index.selector(item["id"], item["letter"])]
+    report = {item["id"]: None for item in plan}
+    if not indexed:
+        return report
+    try:
+        report.update(await page.evaluate(BULK_ANSWER_SCRIPT, [indexed, OPTION_ATTR]))
+    except Exception as e:
+        app_logger.warning(f"批次作答腳本執行失敗，改為逐題點擊: {e}")
+    return report
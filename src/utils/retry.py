@@ -0,0 +1,203 @@
+"""
+分級重試引擎
+依失敗類型決定以最低成本重試：重新查詢元素 → 重新載入頁面 → 新的 context → 重新啟動瀏覽器，
+並以指數退避等待，取代「任何錯誤都關閉瀏覽器、等 5 秒再重開」的做法
+"""
+import asyncio
+import random
+
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from src.config.settings import get_setting
+from src.utils.logger_manager import app_logger
+from src.utils.timings import timed_step
+
+# ========== 失敗類型 ==========
+NAVIGATION_TIMEOUT = "navigation_timeout"
+SELECTOR_MISSING = "selector_missing"
+SUBMIT_UNCONFIRMED = "submit_unconfirmed"
+LLM_ERROR = "llm_error"
+BROWSER_CLOSED = "browser_closed"
+UNKNOWN = "unknown"
+
+# ========== 重試層級（由低到高成本） ==========
+LEVEL_ELEMENT = "element"  # 重新查詢元素（在流程內以 retry_call 處理）
+LEVEL_PAGE = "page"        # 在同一個 context 重新載入頁面
+LEVEL_CONTEXT = "context"  # 關閉 context，開一個新的
+LEVEL_BROWSER = "browser"  # 重新啟動瀏覽器
+
+# 流程層級的升級路徑：同類型失敗第 N 次時使用第 N 個層級（超出則沿用最後一個）
+ESCALATION = {
+    SELECTOR_MISSING: [LEVEL_PAGE, LEVEL_CONTEXT],
+    NAVIGATION_TIMEOUT: [LEVEL_PAGE, LEVEL_CONTEXT, LEVEL_BROWSER],
+    SUBMIT_UNCONFIRMED: [LEVEL_CONTEXT],
+    LLM_ERROR: [LEVEL_PAGE],
+    BROWSER_CLOSED: [LEVEL_BROWSER],
+    UNKNOWN: [LEVEL_CONTEXT, LEVEL_BROWSER],
+}
+
+_BROWSER_CLOSED_MARKERS = ("has been closed", "Target closed", "Browser closed", "Connection closed")
+# Playwright 逾時訊息中表示「等待元素」的呼叫記錄
+_LOCATOR_WAIT_MARKERS = ("waiting for locator", "waiting for selector", "waiting for get_by")
+
+
+class FormFlowError(Exception):
+    """已分類的填表流程錯誤"""
+    kind = UNKNOWN
+
+
+class NavigationError(FormFlowError):
+    """頁面載入逾時或失敗"""
+    kind = NAVIGATION_TIMEOUT
+
+
+class SelectorMissingError(FormFlowError):
+    """找不到必要的頁面元素"""
+    kind = SELECTOR_MISSING
+
+
+class SubmitUnconfirmedError(FormFlowError):
+    """表單已嘗試送出，但無法確認送出成功"""
+    kind = SUBMIT_UNCONFIRMED
+
+
+class LLMError(FormFlowError):
+    """LLM 呼叫失敗或回應無法解析"""
+    kind = LLM_ERROR
+
+
+class RetryExhaustedError(Exception):
+    """所有重試皆失敗"""
+
+    def __init__(self, kind, attempts, last_error):
+        super().__init__(f"{kind}（共嘗試 {attempts} 次）: {last_error}")
+        self.kind = kind
+        self.attempts = attempts
+        self.last_error = last_error
+
+
+def classify_failure(exc):
+    """將例外歸類為失敗類型"""
+    if isinstance(exc, FormFlowError):
+        return exc.kind
+    if isinstance(exc, PlaywrightTimeoutError):
+        # 只有等待元素的逾時才視為找不到元素；頁面載入、送出確認與成績等待的逾時
+        # 應由呼叫端轉為 NavigationError / SubmitUnconfirmedError（如 open_form_page）
+        if any(marker in str(exc) for marker in _LOCATOR_WAIT_MARKERS):
+            return SELECTOR_MISSING
+        return UNKNOWN
+    if isinstance(exc, PlaywrightError) and any(m in str(exc) for m in _BROWSER_CLOSED_MARKERS):
+        return BROWSER_CLOSED
+    return UNKNOWN
+
+
+class RetryPolicy:
+    """
+    重試策略
+
+    Args:
+        max_attempts: 流程最多嘗試次數，預設讀取設定 retry_max_attempts
+        base_delay: 第一次重試前的等待秒數，之後指數加倍，預設讀取設定 retry_base_delay
+        max_delay: 單次等待上限（秒）
+    """
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=10.0):
+        if max_attempts is None:
+            max_attempts = get_setting("retry_max_attempts", 3, int)
+        if base_delay is None:
+            base_delay = get_setting("retry_base_delay", 1.0, float)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max_delay
+
+    def backoff(self, failure_count):
+        """第 failure_count 次失敗後的等待秒數（含 ±20% 抖動）"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (failure_count - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    @staticmethod
+    def level_for(kind, kind_failures):
+        """同類型第 kind_failures 次失敗時應使用的重試層級"""
+        path = ESCALATION.get(kind, ESCALATION[UNKNOWN])
+        return path[min(kind_failures, len(path)) - 1]
+
+
+async def retry_call(func, *args, kinds=(SELECTOR_MISSING,), attempts=2, delay=0.5, **kwargs):
+    """
+    元素層級重試：在原地重新執行 func，只處理指定類型的失敗，其餘錯誤直接拋出。
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            kind = classify_failure(e)
+            if kind not in kinds or attempt == attempts:
+                raise
+            app_logger.debug(f"{getattr(func, '__name__', func)} 失敗（{kind}），第 {attempt} 次原地重試: {e}")
+            await asyncio.sleep(delay * attempt)
+
+
+class RetryEngine:
+    """
+    以瀏覽器池執行填表流程，失敗時依分類升級重試層級
+
+    flow 為 `async def flow(session)`，需自行導航到頁面；重新執行 flow 即等同重新載入頁面。
+    """
+
+    def __init__(self, browser_pool, policy=None, label=""):
+        self.pool = browser_pool
+        self.policy = policy or RetryPolicy()
+        self.label = label
+        self.attempts = 0
+        self.failures = []
+
+    async def run(self, flow):
+        kind_counts = {}
+        session_cm = None
+        session = None
+        try:
+            while True:
+                self.attempts += 1
+                acquiring = False
+                try:
+                    if session is None:
+                        # 建立 context 或啟動瀏覽器失敗也納入分類與重試
+                        acquiring = True
+                        session_cm = self.pool.session()
+                        with timed_step("browser_acquire"):
+                            try:
+                                session = await session_cm.__aenter__()
+                            except BaseException:
+                                session_cm = None
+                                raise
+                        acquiring = False
+                    return await flow(session)
+                except Exception as e:
+                    kind = classify_failure(e)
+                    kind_counts[kind] = kind_counts.get(kind, 0) + 1
+                    self.failures.append(kind)
+                    if self.attempts >= self.policy.max_attempts:
+                        raise RetryExhaustedError(kind, self.attempts, e) from e
+
+                    # 取不到工作階段時，新的 context 同樣會失敗，直接重新啟動瀏覽器
+                    level = LEVEL_BROWSER if acquiring else self.policy.level_for(kind, kind_counts[kind])
+                    delay = self.policy.backoff(len(self.failures))
+                    app_logger.warning(
+                        f"⚠️ {self.label} 第 {self.attempts} 次嘗試失敗（{kind}）: {e}；"
+                        f"{delay:.1f} 秒後以「{level}」層級重試"
+                    )
+                    if level in (LEVEL_CONTEXT, LEVEL_BROWSER):
+                        if session_cm is not None:
+                            await session_cm.__aexit__(None, None, None)
+                        session_cm = session = None
+                        if level == LEVEL_BROWSER:
+                            try:
+                                await self.pool.restart_browser()
+                            except Exception as restart_error:
+                                # 啟動失敗時交由下一次取得工作階段時再分類、重試
+                                app_logger.warning(f"重新啟動瀏覽器失敗: {restart_error}")
+                    await asyncio.sleep(delay)
+        finally:
+            if session_cm is not None:
+                await session_cm.__aexit__(None, None, None)
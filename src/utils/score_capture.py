@@ -0,0 +1,184 @@
+"""
+測驗成績擷取
+送出前開始監聽頁面的網路回應，只從表單本身的送出請求（與表單同網域、符合 quiz_submit_url_pattern 的 POST/PUT）
+的回應內容解析成績，分析、追蹤等其他請求一律忽略；
+同時以單一 wait_for_function 等待頁面出現成績文字作為備援，
+兩者任一先到即結束，不必依序等待多個選擇器逾時
+"""
+import asyncio
+import json
+import re
+from urllib.parse import urlparse
+
+from src.config.settings import get_setting
+from src.utils.logger_manager import app_logger
+
+# 頁面與回應文字中的成績格式（預先編譯，依優先順序）
+SCORE_PATTERNS = [
+    re.compile(r'本次課後測驗，成績為\s*(\d+)'),
+    re.compile(r'成績為\s*(\d+)'),
+    re.compile(r'分數：\s*(\d+)'),
+    re.compile(r'得分：\s*(\d+)'),
+    re.compile(r'您的成績：\s*(\d+)'),
+]
+_SCORE_LINE_KEYWORDS = ('成績', '分數')
+_NUMBER = re.compile(r'\d+')
+
+# JSON 回應中可能代表成績的欄位名稱（只檢查最上層與其下一層，例如 {"data": {"score": 80}}）
+SCORE_KEYS = ("score", "totalScore", "total_score", "finalScore", "final_score")
+_MAX_SCORE_DEPTH = 1
+
+# 送出請求的方法與預設網址規則
+_SUBMIT_METHODS = ("POST", "PUT")
+DEFAULT_SUBMIT_URL_PATTERN = r"submit|answer"
+
+# 頁面備援：任一成績格式出現在頁面文字中即完成等待
+SCORE_READY_SCRIPT = """
+(sources) => {
+    const text = document.body ? document.body.innerText : '';
+    return sources.some((source) => new RegExp(source).test(text));
+}
+"""
+
+
+def parse_score_text(text):
+    """以預先編譯的格式從文字解析成績，找不到時逐行尋找含成績關鍵字的 0~100 數字"""
+    if not text:
+        return None
+    for pattern in SCORE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return int(match.group(1))
+    for line in text.split('\n'):
+        if any(keyword in line for keyword in _SCORE_LINE_KEYWORDS):
+            for num in _NUMBER.findall(line):
+                score = int(num)
+                if 0 <= score <= 100:
+                    return score
+    return None
+
+
+def _find_score_value(data, depth=0):
+    """尋找 JSON 中的成績欄位（最多往下 _MAX_SCORE_DEPTH 層）"""
+    if depth > _MAX_SCORE_DEPTH:
+        return None
+    if isinstance(data, dict):
+        for key in SCORE_KEYS:
+            value = data.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return int(value)
+            if isinstance(value, str) and value.strip().isdigit():
+                return int(value.strip())
+        children = data.values()
+    elif isinstance(data, list):
+        children = data
+    else:
+        return None
+    for child in children:
+        score = _find_score_value(child, depth + 1)
+        if score is not None:
+            return score
+    return None
+
+
+def parse_score_payload(body):
+    """從回應內容解析成績：JSON 先找成績欄位，否則以文字格式比對"""
+    try:
+        score = _find_score_value(json.loads(body))
+        if score is not None:
+            return score
+    except ValueError:
+        pass
+    for pattern in SCORE_PATTERNS:
+        match = pattern.search(body)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+class ScoreCapture:
+    """
+    監聽單一頁面的送出回應以擷取成績
+
+    使用方式：點擊送出前呼叫 start()，送出後以 wait() 取得 (成績, 來源)，最後呼叫 stop()。
+    只採用 start() 之後第一個符合送出端點的回應；該回應沒有成績時改由頁面文字取得
+
+    Args:
+        page: Playwright 頁面
+        submit_url_pattern: 送出請求網址的正規表示式，預設讀取設定 quiz_submit_url_pattern
+    """
+
+    def __init__(self, page, submit_url_pattern=None):
+        self.page = page
+        if submit_url_pattern is None:
+            submit_url_pattern = get_setting("quiz_submit_url_pattern", DEFAULT_SUBMIT_URL_PATTERN)
+        self.submit_url = re.compile(submit_url_pattern, re.IGNORECASE)
+        self._future = None
+        self._submit_seen = False
+
+    def is_submit_request(self, request):
+        """是否為表單本身的送出請求：POST/PUT、與表單同網域且網址符合送出規則"""
+        if request.method not in _SUBMIT_METHODS:
+            return False
+        if urlparse(request.url).netloc != urlparse(self.page.url).netloc:
+            return False
+        return bool(self.submit_url.search(urlparse(request.url).path))
+
+    def start(self):
+        self._future = asyncio.get_running_loop().create_future()
+        self._submit_seen = False
+        self.page.on("response", self._on_response)
+
+    def stop(self):
+        try:
+            self.page.remove_listener("response", self._on_response)
+        except Exception:
+            pass
+        if self._future is not None and not self._future.done():
+            self._future.cancel()
+
+    async def _on_response(self, response):
+        if self._future is None or self._future.done() or self._submit_seen:
+            return
+        if not self.is_submit_request(response.request):
+            return
+        # 只採用第一個送出回應，之後的其他請求即使含有成績欄位也不採用
+        self._submit_seen = True
+        content_type = response.headers.get("content-type", "")
+        if "json" not in content_type and "text" not in content_type:
+            return
+        try:
+            body = await response.text()
+        except Exception:
+            return
+        score = parse_score_payload(body)
+        if score is not None and not self._future.done():
+            app_logger.debug(f"從回應 {response.url} 擷取到成績 {score}")
+            self._future.set_result(score)
+
+    async def wait(self, timeout_ms):
+        """
+        等待成績：網路回應或頁面文字任一先到即返回。
+
+        Returns:
+            tuple: (成績, 來源)；來源為 'network'、'dom' 或 None（逾時）
+        """
+        dom_task = asyncio.ensure_future(self.page.wait_for_function(
+            SCORE_READY_SCRIPT, arg=[p.pattern for p in SCORE_PATTERNS], timeout=timeout_ms
+        ))
+        waiters = {dom_task}
+        if self._future is not None:
+            waiters.add(self._future)
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=timeout_ms / 1000, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not dom_task.done():
+                dom_task.cancel()
+            # 取回例外，避免未處理例外的警告
+            dom_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+        if self._future is not None and self._future.done() and not self._future.cancelled():
+            return self._future.result(), "network"
+        if dom_task in done and not dom_task.cancelled() and dom_task.exception() is None:
+            return None, "dom"
+        return None, None
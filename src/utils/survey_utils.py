@@ -10,8 +10,21 @@ import csv
 import random
 import asyncio
 from datetime import datetime
-from playwright.async_api import async_playwright
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from src.utils.browser_pool import ensure_pool
+from src.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.utils.job_log import validate_job_id, with_user_context
+from src.utils.latency import get_latency_tracker
+from src.utils.log_pipeline import step_log
 from src.utils.logger_manager import app_logger
+from src.utils.metrics import count_user_result, timer
+from src.utils.pacing import get_pacing_engine
+from src.utils.retry import (
+    BROWSER_CLOSED, NavigationError, RetryEngine, RetryExhaustedError, SelectorMissingError, SubmitUnconfirmedError,
+    classify_failure, retry_call
+)
+from src.utils.timings import batch_timings, current_timings, timed_step, with_session_timings
 
 # ========== 快取管理系統 ==========
 class CacheManager:
@@ -56,12 +69,18 @@ class CacheManager:
         url_hash = self.get_url_hash(url)
         if url_hash in data:
             for submission in data[url_hash].get("submissions", []):
-                if submission["name"] == name and submission["email"] == email:
+                if (submission["name"] == name and submission["email"] == email
+                        and submission.get("success", True)):
                     return True, submission["timestamp"]
         return False, None
     
-    def log_user_submission(self, url, name, email, success=True):
-        """記錄使用者提交狀態"""
+    def log_user_submission(self, url, name, email, success=True, **details):
+        """
+        記錄使用者提交狀態
+
+        Args:
+            details: 額外記錄的欄位（例如 attempts 嘗試次數、failure 失敗類型、score 成績、timings 步驟耗時）
+        """
         data = self.load_json_file("submission_log.json")
         url_hash = self.get_url_hash(url)
         
@@ -71,35 +90,78 @@ class CacheManager:
                 "submissions": []
             }
         
+        # 在使用者工作階段內記錄時，一併保存各步驟耗時
+        details.setdefault("timings", current_timings())
         data[url_hash]["submissions"].append({
             "name": name,
             "email": email,
             "timestamp": datetime.now().isoformat(),
-            "success": success
+            "success": success,
+            **{key: value for key, value in details.items() if value is not None}
         })
         
         self.save_json_file("submission_log.json", data)
 
 # ========== CSV 資料處理 ==========
+def campaign_progress_filename(key):
+    """
+    活動進度檔名（快取目錄下）。每個活動各自一個檔案，同時執行的活動不會互相覆寫
+
+    Args:
+        key: 任務 ID；未經由伺服器任務執行時為活動項目的雜湊（格式不合法時拋出 ValueError）
+    """
+    return f"campaign_progress_{validate_job_id(key)}.json"
+
+def read_user_roster(csv_path):
+    """
+    讀取用戶名單：CSV 加上用戶管理器尚未整理回 CSV 的異動日誌（CSV 旁的 .journal）。
+    重播規則與伺服器的 UserManager 相同，未載入伺服器模組時讀到的名單仍與管理頁面一致
+
+    Returns:
+        list: [{'name', 'email'}]，依 email 去除重複
+    """
+    roster = {}
+    with open(csv_path, newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            if row.get('name') and row.get('email'):  # 確保資料完整
+                roster.setdefault(row['email'].strip(), row['name'].strip())
+    
+    try:
+        with open(csv_path + ".journal", 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 寫到一半的最後一行，略過
+                    continue
+                op = entry.get("op")
+                if op == "add":
+                    roster.setdefault(entry["email"], entry["name"])
+                elif op == "add_many":
+                    for user in entry["users"]:
+                        roster.setdefault(user["email"], user["name"])
+                elif op == "update":
+                    old_email, email = entry["old_email"], entry["email"]
+                    if old_email in roster and (email == old_email or email not in roster):
+                        del roster[old_email]
+                        roster[email] = entry["name"]
+                elif op == "delete":
+                    roster.pop(entry["email"], None)
+    except FileNotFoundError:
+        pass
+    
+    return [{'name': name, 'email': email} for email, name in roster.items()]
+
 def load_and_shuffle_csv_data(csv_path):
-    """從 CSV 讀取資料，轉換成 list 並進行隨機排序"""
-    user_data = []
+    """從 CSV（含用戶管理器的異動日誌）讀取資料，轉換成 list 並進行隨機排序"""
     try:
-        with open(csv_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row.get('name') and row.get('email'):  # 確保資料完整
-                    user_data.append({
-                        'name': row['name'].strip(),
-                        'email': row['email'].strip()
-                    })
-        
+        user_data = read_user_roster(csv_path)
         random.shuffle(user_data)
         
         app_logger.info(f"從 CSV 讀取了 {len(user_data)} 筆資料，已進行隨機排序")
-        app_logger.info("隨機排序後的順序：")
+        step_log("隨機排序後的順序：")
         for i, user in enumerate(user_data, 1):
-            app_logger.info(f"  {i}. {user['name']} ({user['email']})")
+            step_log(f"  {i}. {user['name']} ({user['email']})")
         
     except FileNotFoundError:
         app_logger.error(f"錯誤: 找不到 CSV 檔案: {csv_path}")
@@ -124,32 +186,55 @@ def load_users_from_manager(user_manager):
     random.shuffle(user_data)
     
     app_logger.info(f"從用戶管理器讀取了 {len(user_data)} 筆資料，已進行隨機排序")
-    app_logger.info("隨機排序後的順序：")
+    step_log("隨機排序後的順序：")
     for i, user in enumerate(user_data, 1):
-        app_logger.info(f"  {i}. {user['name']} ({user['email']})")
+        step_log(f"  {i}. {user['name']} ({user['email']})")
     
     return user_data
 
 # ========== 瀏覽器操作工具 ==========
+async def open_form_page(page, url, wait_until="domcontentloaded"):
+    """
+    開啟表單頁面，逾時依該主機過去的載入耗時推算；
+    逾時或載入失敗時拋出 NavigationError 以便重試引擎分類
+    """
+    tracker = get_latency_tracker()
+    step = "goto" if wait_until == "domcontentloaded" else "goto_load"
+    timeout = tracker.timeout_for(url, step)
+    try:
+        with timed_step("navigation"):
+            async with tracker.measure(url, step):
+                await page.goto(url, wait_until=wait_until, timeout=timeout)
+    except PlaywrightTimeoutError as e:
+        raise NavigationError(f"載入頁面逾時（{timeout} ms）: {url}") from e
+    except PlaywrightError as e:
+        if classify_failure(e) == BROWSER_CLOSED:
+            raise
+        raise NavigationError(f"載入頁面失敗: {url}（{e}）") from e
+
 async def fill_basic_form_fields(page, name, email, company_name):
     """填寫基本表單欄位（公司、姓名、Email）"""
     try:
         # 選擇「其他」公司
-        await page.wait_for_selector('div[data-qa^="option-其他"]', timeout=5000)
+        tracker = get_latency_tracker()
+        async with tracker.measure(page.url, "form_ready"):
+            await page.wait_for_selector(
+                'div[data-qa^="option-其他"]', timeout=tracker.timeout_for(page.url, "form_ready")
+            )
         await page.click('div[data-qa^="option-其他"]')
-        app_logger.info("已選擇公司：其他")
+        step_log("已選擇公司：其他")
         
         # 公司完整名稱
         await page.fill('input[placeholder="請填入文字"]', company_name)
-        app_logger.info(f"已填入公司名稱：{company_name}")
+        step_log(f"已填入公司名稱：{company_name}")
         
         # 姓名
         await page.fill('input[placeholder="請填入文字"] >> nth=1', name)
-        app_logger.info(f"已填入姓名：{name}")
+        step_log(f"已填入姓名：{name}")
         
         # Email
         await page.fill('input[type="email"]', email)
-        app_logger.info(f"已填入 Email：{email}")
+        step_log(f"已填入 Email：{email}")
         
     except Exception as e:
         app_logger.error(f"填寫基本欄位時發生錯誤: {e}")
@@ -158,46 +243,68 @@ async def fill_basic_form_fields(page, name, email, company_name):
 async def fill_agreement_checkbox(page):
     """勾選同意書"""
     try:
-        await page.wait_for_selector('div[data-qa^="option-本人已詳閱"]', timeout=5000)
+        tracker = get_latency_tracker()
+        async with tracker.measure(page.url, "agreement"):
+            await page.wait_for_selector(
+                'div[data-qa^="option-本人已詳閱"]', timeout=tracker.timeout_for(page.url, "agreement")
+            )
         await page.click('div[data-qa^="option-本人已詳閱"]')
-        app_logger.info("已勾選同意書")
+        step_log("已勾選同意書")
     except Exception as e:
         app_logger.error(f"勾選同意書時發生錯誤: {e}")
         raise
 
-async def submit_form_with_confirmation(page, name):
-    """送出表單並處理確認彈窗"""
-    try:
-        # 隨機等待
-        wait_time = random.randint(1, 15)
-        app_logger.info(f"{name} 的表單填寫完成，隨機等待 {wait_time} 秒後送出...")
-        await asyncio.sleep(wait_time)
-        
-        # 送出表單
-        app_logger.info(f"正在送出 {name} 的表單...")
-        submit_selectors = [
-            'button:has-text("送出")',
-            'button[type="submit"]',
-            'input[type="submit"]'
-        ]
-        
-        submitted = False
+async def submit_form_with_confirmation(page, name, session=None):
+    """
+    送出表單並處理確認彈窗
+
+    送出時機由全域節奏控制器（token bucket）決定；提供 session 時，
+    等待期間會釋放瀏覽器池的工作槽，讓下一位使用者先行預載頁面
+
+    Returns:
+        已點擊送出後是否確認成功；點擊送出之前的錯誤直接拋出，交由重試引擎分類
+    """
+    # 依全域節奏控制等待
+    wait_time = await get_pacing_engine().reserve(page.url)
+    app_logger.info(f"{name} 的表單填寫完成，依節奏控制等待 {wait_time:.1f} 秒後送出...")
+    with timed_step("pacing_wait"):
+        if session:
+            await session.pace(wait_time)
+        else:
+            await asyncio.sleep(wait_time)
+    
+    # 送出表單
+    step_log(f"正在送出 {name} 的表單...")
+    submit_selectors = [
+        'button:has-text("送出")',
+        'button[type="submit"]',
+        'input[type="submit"]'
+    ]
+    
+    submitted = False
+    last_error = None
+    with timer("step_duration_seconds", step="submit"), timed_step("submit"):
         for selector in submit_selectors:
             try:
                 await page.click(selector)
                 submitted = True
                 break
-            except:
+            except Exception as e:
+                if classify_failure(e) == BROWSER_CLOSED:
+                    raise
+                last_error = e
                 continue
-        
-        if not submitted:
-            raise Exception("找不到送出按鈕")
-        
-        # 處理確認彈窗
-        return await handle_confirmation_popup(page, name)
-        
+    
+    if not submitted:
+        raise SelectorMissingError(f"找不到送出按鈕: {last_error}") from last_error
+    
+    # 已點擊送出，之後的錯誤才視為「送出但未確認」；
+    # 未確認時不在原地重試（可能重複點擊送出），交由重試引擎以新的 context 處理
+    try:
+        with timed_step("confirmation"):
+            return await handle_confirmation_popup(page, name)
     except Exception as e:
-        app_logger.error(f"送出表單時發生錯誤: {e}")
+        app_logger.error(f"確認 {name} 的送出結果時發生錯誤: {e}")
         return False
 
 async def handle_confirmation_popup(page, name):
@@ -206,12 +313,16 @@ async def handle_confirmation_popup(page, name):
         # 嘗試常見的確認按鈕文字
         confirm_button_texts = ["確定送出", "確定", "確認", "送出", "提交"]
         button_found = False
+        tracker = get_latency_tracker()
+        timeout = tracker.timeout_for(page.url, "confirm_popup")
         
         for button_text in confirm_button_texts:
             try:
-                await page.wait_for_selector(f'button:has-text("{button_text}")', timeout=2000)
+                # 多個候選文字中通常只有一個會出現，因此只記錄成功的耗時
+                async with tracker.measure(page.url, "confirm_popup", count_failures=False):
+                    await page.wait_for_selector(f'button:has-text("{button_text}")', timeout=timeout)
                 await page.click(f'button:has-text("{button_text}")')
-                app_logger.info(f"彈窗已出現，點擊了 '{button_text}' 按鈕")
+                step_log(f"彈窗已出現，點擊了 '{button_text}' 按鈕")
                 button_found = True
                 break
             except:
@@ -232,7 +343,7 @@ async def handle_confirmation_popup(page, name):
                     buttons = await page.locator(selector).all()
                     if len(buttons) >= 2:
                         await buttons[-1].click()
-                        app_logger.info(f"點擊了彈窗中的確認按鈕")
+                        step_log(f"點擊了彈窗中的確認按鈕")
                         button_found = True
                         break
                 except:
@@ -251,7 +362,10 @@ async def handle_confirmation_popup(page, name):
         return False
 
 # ========== 通用填表函數 ==========
-async def fill_form_with_cache_check(url, name, email, company_name, cache_manager, custom_fill_func=None):
+@with_user_context
+@count_user_result
+@with_session_timings
+async def fill_form_with_cache_check(url, name, email, company_name, cache_manager, custom_fill_func=None, browser_pool=None):
     """
     通用的填表函數，包含快取檢查
     
@@ -262,70 +376,102 @@ async def fill_form_with_cache_check(url, name, email, company_name, cache_manag
         company_name: 公司名稱
         cache_manager: 快取管理器實例
         custom_fill_func: 自定義填表函數（可選）
+        browser_pool: 共用瀏覽器池（可選，未提供時自行啟動瀏覽器）
+
+    Returns:
+        True 表示成功提交，False 表示提交失敗，None 表示已提交過而跳過
     """
     # 檢查是否已經成功提交過
     submitted, timestamp = cache_manager.is_user_submitted(url, name, email)
     if submitted:
         app_logger.info(f"⏭️  {name} ({email}) 已於 {timestamp} 成功提交過表單，跳過")
-        return
+        return None
     
     app_logger.info(f"📝 {name} 尚未提交或上次提交失敗，開始填寫表單...")
     
-    async with async_playwright() as p:
-        # 增加重試機制，以應對網路不穩或頁面載入慢的問題
-        max_retries = 2
-        for attempt in range(max_retries):
-            browser = None
-            try:
-                browser = await p.chromium.launch(headless=False)
-                page = await browser.new_page()
-                
-                await page.goto(url, wait_until="domcontentloaded", timeout=20000)
-                await page.wait_for_timeout(2500) # 給予頁面上的 JS 一些載入時間
-                app_logger.info(f"第 {attempt + 1} 次嘗試：開始填寫 {name} 的表單...")
+    async def flow(session):
+        page = session.page
+        await open_form_page(page, url)
+        with timed_step("readiness"):
+            await page.wait_for_timeout(2500) # 給予頁面上的 JS 一些載入時間
+        step_log(f"開始填寫 {name} 的表單...")
 
-                # 填寫基本欄位
-                await fill_basic_form_fields(page, name, email, company_name)
-                
-                # 如果有自定義填表函數，執行它
-                if custom_fill_func:
+        with timer("step_duration_seconds", step="fill"):
+            # 填寫基本欄位（找不到元素時原地重新查詢）
+            with timed_step("basic_fields"):
+                await retry_call(fill_basic_form_fields, page, name, email, company_name)
+            
+            # 如果有自定義填表函數，執行它
+            if custom_fill_func:
+                with timed_step("custom_fill"):
                     await custom_fill_func(page, name)
-                
-                # 勾選同意書
-                await fill_agreement_checkbox(page)
-                
-                # 送出表單
-                success = await submit_form_with_confirmation(page, name)
-                
-                # **核心修改點：只有在成功提交後才記錄日誌**
-                if success:
-                    app_logger.info(f"✅ {name} 的表單已成功提交。")
-                    cache_manager.log_user_submission(url, name, email, success=True)
-                    # 成功後就跳出重試循環
-                    break 
-                else:
-                    app_logger.warning(f"⚠️ {name} 的表單提交未確認成功。")
-                    # 如果不是最後一次重試，則準備下一次重試
-                    if attempt < max_retries - 1:
-                         app_logger.warning(f"準備進行下一次重試...")
-                    else:
-                         app_logger.error(f"❌ {name} 的表單在所有重試後仍提交失敗。將不會記錄為成功提交。")
-                
-            except Exception as e:
-                app_logger.error(f"❌ {name} 的表單填寫過程中發生錯誤 (第 {attempt + 1} 次嘗試): {e}")
-                # 如果不是最後一次重試，則等待後重試
-                if attempt < max_retries - 1:
-                    app_logger.warning("等待 5 秒後重試...")
-                    await asyncio.sleep(5)
-                else:
-                    # 所有重試都失敗了
-                    app_logger.error(f"❌ {name} 的表單在所有重試後均失敗。將不會記錄為成功提交。")
-            finally:
-                if browser:
-                    await browser.close()
+            
+            # 勾選同意書
+            with timed_step("agreement"):
+                await retry_call(fill_agreement_checkbox, page)
+        
+        # 送出表單
+        if not await submit_form_with_confirmation(page, name, session):
+            raise SubmitUnconfirmedError(f"{name} 的表單提交未確認成功")
+    
+    # 依失敗類型以最低成本重試（重新查詢元素 → 重新載入 → 新 context → 新瀏覽器）
+    async with ensure_pool(browser_pool) as pool:
+        engine = RetryEngine(pool, label=name)
+        try:
+            await engine.run(flow)
+        except RetryExhaustedError as e:
+            app_logger.error(f"❌ {name} 的表單在 {e.attempts} 次嘗試後仍失敗（{e.kind}）。將不會記錄為成功提交。")
+            cache_manager.log_user_submission(url, name, email, success=False, attempts=e.attempts, failure=e.kind)
+            return False
+    
+    app_logger.info(f"✅ {name} 的表單已成功提交（共嘗試 {engine.attempts} 次）。")
+    cache_manager.log_user_submission(url, name, email, success=True, attempts=engine.attempts)
+    return True
 
 # ========== 批次處理函數 ==========
-async def batch_process_forms(url, csv_path, company_name, cache_manager, custom_fill_func=None):
+async def process_users_with_pool(url, user_data_list, company_name, cache_manager, custom_fill_func=None, browser_pool=None):
+    """
+    透過共用瀏覽器池處理一批使用者
+    
+    Args:
+        url: 表單網址
+        user_data_list: 使用者資料列表（含 name、email）
+        company_name: 公司名稱
+        cache_manager: 快取管理器實例
+        custom_fill_func: 自定義填表函數（可選）
+        browser_pool: 共用瀏覽器池（可選，未提供時為本批次建立一個）
+    """
+    breaker = CircuitBreaker(url)
+    async with ensure_pool(browser_pool, max_sessions=None) as pool:
+        # 只在取得派送名額時才檢查熔斷器，熔斷後尚未開始的使用者會暫停而非直接排入瀏覽器池
+        dispatch = asyncio.Semaphore(pool.capacity)
+
+        async def process_user(user_data):
+            async with dispatch:
+                try:
+                    return await breaker.call(
+                        fill_form_with_cache_check,
+                        url,
+                        user_data['name'],
+                        user_data['email'],
+                        company_name,
+                        cache_manager,
+                        custom_fill_func,
+                        browser_pool=pool
+                    )
+                except CircuitOpenError:
+                    app_logger.warning(f"⛔ 已中止，未處理 {user_data['name']} 的表單")
+                    return False
+
+        app_logger.info(f"準備處理 {len(user_data_list)} 個使用者的表單...")
+        with batch_timings(cache_manager):
+            results = await asyncio.gather(*(process_user(user_data) for user_data in user_data_list))
+
+    if breaker.aborted:
+        raise CircuitOpenError(breaker.abort_reason)
+    return results
+
+async def batch_process_forms(url, csv_path, company_name, cache_manager, custom_fill_func=None, browser_pool=None):
     """
     批次處理表單 - 兼容舊版本，仍支援 CSV 路徑
     
@@ -335,30 +481,17 @@ async def batch_process_forms(url, csv_path, company_name, cache_manager, custom
         company_name: 公司名稱
         cache_manager: 快取管理器實例
         custom_fill_func: 自定義填表函數（可選）
+        browser_pool: 共用瀏覽器池（可選）
     """
     app_logger.info("📋 讀取 CSV 資料並隨機排序...")
     user_data_list = load_and_shuffle_csv_data(csv_path)
 
     app_logger.info("🚀 開始批次填寫表單（檢查提交狀態）...")
-    tasks = []
-    for user_data in user_data_list:
-        tasks.append(
-            fill_form_with_cache_check(
-                url, 
-                user_data['name'], 
-                user_data['email'], 
-                company_name, 
-                cache_manager, 
-                custom_fill_func
-            )
-        )
-    
-    app_logger.info(f"準備處理 {len(tasks)} 個使用者的表單...")
-    await asyncio.gather(*tasks)
+    await process_users_with_pool(url, user_data_list, company_name, cache_manager, custom_fill_func, browser_pool)
     
     app_logger.info("✅ 所有表單處理完成！")
 
-async def batch_process_forms_from_manager(url, user_manager, company_name, cache_manager, custom_fill_func=None):
+async def batch_process_forms_from_manager(url, user_manager, company_name, cache_manager, custom_fill_func=None, browser_pool=None):
     """
     批次處理表單 - 使用 UserManager
     
@@ -368,6 +501,7 @@ async def batch_process_forms_from_manager(url, user_manager, company_name, cach
         company_name: 公司名稱
         cache_manager: 快取管理器實例
         custom_fill_func: 自定義填表函數（可選）
+        browser_pool: 共用瀏覽器池（可選）
     """
     app_logger.info("📋 從用戶管理器讀取資料並隨機排序...")
     user_data_list = load_users_from_manager(user_manager)
@@ -377,26 +511,12 @@ async def batch_process_forms_from_manager(url, user_manager, company_name, cach
         return
 
     app_logger.info("🚀 開始批次填寫表單（檢查提交狀態）...")
-    tasks = []
-    for user_data in user_data_list:
-        tasks.append(
-            fill_form_with_cache_check(
-                url, 
-                user_data['name'], 
-                user_data['email'], 
-                company_name, 
-                cache_manager, 
-                custom_fill_func
-            )
-        )
-    
-    app_logger.info(f"準備處理 {len(tasks)} 個使用者的表單...")
-    await asyncio.gather(*tasks)
+    await process_users_with_pool(url, user_data_list, company_name, cache_manager, custom_fill_func, browser_pool)
     
     app_logger.info("✅ 所有表單處理完成！")
 
 # ========== 單一表單處理函數 ==========
-async def process_single_form(url, name, email, company_name, cache_manager, custom_fill_func=None):
+async def process_single_form(url, name, email, company_name, cache_manager, custom_fill_func=None, browser_pool=None):
     """
     處理單一表單
     
@@ -407,12 +527,14 @@ async def process_single_form(url, name, email, company_name, cache_manager, cus
         company_name: 公司名稱
         cache_manager: 快取管理器實例
         custom_fill_func: 自定義填表函數（可選）
+        browser_pool: 共用瀏覽器池（可選）
     """
-    await fill_form_with_cache_check(
+    return await fill_form_with_cache_check(
         url=url,
         name=name,
         email=email,
         company_name=company_name,
         cache_manager=cache_manager,
-        custom_fill_func=custom_fill_func
+        custom_fill_func=custom_fill_func,
+        browser_pool=browser_pool
     )
\ No newline at end of file
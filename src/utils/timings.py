@@ -0,0 +1,148 @@
+"""
+每位使用者工作階段的步驟耗時
+處理單一使用者期間，各步驟（取得瀏覽器、載入頁面、等待就緒、填寫欄位、節奏等待、送出、確認、成績…）
+的耗時累計在 SessionTimings（重試時同一步驟累加），提交記錄寫入 submission_log.json 時一併保存；
+批次結束時依網址彙總各步驟的 p50/p95/p99，記錄日誌並寫入 timing_summary.json
+"""
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from src.utils.latency import percentile
+from src.utils.log_pipeline import current_log_context
+from src.utils.logger_manager import app_logger
+from src.utils.tracing import span
+
+SUMMARY_FILE = "timing_summary.json"
+MAX_BATCHES = 20   # 每個網址保留最近幾次批次的彙總
+
+# 步驟名稱（依流程順序，彙總時依此排序）
+STEPS = (
+    "browser_acquire", "navigation", "readiness", "basic_fields", "custom_fill", "quiz_answer",
+    "agreement", "pacing_wait", "submit", "confirmation", "score",
+)
+
+_current_session = ContextVar("session_timings", default=None)
+_current_batch = ContextVar("batch_timings", default=None)
+
+
+class SessionTimings:
+    """單一使用者工作階段的步驟耗時（毫秒）"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steps = {}
+
+    def add(self, step, duration_ms):
+        self.steps[step] = self.steps.get(step, 0.0) + duration_ms
+
+    def as_dict(self):
+        result = {step: round(value, 1) for step, value in self.steps.items()}
+        result["total"] = round((time.perf_counter() - self.started) * 1000, 1)
+        return result
+
+
+def current_timings():
+    """目前使用者工作階段的步驟耗時；不在工作階段內時回傳 None"""
+    session = _current_session.get()
+    return session.as_dict() if session is not None else None
+
+
+@contextmanager
+def timed_step(step):
+    """將區塊耗時累加到目前使用者工作階段（不在工作階段內時不記錄），同時記錄為追蹤 span"""
+    session = _current_session.get()
+    start = time.perf_counter()
+    try:
+        with span(step):
+            yield
+    finally:
+        if session is not None:
+            session.add(step, (time.perf_counter() - start) * 1000)
+
+
+def with_session_timings(func):
+    """處理單一使用者 (url, ...) 期間記錄步驟耗時與追蹤 span，結束時交給目前的批次彙總"""
+
+    @functools.wraps(func)
+    async def wrapper(url, *args, **kwargs):
+        session = SessionTimings()
+        token = _current_session.set(session)
+        try:
+            with span("user_session", url=url, user=current_log_context().get("user")):
+                return await func(url, *args, **kwargs)
+        finally:
+            _current_session.reset(token)
+            batch = _current_batch.get()
+            if batch is not None and session.steps:
+                batch.add(url, session.as_dict())
+
+    return wrapper
+
+
+def summarize(samples):
+    """將多筆步驟耗時彙總為 {步驟: {count, p50, p95, p99}}"""
+    values = {}
+    for timings in samples:
+        for step, duration in timings.items():
+            values.setdefault(step, []).append(duration)
+    order = {step: i for i, step in enumerate(STEPS + ("total",))}
+    return {
+        step: {
+            "count": len(durations),
+            "p50": percentile(durations, 0.5),
+            "p95": percentile(durations, 0.95),
+            "p99": percentile(durations, 0.99),
+        }
+        for step, durations in sorted(values.items(), key=lambda item: order.get(item[0], len(order)))
+    }
+
+
+class BatchTimings:
+    """收集一個批次內所有使用者的步驟耗時，依網址分組"""
+
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, url, timings):
+        self.samples.setdefault(url, []).append(timings)
+
+    def report(self, cache_manager):
+        """記錄各網址的 p50/p95/p99 並寫入 timing_summary.json"""
+        if not self.samples:
+            return
+        data = cache_manager.load_json_file(SUMMARY_FILE)
+        for url, samples in self.samples.items():
+            summary = summarize(samples)
+            app_logger.info(f"⏱️ {url} 步驟耗時（{len(samples)} 位使用者，毫秒）")
+            for step, stats in summary.items():
+                app_logger.info(
+                    f"   {step:<16} p50={stats['p50']:>9.1f}  p95={stats['p95']:>9.1f}  "
+                    f"p99={stats['p99']:>9.1f}  (n={stats['count']})"
+                )
+            entry = data.setdefault(cache_manager.get_url_hash(url), {"url": url, "batches": []})
+            entry["batches"].append({
+                "finished_at": datetime.now().isoformat(),
+                "users": len(samples),
+                "steps": summary,
+            })
+            entry["batches"] = entry["batches"][-MAX_BATCHES:]
+        cache_manager.save_json_file(SUMMARY_FILE, data)
+
+
+@contextmanager
+def batch_timings(cache_manager):
+    """在此區塊內處理的使用者步驟耗時於結束時彙總（巢狀使用時由最外層彙總）"""
+    if _current_batch.get() is not None:
+        yield _current_batch.get()
+        return
+    batch = BatchTimings()
+    token = _current_batch.set(batch)
+    try:
+        with span("batch"):
+            yield batch
+    finally:
+        _current_batch.reset(token)
+        batch.report(cache_manager)
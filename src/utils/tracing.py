@@ -0,0 +1,261 @@
+"""
+本機追蹤（tracing）
+一次自動化請求會經過 FastAPI 請求 → 背景任務 → 子進程 → 批次 → 各使用者工作階段 → Playwright 操作，
+此模組以 contextvars 保存目前的 span，子進程透過環境變數 TRACEPARENT（W3C Trace Context 格式）接續同一條追蹤。
+結束的 span 以 OpenTelemetry OTLP/JSON 格式（每行一個 resourceSpans 請求）寫入
+logs/jobs/<id>/trace-<服務>-<pid>.jsonl（不屬於任務的 span 寫入 logs/traces/），可離線匯入 Jaeger 等工具檢視
+"""
+import atexit
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from src.config.settings import get_setting
+from src.utils.job_log import job_dir
+from src.utils.log_pipeline import current_log_context
+from src.utils.logger_manager import app_logger
+
+TRACEPARENT_ENV = "TRACEPARENT"
+TRACES_DIR = Path("logs") / "traces"
+EXPORT_BATCH = 200   # 累積多少個 span 寫入一次（本進程的根 span 結束時也會寫入）
+
+# OTLP 的 span 類型與狀態碼
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+# 記錄為 span 的 Playwright 頁面操作
+PAGE_ACTIONS = frozenset({
+    "goto", "reload", "click", "dblclick", "fill", "type", "press", "check", "uncheck", "select_option",
+    "wait_for_selector", "wait_for_load_state", "wait_for_timeout", "wait_for_function", "evaluate", "content",
+})
+
+_current_span = ContextVar("current_span", default=None)
+
+
+class SpanContext:
+    """跨進程傳遞的 span 識別（traceparent）"""
+
+    def __init__(self, trace_id, span_id):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.job_id = None
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @classmethod
+    def parse(cls, traceparent):
+        """解析 W3C traceparent，格式不符時回傳 None"""
+        parts = (traceparent or "").strip().split("-")
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        try:
+            int(parts[1], 16), int(parts[2], 16)
+        except ValueError:
+            return None
+        return cls(parts[1], parts[2])
+
+
+class Span(SpanContext):
+    def __init__(self, name, parent=None, kind=KIND_INTERNAL, attributes=None):
+        super().__init__(parent.trace_id if parent else secrets.token_hex(16), secrets.token_hex(8))
+        self.name = name
+        self.parent = parent
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.job_id = (parent.job_id if parent else None) or current_log_context().get("job_id")
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    @property
+    def is_local_root(self):
+        return not isinstance(self.parent, Span)
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self, error=None):
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.status, self.status_message = STATUS_ERROR, f"{type(error).__name__}: {error}"
+        job_id = self.attributes.get("job.id") or self.job_id
+        _exporter.add(self, job_id)
+        if self.is_local_root:
+            _exporter.flush()
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status, "message": self.status_message} if self.status else {},
+        }
+        if self.parent is not None:
+            span["parentSpanId"] = self.parent.span_id
+        return span
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class SpanExporter:
+    """依任務分檔暫存結束的 span，累積一定數量或根 span 結束時以 OTLP/JSON 寫入"""
+
+    def __init__(self, service_name="auto_survey"):
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._count = 0
+
+    def path_for(self, job_id):
+        directory = TRACES_DIR
+        if job_id:
+            try:
+                directory = job_dir(job_id)
+            except ValueError:
+                pass
+        return directory / f"trace-{self.service_name}-{os.getpid()}.jsonl"
+
+    def add(self, span, job_id):
+        with self._lock:
+            self._pending.setdefault(self.path_for(job_id), []).append(span.to_otlp())
+            self._count += 1
+            if self._count < EXPORT_BATCH:
+                return
+        self.flush()
+
+    def _request(self, spans):
+        resource = {"service.name": self.service_name, "process.pid": os.getpid()}
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes(resource)},
+                "scopeSpans": [{"scope": {"name": "auto_survey"}, "spans": spans}],
+            }]
+        }
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending, self._count = self._pending, {}, 0
+        for path, spans in pending.items():
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(self._request(spans), ensure_ascii=False) + "\n")
+            except OSError as e:
+                app_logger.warning(f"寫入追蹤資料時發生錯誤: {e}")
+
+
+_exporter = SpanExporter()
+atexit.register(_exporter.flush)
+
+
+def configure_tracing(service_name):
+    """設定本進程的服務名稱（伺服器與子進程分別設定，方便在檢視工具中區分）"""
+    _exporter.flush()
+    _exporter.service_name = service_name
+
+
+@functools.lru_cache(maxsize=None)
+def tracing_enabled():
+    return get_setting("tracing_enabled", True, bool)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def set_current_attribute(key, value):
+    """在目前的 span 上加入屬性（不在 span 內時忽略）"""
+    span = _current_span.get()
+    if isinstance(span, Span):
+        span.set_attribute(key, value)
+
+
+def current_traceparent():
+    """目前 span 的 traceparent（傳給背景任務或子進程），不在 span 內時回傳 None"""
+    span = _current_span.get()
+    return span.traceparent if span is not None else None
+
+
+@contextmanager
+def span(name, kind=KIND_INTERNAL, **attributes):
+    """在目前的 span 之下建立子 span；未啟用追蹤時 yield None"""
+    if not tracing_enabled():
+        yield None
+        return
+    current = Span(name, _current_span.get(), kind, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        _current_span.reset(token)
+        current.end(error=e)
+        raise
+    _current_span.reset(token)
+    current.end()
+
+
+@contextmanager
+def resume(traceparent):
+    """接續其他進程或背景任務的追蹤：此區塊內的 span 以 traceparent 為父 span"""
+    context = SpanContext.parse(traceparent)
+    if context is None:
+        yield
+        return
+    token = _current_span.set(context)
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+
+
+def resume_from_env():
+    return resume(os.environ.get(TRACEPARENT_ENV))
+
+
+class TracedPage:
+    """包裝 Playwright Page：PAGE_ACTIONS 中的操作各自記錄為 span，其餘屬性直接轉給原本的 Page"""
+
+    def __init__(self, page):
+        self._page = page
+
+    def __getattr__(self, attr):
+        value = getattr(self._page, attr)
+        if attr not in PAGE_ACTIONS:
+            return value
+
+        @functools.wraps(value)
+        async def action(*args, **kwargs):
+            target = args[0][:200] if args and isinstance(args[0], str) else None
+            with span(f"page.{attr}", KIND_CLIENT, **{"playwright.target": target}):
+                return await value(*args, **kwargs)
+
+        return action
+
+
+def trace_page(page):
+    return TracedPage(page) if tracing_enabled() else page
@@ -6,6 +6,7 @@ const ADMIN_MODE = window.ADMIN_MODE || false; // 從 HTML 獲取 admin 模式
 
 // 全局變數
 let users = [];
+let usersEtag = null; // 最近一次載入名單的版本，重新載入時名單未變動則不重新下載
 // editingUserId 這個變量在您的原始碼中已定義但未使用，我將其移除以保持整潔
 // let editingUserId = null; 
 
@@ -74,9 +75,14 @@ function getAuthParams() {
 // 載入用戶資料
 async function loadUsers() {
     try {
-        const response = await fetch(`${ROOT_PATH}/api/users`);
+        const headers = usersEtag ? { 'If-None-Match': usersEtag } : {};
+        const response = await fetch(`${ROOT_PATH}/api/users`, { headers, cache: 'no-store' });
+        if (response.status === 304) {
+            return; // 名單未變動
+        }
         if (response.ok) {
             users = await response.json();
+            usersEtag = response.headers.get('ETag');
             renderUserTable(); // renderUserTable 內部會處理 admin 模式
             updateUserStats();
         } else {
@@ -301,7 +307,7 @@ function exportToCSV() {
     showMessage('CSV 檔案已匯出', 'success');
 }
 
-// *** MODIFIED: 匯入 CSV，加入權限驗證 ***
+// *** MODIFIED: 匯入 CSV，整份檔案上傳到批次匯入 API，由伺服器一次驗證、去重並寫入 ***
 async function importFromCSV(event) {
     const authParams = getAuthParams();
     if (!authParams) {
@@ -313,87 +319,41 @@ async function importFromCSV(event) {
     const file = event.target.files[0];
     if (!file) return;
 
-    if (!file.name.toLowerCase().endsWith('.csv')) {
-        alert('請選擇 CSV 檔案');
+    const fileName = file.name.toLowerCase();
+    if (!fileName.endsWith('.csv') && !fileName.endsWith('.json')) {
+        alert('請選擇 CSV 或 JSON 檔案');
+        event.target.value = '';
         return;
     }
 
-    try {
-        const text = await file.text();
-        const lines = text.split('\n').filter(line => line.trim());
-        if (lines.length < 2) {
-            alert('CSV 檔案格式不正確，至少需要標題行和一筆資料');
-            return;
-        }
-
-        const headers = lines[0].toLowerCase().split(',').map(h => h.trim().replace(/"/g, ''));
-        if (!headers.includes('name') || !headers.includes('email')) {
-            alert('CSV 檔案必須包含 name 和 email 欄位');
-            return;
-        }
-
-        const nameIndex = headers.indexOf('name');
-        const emailIndex = headers.indexOf('email');
-        const importData = [];
-        const errors = [];
-
-        for (let i = 1; i < lines.length; i++) {
-            const values = lines[i].split(',').map(v => v.trim().replace(/"/g, ''));
-            const name = values[nameIndex]?.trim();
-            const email = values[emailIndex]?.trim();
-            if (!name || !email) {
-                errors.push(`第 ${i + 1} 行: 姓名或 Email 為空`);
-                continue;
-            }
-            if (!isValidEmail(email)) {
-                errors.push(`第 ${i + 1} 行: Email 格式不正確 (${email})`);
-                continue;
-            }
-            if (users.some(user => user.email === email) || importData.some(data => data.email === email)) {
-                errors.push(`第 ${i + 1} 行: Email 已存在 (${email})`);
-                continue;
-            }
-            importData.push({ name, email });
-        }
+    if (!confirm(`準備匯入 ${file.name}，重複或格式錯誤的資料將會略過`)) {
+        event.target.value = '';
+        return;
+    }
 
-        if (importData.length === 0) {
-            alert('沒有有效的資料可以匯入\n\n錯誤:\n' + errors.join('\n'));
-            return;
-        }
+    try {
+        const formData = new FormData();
+        formData.append('file', file);
 
-        const confirmMessage = `準備匯入 ${importData.length} 筆資料${errors.length > 0 ? `\n\n跳過 ${errors.length} 筆錯誤資料` : ''}`;
-        if (!confirm(confirmMessage)) return;
-
-        let successCount = 0;
-        for (const userData of importData) {
-            try {
-                // *** 這裡也加上權限參數 ***
-                const response = await fetch(`${ROOT_PATH}/api/users${authParams}`, {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify(userData)
-                });
-                if (response.ok) {
-                    const newUser = await response.json();
-                    users.push(newUser);
-                    successCount++;
-                } else {
-                    const error = await response.json();
-                    errors.push(`${userData.name}: ${error.detail}`);
-                }
-            } catch (error) {
-                errors.push(`${userData.name}: ${error.message}`);
-            }
+        const response = await fetch(`${ROOT_PATH}/api/users/bulk${authParams}`, {
+            method: 'POST',
+            body: formData
+        });
+        const result = await response.json();
+        if (!response.ok) {
+            throw new Error(result.detail || '匯入失敗');
         }
 
+        users.push(...result.users);
         renderUserTable();
         updateUserStats();
 
-        let message = `成功匯入 ${successCount} 筆資料`;
+        const errors = result.errors.map(e => `第 ${e.row} 行: ${e.error}${e.email ? ` (${e.email})` : ''}`);
+        let message = `成功匯入 ${result.added} 筆資料`;
         if (errors.length > 0) {
             message += `\n\n錯誤 (${errors.length} 筆):\n${errors.join('\n')}`;
         }
-        showMessage(message, successCount > 0 ? 'success' : 'error');
+        showMessage(message, result.added > 0 ? 'success' : 'error');
 
     } catch (error) {
         console.error('匯入 CSV 錯誤:', error);
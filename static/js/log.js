@@ -37,6 +37,7 @@ class LogViewer {
         this.searchInput = document.getElementById('search-input');
         this.searchBtn = document.getElementById('search-btn');
         this.clearSearchBtn = document.getElementById('clear-search-btn');
+        this.levelFilter = document.getElementById('level-filter');
     }
 
     bindEvents() {
@@ -52,9 +53,10 @@ class LogViewer {
         this.logBody.addEventListener('scroll', () => this.handleScroll());
         this.searchInput.addEventListener('input', () => this.handleSearchInput());
         this.searchInput.addEventListener('keypress', (e) => {
-            if (e.key === 'Enter') this.performSearch();
+            if (e.key === 'Enter') this.searchServer();
         });
-        this.searchBtn.addEventListener('click', () => this.performSearch());
+        this.searchBtn.addEventListener('click', () => this.searchServer());
+        this.levelFilter.addEventListener('change', () => this.handleLevelChange());
         this.clearSearchBtn.addEventListener('click', () => this.clearSearch());
     }
 
@@ -217,7 +219,9 @@ class LogViewer {
     async startRealtime() {
         try {
             const tailLines = parseInt(this.tailInput.value) || 10;
-            this.eventSource = new EventSource(`${this.rootPath}/api/log/watch?tail=${tailLines}`);
+            const params = new URLSearchParams({ tail: tailLines });
+            if (this.levelFilter.value) params.set('level', this.levelFilter.value);
+            this.eventSource = new EventSource(`${this.rootPath}/api/log/watch?${params}`);
 
             this.eventSource.onopen = () => {
                 this.isRealtime = true;
@@ -238,6 +242,13 @@ class LogViewer {
                         case 'history':
                             // 歷史日誌已在初始載入時處理
                             break;
+                        case 'batch':
+                            // 多行合併的事件；歷史批次已在初始載入時處理
+                            if (!data.history) {
+                                data.lines.forEach((line) => this.addNewLog(line));
+                                this.updateLastUpdate();
+                            }
+                            break;
                         case 'log':
                             this.addNewLog(data.content);
                             break;
@@ -255,6 +266,12 @@ class LogViewer {
             };
 
             this.eventSource.onerror = () => {
+                if (this.eventSource && this.eventSource.readyState === EventSource.CONNECTING) {
+                    // 瀏覽器會自動重新連線並帶上 Last-Event-ID，從中斷處續傳
+                    this.connectionStatus.textContent = '🟡 重新連線中';
+                    this.connectionStatus.className = 'disconnected';
+                    return;
+                }
                 this.stopRealtime();
                 this.connectionStatus.textContent = '🔴 連接中斷';
                 this.connectionStatus.className = 'disconnected';
@@ -341,6 +358,47 @@ class LogViewer {
         div.textContent = text;
         return div.innerHTML;
     }
+    handleLevelChange() {
+        // 即時監控的過濾條件在伺服器端評估，需重新連線
+        if (this.isRealtime) {
+            this.stopRealtime();
+            this.startRealtime();
+        }
+        if (this.searchInput.value.trim()) {
+            this.searchServer();
+        }
+    }
+
+    async searchServer() {
+        // 在伺服器端搜尋當前與已輪換的日誌，只取回符合的行
+        const query = this.searchInput.value.trim();
+        const level = this.levelFilter.value;
+        if (!query && !level) {
+            this.clearSearch();
+            return;
+        }
+
+        const params = new URLSearchParams({ limit: 1000 });
+        if (query) params.set('q', query);
+        if (level) params.set('level', level);
+
+        this.showLoading();
+        try {
+            const response = await fetch(`${this.rootPath}/api/log/search?${params}`);
+            if (!response.ok) {
+                const error = await response.json().catch(() => ({}));
+                throw new Error(error.detail || `HTTP ${response.status}`);
+            }
+
+            const data = await response.json();
+            this.logs = data.matches.map(match => this.parseLogLine(match.content));
+            this.renderLogs();
+            this.showSearchStats(query || level, data.count, data.has_more ? `${data.count}+` : data.count);
+        } catch (error) {
+            this.showError('搜尋日誌失敗: ' + error.message);
+        }
+    }
+
     handleSearchInput() {
         const query = this.searchInput.value.trim();
         if (query.length === 0) {